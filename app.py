@@ -1,13 +1,31 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, g
 import os
+import contextlib
+import copy
+import functools
+import io
+import itertools
 import json
+import time
+import uuid
+import zlib
 import numpy as np
 from config import Config
 from models.circuit import Circuit
+from models.circuit_library import CircuitLibrary, SessionCircuitStore
 from models.component import Component, Resistor, Capacitor, Inductor, Diode, MOSFET, IGBT
-from models.simulation import SimulationResult
-from simulation.engine import simulate_circuit
+from models.simulation import SimulationResult, COLUMNAR_MIME_TYPE
+from simulation.engine import (simulate_circuit, simulate_circuit_stream, simulate_steady_state,
+                               simulate_to_store, identify_topology)
+from simulation.sweep import expand_grid, monte_carlo_sets, run_sweep
+from simulation.cache import LRUCache
+from simulation.jobs import JobManager
+from simulation.result_cache import ResultCache, cache_entry, cached_probes, result_key, select_result
+from simulation.result_store import ResultStore
+from simulation.incremental import ModelSession
+from simulation.instrumentation import MetricsRegistry, SamplingProfiler, SIZE_BUCKETS
+from simulation.decimation import decimation_indices, time_window
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -15,8 +33,114 @@ app.config.from_object(Config)
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Store current circuit in session
-current_circuit = None
+# Working circuit of each browser session, and the saved-circuit library
+circuit_library = CircuitLibrary(app.config['CIRCUIT_LIBRARY_PATH'])
+circuit_store = SessionCircuitStore(circuit_library, max_sessions=app.config['MAX_SESSIONS'])
+
+def describe_topology(circuit):
+    """Return the detected topology recorded alongside a saved circuit."""
+    return identify_topology(circuit.components, circuit.connections, circuit.node_index())
+
+# Index circuits saved as loose JSON files by earlier versions
+circuit_library.import_directory(app.config['UPLOAD_FOLDER'], describe=describe_topology)
+
+# Each session's simulation model, updated in place by parameter edits
+model_sessions = LRUCache(maxsize=app.config['MODEL_SESSIONS'])
+
+# Recent simulation results and their rendered plots
+simulation_results = LRUCache(maxsize=app.config['RESULT_STORE_SIZE'])
+plot_cache = LRUCache(maxsize=app.config['PLOT_CACHE_SIZE'])
+
+# Results of identical circuits and settings are reused across requests
+result_cache = ResultCache(
+    max_bytes=app.config['RESULT_CACHE_BYTES'],
+    directory=os.path.join(app.config['UPLOAD_FOLDER'], 'result_cache') if app.config['RESULT_CACHE_DISK'] else None,
+    max_disk_bytes=app.config['RESULT_CACHE_DISK_BYTES']
+)
+
+# Long runs written out of core; reopened by id after a restart
+result_store = ResultStore(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'results'),
+    max_bytes=app.config['RESULT_STORE_BYTES']
+)
+
+# Background simulation jobs, queued fairly per session
+jobs = JobManager(
+    max_workers=app.config['JOB_WORKERS'],
+    result_ttl=app.config['JOB_RESULT_TTL'],
+    max_queued=app.config['MAX_QUEUED_JOBS']
+)
+
+# Request, simulation and rendering metrics served at /metrics
+metrics = MetricsRegistry()
+metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint and status.')
+metrics.counter('simulation_runs_total', 'Simulation calls by analysis, topology and result cache outcome.')
+metrics.counter('simulation_models_total', 'Session models built, updated in place or reused as is.')
+metrics.histogram('simulation_duration_seconds', 'Simulation time by topology and mode, excluding cache hits.')
+metrics.histogram('simulation_phase_seconds', 'Time spent per simulation phase by topology.')
+metrics.counter('simulation_rhs_evaluations_total', 'Right-hand side evaluations by topology.')
+metrics.counter('simulation_jacobian_evaluations_total', 'Jacobian evaluations by topology.')
+metrics.counter('simulation_solver_steps_total', 'Accepted solver steps by topology.')
+metrics.counter('simulation_rejected_steps_total', 'Rejected solver steps by topology.')
+metrics.histogram('simulation_result_bytes', 'Size of the arrays of computed results.', buckets=SIZE_BUCKETS)
+metrics.histogram('response_serialization_seconds', 'Time to encode a result response by format.')
+metrics.histogram('response_bytes', 'Size of encoded result responses by format.', buckets=SIZE_BUCKETS)
+metrics.histogram('plot_render_seconds', 'Time to render a PNG plot.')
+metrics.gauge('cache_entries', 'Entries held per cache.')
+metrics.gauge('cache_hits', 'Hits per cache since startup.')
+metrics.gauge('cache_misses', 'Misses per cache since startup.')
+metrics.gauge('jobs', 'Background jobs by state.')
+
+@metrics.add_collector
+def collect_cache_metrics():
+    caches = {"results": result_cache.memory.stats(), "plots": plot_cache.stats(),
+              "recent_results": simulation_results.stats()}
+    for cache, stats in caches.items():
+        yield 'cache_entries', {"cache": cache}, stats["size"]
+        yield 'cache_hits', {"cache": cache}, stats["hits"]
+        yield 'cache_misses', {"cache": cache}, stats["misses"]
+    for state, count in jobs.stats()["jobs"].items():
+        yield 'jobs', {"state": state}, count
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g and request.endpoint != 'metrics_endpoint':
+        # Streamed bodies are timed until the response starts
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                        {"endpoint": request.endpoint or "unknown", "method": request.method,
+                         "status": str(response.status_code)})
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus-style metrics of requests, simulations, caches and jobs."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def record_simulation(analysis, result, cached):
+    """Aggregate one simulation call into the metrics."""
+    metadata = result.metadata
+    topology = metadata.get("topology") or "unknown"
+    labels = {"topology": topology}
+    metrics.inc('simulation_runs_total', labels={"analysis": analysis, "topology": topology,
+                                                  "cache": "hit" if cached else "miss"})
+    if not cached and metadata.get("session"):
+        metrics.inc('simulation_models_total', labels={"outcome": metadata["session"]["model"]})
+    instrumentation = metadata.get("instrumentation")
+    if cached or not instrumentation:
+        return
+    metrics.observe('simulation_duration_seconds', instrumentation["total_time"],
+                    {"topology": topology, "mode": str(metadata.get("mode"))})
+    for phase, seconds in instrumentation["phases"].items():
+        metrics.observe('simulation_phase_seconds', seconds, {"topology": topology, "phase": phase})
+    metrics.observe('simulation_result_bytes', instrumentation["result_bytes"])
+    for name, key in (('simulation_rhs_evaluations_total', 'nfev'), ('simulation_jacobian_evaluations_total', 'njev'),
+                      ('simulation_solver_steps_total', 'steps'), ('simulation_rejected_steps_total', 'rejected_steps')):
+        if metadata.get(key):
+            metrics.inc(name, metadata[key], labels)
 
 @app.route('/')
 def index():
@@ -26,12 +150,13 @@ def index():
 @app.route('/editor', methods=['GET', 'POST'])
 def editor():
     """Circuit editor page."""
-    global current_circuit
-    
     if request.method == 'POST':
-        # Process circuit data from the editor
+        # Process circuit data from the editor; parameter edits are applied to a
+        # copy of the current circuit that replaces it, keeping its connectivity index
         circuit_data = request.json
-        current_circuit = Circuit.from_json(circuit_data)
+        current_circuit = circuit_store.get(session_owner())
+        edited = current_circuit.edited_from_json(circuit_data) if current_circuit is not None else None
+        circuit_store.set(session_owner(), edited or Circuit.from_json(circuit_data))
         return jsonify({"status": "success"})
     
     return render_template('editor.html')
@@ -39,7 +164,7 @@ def editor():
 @app.route('/simulate', methods=['POST'])
 def simulate():
     """Run simulation based on current circuit."""
-    global current_circuit
+    current_circuit = circuit_store.get(session_owner())
     
     if not current_circuit:
         flash("No circuit to simulate.")
@@ -48,46 +173,494 @@ def simulate():
     # Get simulation parameters
     simulation_params = request.json
     
-    # Run simulation
+    # Run simulation, under the sampling profiler if asked for
+    profile = simulation_params.get('profile') and app.config['ALLOW_PROFILING']
     try:
-        result = simulate_circuit(
-            current_circuit,
-            end_time=simulation_params.get('end_time', app.config['MAX_SIMULATION_TIME']),
-            step_size=simulation_params.get('step_size', app.config['DEFAULT_STEP_SIZE'])
+        function, kwargs = simulation_call(current_circuit, simulation_params)
+        with SamplingProfiler(app.config['PROFILER_INTERVAL']) if profile else contextlib.nullcontext() as profiler:
+            result = cached_simulation(function, **kwargs)
+            
+            # Keep the full result so plots and zoomed windows can be served later
+            simulation_results.put(result.id, result)
+            
+            reduced = decimate_for_response(
+                result,
+                simulation_params.get('max_points'),
+                method=simulation_params.get('decimation', 'minmax')
+            )
+        if profile:
+            reduced.metadata["profile"] = profiler.report()
+        return result_response(reduced)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/simulate/stream')
+def simulate_stream():
+    """Stream a simulation of the current circuit as Server-Sent Events.
+    
+    Each "chunk" event carries one decimated time chunk in the /simulate JSON
+    layout; a final "done" event (or "error") closes the stream.  The
+    comma-separated probes argument limits the signals streamed, and the
+    simulation page's comma-separated nodes and variables are added as in
+    /simulate.
+    """
+    current_circuit = circuit_store.get(session_owner())
+    
+    if not current_circuit:
+        return jsonify({"error": "No circuit to simulate"}), 400
+    
+    try:
+        chunks = simulate_circuit_stream(
+            copy.deepcopy(current_circuit),
+            end_time=request.args.get('end_time', app.config['MAX_SIMULATION_TIME'], type=float),
+            step_size=request.args.get('step_size', app.config['DEFAULT_STEP_SIZE'], type=float),
+            mode=request.args.get('mode', 'adaptive'),
+            model_variant=request.args.get('model_variant', 'switched'),
+            chunk_samples=app.config['STREAM_CHUNK_SAMPLES'],
+            max_points=min(request.args.get('points', app.config['STREAM_CHUNK_POINTS'], type=int),
+                           app.config['MAX_RESPONSE_POINTS']),
+            probes=requested_probes({'probes': request.args.get('probes', '').split(',')}),
+            optional_probes=selected_probes({'nodes': request.args.get('nodes', '').split(','),
+                                             'variables': request.args.get('variables', '').split(',')})
         )
-        
-        # Convert result to JSON for the frontend
-        result_data = result.to_json()
-        return jsonify(result_data)
+        # Build the model now so setup errors are reported as a normal response
+        first = next(chunks)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def events():
+        try:
+            for chunk in itertools.chain([first], chunks):
+                yield f"event: chunk\ndata: {json.dumps(chunk.to_json())}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def simulation_call(circuit, simulation_params):
+    """Map request parameters to the simulation function and its arguments."""
+    if simulation_params.get('analysis') == 'steady_state':
+        return simulate_steady_state, {
+            "circuit": circuit,
+            "periods": simulation_params.get('periods', 3),
+            "step_size": simulation_params.get('step_size', app.config['DEFAULT_STEP_SIZE']),
+            "max_samples": sample_budget(simulation_params),
+            "probes": requested_probes(simulation_params),
+            "optional_probes": selected_probes(simulation_params),
+            "session": model_session(),
+            "warm_start": simulation_params.get('warm_start')
+        }
+    if simulation_params.get('storage') == 'memmap':
+        return simulate_to_store, {
+            "circuit": circuit,
+            "store": result_store,
+            "end_time": simulation_params.get('end_time', app.config['MAX_SIMULATION_TIME']),
+            "step_size": simulation_params.get('step_size', app.config['DEFAULT_STEP_SIZE']),
+            "mode": simulation_params.get('mode', 'adaptive'),
+            "model_variant": simulation_params.get('model_variant', 'switched'),
+            "ripple_envelope": simulation_params.get('ripple_envelope', False),
+            "chunk_samples": app.config['STREAM_CHUNK_SAMPLES'],
+            "max_samples": app.config['MAX_STORED_SAMPLES'],
+            "probes": requested_probes(simulation_params),
+            "optional_probes": selected_probes(simulation_params)
+        }
+    return simulate_circuit, {
+        "circuit": circuit,
+        "end_time": simulation_params.get('end_time', app.config['MAX_SIMULATION_TIME']),
+        "step_size": simulation_params.get('step_size', app.config['DEFAULT_STEP_SIZE']),
+        "mode": simulation_params.get('mode', 'adaptive'),
+        "model_variant": simulation_params.get('model_variant', 'switched'),
+        "ripple_envelope": simulation_params.get('ripple_envelope', False),
+        "sampling": simulation_params.get('sampling', app.config['SAMPLING_POLICY']),
+        "max_samples": sample_budget(simulation_params),
+        "samples_per_period": simulation_params.get('samples_per_period', 20),
+        "solver_method": simulation_params.get('solver_method', 'auto'),
+        "probes": requested_probes(simulation_params),
+        "optional_probes": selected_probes(simulation_params),
+        "session": model_session(),
+        "warm_start": simulation_params.get('warm_start')
+    }
+
+def model_session():
+    """Return the current browser session's ModelSession, creating it on first use."""
+    owner = session_owner()
+    current = model_sessions.get(owner)
+    if current is None:
+        current = ModelSession()
+        model_sessions.put(owner, current)
+    return current
+
+def requested_probes(simulation_params):
+    """Return the signals a request's 'probes' lists, or None for all of them.
+    
+    Names the model cannot produce make the run fail.
+    """
+    probes = [str(name) for name in simulation_params.get('probes') or [] if name]
+    return sorted(set(probes)) or None
+
+def selected_probes(simulation_params):
+    """Return the signals selected on the simulation page, or None.
+    
+    These are the 'nodes' and 'variables' the page sends, a node number k
+    standing for v_node_k.  They are returned when the model has them;
+    the others are dropped and listed in the result's metadata.
+    """
+    probes = [f"v_node_{node}" if str(node).isdigit() else str(node)
+              for node in simulation_params.get('nodes') or [] if node != '']
+    probes += [str(name) for name in simulation_params.get('variables') or [] if name]
+    return sorted(set(probes)) or None
+
+def sample_budget(simulation_params):
+    """Return the requested sample budget, never above the server's limit."""
+    return min(int(simulation_params.get('max_samples', app.config['MAX_OUTPUT_SAMPLES'])),
+               app.config['MAX_OUTPUT_SAMPLES'])
+
+def cached_simulation(function, circuit, progress=None, session=None, probes=None, optional_probes=None,
+                      **settings):
+    """Run function(circuit, **settings) unless an identical run is cached.
     
+    A model session is passed on to the run, which holds the session's lock,
+    and is not part of the cache key; when another run holds the lock, this
+    run goes ahead without the session.  Warm-started runs depend on the
+    session's earlier runs, so they are never served from the cache.
+    
+    The probe selection is not part of the key either: runs are cached with
+    every signal and probes and optional_probes are selected from the cached
+    result, so changing only the plotted signals is a hit.  Neither are
+    component and circuit ids, so a circuit the editor reloads under new
+    ids is a hit too, relabelled for its ids.
+    """
+    def run(probes, optional_probes):
+        # A session busy with another run, such as a background job, is not
+        # waited for: this run builds its own model instead
+        if session is not None and session.lock.acquire(blocking=False):
+            try:
+                return function(circuit, progress=progress, session=session, probes=probes,
+                                optional_probes=optional_probes, **settings)
+            finally:
+                session.lock.release()
+        return function(circuit, progress=progress, probes=probes,
+                        optional_probes=optional_probes, **settings)
+    
+    if function is simulate_to_store or settings.get('warm_start'):
+        # Out-of-core results already live on disk in the result store
+        # and warm starts depend on the session's history
+        result = run(probes, optional_probes)
+        record_simulation(function.__name__, result, cached=False)
+        return result
+    key = result_key(circuit, function.__name__, settings)
+    full = result_cache.get(key)
+    result = select_result(full, circuit, probes, optional_probes) if full is not None else None
+    cached = result is not None
+    if not cached:
+        full = cache_entry(run(*cached_probes(full, circuit, probes, optional_probes)), circuit)
+        result_cache.put(key, full)
+        result = select_result(full, circuit, probes, optional_probes)
+    record_simulation(function.__name__, result, cached)
+    return result
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Report hit, miss and eviction counters of the result and plot caches."""
+    return jsonify({
+        "results": result_cache.stats(),
+        "plots": plot_cache.stats()
+    })
+
+def session_owner():
+    """Return a stable id for the current browser session."""
+    if 'client_id' not in session:
+        session['client_id'] = str(uuid.uuid4())
+    return session['client_id']
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a simulation of the current circuit and return its job id."""
+    current_circuit = circuit_store.get(session_owner())
+    
+    if not current_circuit:
+        return jsonify({"error": "No circuit to simulate"}), 400
+    
+    simulation_params = request.json or {}
+    try:
+        # Snapshot the circuit so later edits do not affect the queued run
+        function, kwargs = simulation_call(copy.deepcopy(current_circuit), simulation_params)
+        job = jobs.submit(functools.partial(cached_simulation, function), kwargs, owner=session_owner(), end_time=kwargs.get('end_time'))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+    
+    return jsonify(job.to_json()), 202
 
-@app.route('/save_circuit', methods=['POST'])
-def save_circuit():
-    """Save current circuit to file."""
-    global current_circuit
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report a job's state, simulated-time progress and RHS evaluations."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_json())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_json())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Return the result of a completed job, decimated like /simulate."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job.status != 'completed':
+        return jsonify(job.to_json()), 409
+    
+    # Make the full result available to the plot and window endpoints
+    simulation_results.put(job.result.id, job.result)
+    try:
+        return result_response(decimate_for_response(
+            job.result,
+            request.args.get('points', type=int),
+            method=request.args.get('method', 'minmax')
+        ))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/result/<result_id>')
+def result_window(result_id):
+    """Return a stored result, optionally zoomed to a time window.
+    
+    A window that fits the point budget is returned at full resolution.
+    """
+    result = stored_result(result_id)
+    if result is None:
+        return jsonify({"error": "Unknown or expired result"}), 404
+    
+    try:
+        return result_response(decimate_for_response(
+            result,
+            request.args.get('points', type=int),
+            t_start=request.args.get('t_start', type=float),
+            t_end=request.args.get('t_end', type=float),
+            method=request.args.get('method', 'minmax')
+        ))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/result/<result_id>/csv')
+def result_csv(result_id):
+    """Export a stored result, or a time window of it, as CSV at full resolution.
+    
+    Rows are written in blocks so a memory-mapped result is streamed from
+    disk rather than loaded.
+    """
+    result = stored_result(result_id)
+    if result is None:
+        return jsonify({"error": "Unknown or expired result"}), 404
+    
+    window = time_window(result.time_points, request.args.get('t_start', type=float),
+                         request.args.get('t_end', type=float))
+    names = list(result.variables)
+    
+    def rows(block=65536):
+        yield ",".join(["time"] + names) + "\n"
+        for lo in range(window.start, window.stop, block):
+            hi = min(lo + block, window.stop)
+            columns = [result.time_points[lo:hi]] + [result.variables[name][lo:hi] for name in names]
+            buffer = io.StringIO()
+            np.savetxt(buffer, np.column_stack(columns), delimiter=",", fmt="%.9g")
+            yield buffer.getvalue()
+    
+    return Response(rows(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{result_id}.csv"'})
+
+def stored_result(result_id):
+    """Return a recent result, or reopen one from the out-of-core store."""
+    result = simulation_results.get(result_id)
+    if result is None:
+        result = result_store.open(result_id)
+        if result is not None:
+            simulation_results.put(result_id, result)
+    return result
+
+def decimate_for_response(result, max_points=None, t_start=None, t_end=None, method="minmax"):
+    """Reduce a result to the response point budget, never exceeding MAX_RESPONSE_POINTS."""
+    limit = app.config['MAX_RESPONSE_POINTS']
+    max_points = min(max_points, limit) if max_points else limit
+    return result.decimate(max_points, t_start=t_start, t_end=t_end, method=method)
+
+def result_response(result):
+    """Serialize a result as JSON or, if the client accepts it, binary columns."""
+    start = time.perf_counter()
+    # JSON is listed first so it wins ties such as */*
+    if request.accept_mimetypes.best_match(['application/json', COLUMNAR_MIME_TYPE]) != COLUMNAR_MIME_TYPE:
+        # Convert result to JSON for the frontend
+        response = jsonify(result.to_json())
+        record_serialization("json", start, response.content_length)
+        return response
+    
+    buffers = result.to_columnar(dtype=request.args.get('dtype', 'float64'))
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if 'gzip' in request.accept_encodings:
+        # Compress buffer by buffer so the columns are never joined in memory
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        buffers = [compressor.compress(buffer) for buffer in buffers] + [compressor.flush()]
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        headers['Content-Length'] = str(sum(len(buffer) for buffer in buffers))
+    record_serialization("columnar", start, sum(len(buffer) for buffer in buffers))
+    
+    return Response(buffers, mimetype=COLUMNAR_MIME_TYPE, headers=headers)
+
+def record_serialization(encoding, start, nbytes):
+    metrics.observe('response_serialization_seconds', time.perf_counter() - start, {"format": encoding})
+    metrics.observe('response_bytes', nbytes or 0, {"format": encoding})
+
+@app.route('/plot/<result_id>')
+def plot(result_id):
+    """Render a PNG plot of selected variables of a stored simulation result."""
+    result = stored_result(result_id)
+    if result is None:
+        return jsonify({"error": "Unknown or expired result"}), 404
+    
+    variables = request.args.get('variables')
+    variable_names = tuple(sorted(variables.split(','))) if variables else tuple(sorted(result.variables))
+    width = min(max(request.args.get('width', 1000, type=int), 100), 4000)
+    height = min(max(request.args.get('height', 600, type=int), 100), 4000)
+    
+    key = (result_id, variable_names, width, height)
+    image = plot_cache.get(key)
+    if image is None:
+        start = time.perf_counter()
+        image = result.render_png(list(variable_names), width, height)
+        metrics.observe('plot_render_seconds', time.perf_counter() - start)
+        plot_cache.put(key, image)
+    
+    return Response(image, mimetype='image/png')
+
+@app.route('/spectrum/<result_id>')
+def spectrum(result_id):
+    """Spectral analysis of stored result variables: spectrum, harmonics, THD and ripple.
+    
+    All variables share one frequency axis, reduced to at most max_points
+    bins while keeping every spectral peak.
+    """
+    result = stored_result(result_id)
+    if result is None:
+        return jsonify({"error": "Unknown or expired result"}), 404
+    
+    variables = request.args.get('variables')
+    names = variables.split(',') if variables else list(result.variables)
+    max_points = min(request.args.get('max_points', 2000, type=int), app.config['MAX_RESPONSE_POINTS'])
+    options = {
+        "window": request.args.get('window', 'hann'),
+        "t_start": request.args.get('t_start', type=float),
+        "t_end": request.args.get('t_end', type=float),
+        "fundamental": request.args.get('fundamental', type=float),
+        "harmonics": request.args.get('harmonics', 40, type=int),
+        "steady_fraction": request.args.get('steady_fraction', 0.5, type=float)
+    }
+    
+    try:
+        analyses = {name: result.spectrum(name, **options) for name in names}
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    frequencies = next(iter(analyses.values()))["frequencies"] if analyses else []
+    bins = decimation_indices(frequencies, [a["amplitudes"] for a in analyses.values()], max_points)
+    return jsonify({
+        "result_id": result_id,
+        "frequencies": frequencies[bins].tolist() if analyses else [],
+        "spectra": {
+            name: dict({k: v for k, v in analysis.items() if k not in ("frequencies", "amplitudes")},
+                       amplitudes=analysis["amplitudes"][bins].tolist())
+            for name, analysis in analyses.items()
+        }
+    })
+
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    """Run a parameter sweep or Monte Carlo tolerance analysis on the current circuit."""
+    current_circuit = circuit_store.get(session_owner())
     
     if not current_circuit:
-        return jsonify({"error": "No circuit to save"}), 400
+        return jsonify({"error": "No circuit to simulate"}), 400
+    
+    sweep_params = request.json
     
     try:
-        filename = request.json.get('filename', 'circuit.json')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        if 'grid' in sweep_params:
+            parameter_sets = expand_grid(sweep_params['grid'])
+        elif 'monte_carlo' in sweep_params:
+            monte_carlo = sweep_params['monte_carlo']
+            parameter_sets = monte_carlo_sets(
+                current_circuit,
+                monte_carlo['tolerances'],
+                monte_carlo.get('runs', 100),
+                distribution=monte_carlo.get('distribution', 'uniform'),
+                seed=monte_carlo.get('seed')
+            )
+        else:
+            return jsonify({"error": "Specify either 'grid' or 'monte_carlo'"}), 400
         
-        with open(filepath, 'w') as f:
-            json.dump(current_circuit.to_json(), f, indent=2)
+        if len(parameter_sets) > app.config['MAX_SWEEP_RUNS']:
+            return jsonify({"error": f"Sweep exceeds {app.config['MAX_SWEEP_RUNS']} runs"}), 400
+        
+        run_metrics, waveforms = run_sweep(
+            current_circuit,
+            parameter_sets,
+            end_time=sweep_params.get('end_time', app.config['MAX_SIMULATION_TIME']),
+            step_size=sweep_params.get('step_size', app.config['DEFAULT_STEP_SIZE']),
+            mode=sweep_params.get('mode', 'adaptive'),
+            keep_waveforms=sweep_params.get('waveforms', []),
+            max_workers=app.config['SWEEP_WORKERS']
+        )
         
-        return jsonify({"status": "success", "message": f"Saved as {filename}"})
+        return jsonify({
+            "parameter_sets": parameter_sets,
+            "metrics": run_metrics,
+            "waveforms": {str(index): decimate_for_response(result).to_json()
+                          for index, result in waveforms.items()}
+        })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/save_circuit', methods=['POST'])
+def save_circuit():
+    """Save the posted circuit, or the session's current circuit, to the library."""
+    circuit_data = request.json or {}
+    
+    try:
+        if 'components' in circuit_data:
+            # Value-only edits of the current circuit are applied to a copy, as in the editor
+            circuit = circuit_store.get(session_owner())
+            circuit = circuit.edited_from_json(circuit_data) if circuit is not None else None
+            circuit = circuit or Circuit.from_json(circuit_data)
+            circuit_store.set(session_owner(), circuit)
+        else:
+            circuit = circuit_store.get(session_owner())
+            if not circuit:
+                return jsonify({"success": False, "error": "No circuit to save"}), 400
+            if circuit_data.get('name'):
+                circuit = circuit.copy()
+                circuit.name = circuit_data['name']
+                circuit_store.set(session_owner(), circuit)
+        
+        circuit_library.save(circuit, topology=describe_topology(circuit))
+        return jsonify({"success": True, "status": "success", "id": circuit.id,
+                        "message": f"Saved as {circuit.name}"})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "message": str(e)}), 400
+
 @app.route('/load_circuit', methods=['POST'])
 def load_circuit():
     """Load circuit from file."""
-    global current_circuit
-    
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
     
@@ -99,7 +672,7 @@ def load_circuit():
     if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']:
         try:
             circuit_data = json.load(file)
-            current_circuit = Circuit.from_json(circuit_data)
+            circuit_store.set(session_owner(), Circuit.from_json(circuit_data))
             return jsonify({"status": "success", "circuit": circuit_data})
         
         except Exception as e:
@@ -107,6 +680,32 @@ def load_circuit():
     
     return jsonify({"error": "Invalid file format"}), 400
 
+@app.route('/get_circuits')
+def get_circuits():
+    """List saved circuits with their metadata, most recently modified first."""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    circuits = circuit_library.list(limit=limit, offset=offset, search=request.args.get('q'))
+    for circuit in circuits:
+        circuit["components_count"] = circuit["component_count"]
+        circuit["last_modified"] = circuit["modified"] * 1000  # milliseconds for JavaScript dates
+    return jsonify(circuits)
+
+@app.route('/get_circuit/<circuit_id>')
+def get_circuit(circuit_id):
+    """Load a saved circuit and make it the session's current circuit."""
+    circuit = circuit_library.load(circuit_id)
+    if circuit is None:
+        return jsonify({"success": False, "message": "Circuit not found"}), 404
+    
+    circuit_store.set(session_owner(), circuit)
+    return jsonify({"success": True, "circuit": circuit.to_json()})
+
+@app.route('/simulation')
+def simulation_page():
+    """Simulation page for the saved circuit given by the circuit_id argument."""
+    return render_template('simulation.html')
+
 @app.route('/component_library')
 def component_library():
     """Component library page."""
@@ -0,0 +1,279 @@
+# benchmarks/bench_pipeline.py
+"""Phase-by-phase benchmark of the simulation pipeline with regression checks.
+
+Every case builds a reference circuit from editor-style JSON and times
+building the model, solving, processing the results, serialising the
+response and rendering a plot.  It also records RHS evaluations, peak
+memory and response size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline                       # run and print
+    python -m benchmarks.bench_pipeline --output results.json # also write JSON
+    python -m benchmarks.bench_pipeline --save-baseline       # record a baseline
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json \\
+        --tolerance time=0.5 --tolerance peak_memory=0.2
+
+Comparing against a baseline exits with status 1 if any metric is worse
+than the baseline by more than its relative tolerance.  Timings depend on
+the machine, so record the baseline on the machine that runs the checks.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import scipy
+from scipy.integrate import solve_ivp
+from models.circuit import Circuit
+from models.simulation import SimulationResult
+from simulation.engine import build_circuit_model, _integration_options, _switched_solver
+from simulation.sampling import sampling_plan, sample_times
+from simulation.probes import select_probes
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+PHASES = ("build", "solve", "process", "decimate", "to_json", "plot")
+
+# Metrics compared against the baseline and their default relative tolerances
+DEFAULT_TOLERANCES = {
+    "time": 0.25,         # total and per-phase wall time
+    "nfev": 0.05,
+    "peak_memory": 0.25,
+    "response_bytes": 0.01,
+}
+
+TIME_NOISE_FLOOR = 1e-3  # seconds
+
+PLOT_VARIABLES = 4  # traces rendered in the plot phase, as a typical chart shows
+
+CONVERTER_FREQUENCIES = (10000, 50000, 200000)
+LADDER_SIZES = (10, 100, 1000, 5000)
+
+def _component(comp_id, component_type, **parameters):
+    return {"id": comp_id, "type": component_type, "name": comp_id, "parameters": parameters}
+
+def _circuit_json(circuit_id, name, components, connections):
+    """Return circuit JSON in the layout Circuit.to_json produces."""
+    return {"id": circuit_id, "name": name,
+            "components": {component["id"]: component for component in components},
+            "connections": [list(connection) for connection in connections]}
+
+def converter_json(topology, frequency):
+    """Return the editor JSON of a wired buck, boost or buck-boost converter."""
+    components = [
+        _component("V1", "voltage_source", voltage=12),
+        _component("Q1", "mosfet", rds_on=0.01),
+        _component("D1", "diode", forward_voltage=0.0),
+        _component("L1", "inductor", inductance=1e-4 * 10000 / frequency),
+        _component("C1", "capacitor", capacitance=1e-5 * 10000 / frequency),
+        _component("R1", "resistor", resistance=10),
+        _component("PWM", "pwm_source", amplitude=5, frequency=frequency, duty_cycle=0.4),
+    ]
+    common = [("C1", "t2", "V1", "negative"), ("R1", "t1", "C1", "t1"), ("R1", "t2", "V1", "negative"),
+              ("PWM", "output", "Q1", "gate"), ("PWM", "reference", "V1", "negative")]
+    if topology == "buck":
+        wiring = [("V1", "positive", "Q1", "drain"), ("Q1", "source", "L1", "t1"),
+                  ("D1", "cathode", "Q1", "source"), ("D1", "anode", "V1", "negative"),
+                  ("L1", "t2", "C1", "t1")]
+    elif topology == "boost":
+        wiring = [("V1", "positive", "L1", "t1"), ("L1", "t2", "Q1", "drain"),
+                  ("Q1", "source", "V1", "negative"), ("D1", "anode", "Q1", "drain"),
+                  ("D1", "cathode", "C1", "t1")]
+    else:
+        wiring = [("V1", "positive", "Q1", "drain"), ("Q1", "source", "L1", "t1"),
+                  ("L1", "t2", "V1", "negative"), ("D1", "cathode", "Q1", "source"),
+                  ("D1", "anode", "C1", "t1")]
+    return _circuit_json(f"{topology}-{frequency}", f"{topology} {frequency} Hz", components, wiring + common)
+
+def ladder_json(size):
+    """Return the editor JSON of an RLC ladder of about size components.
+
+    A source drives stages of series resistor and inductor with a shunt
+    capacitor, terminated by a load resistor.
+    """
+    stages = max(1, (size - 2) // 3)
+    components = [_component("V1", "voltage_source", voltage=1)]
+    connections = []
+    previous = ("V1", "positive")
+    for k in range(stages):
+        r, l, c = f"R{k}", f"L{k}", f"C{k}"
+        components += [_component(r, "resistor", resistance=1.0),
+                       _component(l, "inductor", inductance=1e-6),
+                       _component(c, "capacitor", capacitance=1e-6)]
+        connections += [(*previous, r, "t1"), (r, "t2", l, "t1"), (l, "t2", c, "t1"),
+                        (c, "t2", "V1", "negative")]
+        previous = (l, "t2")
+    components.append(_component("RL", "resistor", resistance=10.0))
+    connections += [(*previous, "RL", "t1"), ("RL", "t2", "V1", "negative")]
+    return _circuit_json(f"ladder-{size}", f"RLC ladder {len(components)}", components, connections)
+
+def benchmark_cases(quick=False):
+    """Return (name, circuit JSON, run settings) for every reference case."""
+    cases = []
+    frequencies = CONVERTER_FREQUENCIES[:1] if quick else CONVERTER_FREQUENCIES
+    for topology in ("buck", "boost", "buck_boost"):
+        for frequency in frequencies:
+            period = 1.0 / frequency
+            for mode in ("adaptive", "piecewise_linear"):
+                settings = {"end_time": 50 * period, "step_size": period / 100, "mode": mode}
+                cases.append((f"{topology}-{frequency // 1000}k-{mode}", converter_json(topology, frequency), settings))
+    for size in (LADDER_SIZES[:2] if quick else LADDER_SIZES):
+        settings = {"end_time": 2e-5, "step_size": 1e-8, "mode": "adaptive"}
+        cases.append((f"ladder-{size}", ladder_json(size), settings))
+    return cases
+
+def run_case(circuit_data, end_time, step_size, mode, max_points=10000, plot=True):
+    """Run one case through the pipeline phases and return its metrics."""
+    timings = {}
+
+    def timed(phase, function, *args, **kwargs):
+        start = time.perf_counter()
+        value = function(*args, **kwargs)
+        timings[phase] = time.perf_counter() - start
+        return value
+
+    circuit = Circuit.from_json(circuit_data)
+    model = timed("build", build_circuit_model, circuit.components, circuit.connections,
+                  node_index=circuit.node_index())
+    step, count, _ = sampling_plan(end_time, step_size)
+    t_eval = sample_times(step, count)
+    initial_state = model.get_initial_state()
+
+    if mode == "adaptive":
+        rhs, options, _ = _integration_options(model, end_time)
+        solution = timed("solve", solve_ivp, rhs, (0, end_time), initial_state, t_eval=t_eval, **options)
+        t, y, nfev = solution.t, solution.y, solution.nfev
+    else:
+        solver = _switched_solver(model, mode)
+        t, y, _ = timed("solve", solver.solve, t_eval, end_time, initial_state)
+        nfev = 0
+
+    variables = timed("process", lambda: select_probes(model.process_results(t, y)))
+    result = SimulationResult(t, variables, circuit.id)
+    reduced = timed("decimate", result.decimate, max_points)
+    body = timed("to_json", lambda: json.dumps(reduced.to_json()).encode("utf-8"))
+    if plot:
+        timed("plot", result.render_png, list(variables)[:PLOT_VARIABLES])
+
+    return {
+        "model": type(model).__name__,
+        "components": len(circuit.components),
+        "states": len(initial_state),
+        "samples": len(t),
+        "nfev": int(nfev),
+        "response_bytes": len(body),
+        "time": sum(timings.values()),
+        "phases": timings,
+    }
+
+def measure(circuit_data, settings, repeat=3, plot=True):
+    """Best-of-repeat timings of a warmed-up case, plus its peak traced memory in a separate run."""
+    # A discarded first run warms the imports, topology memo and plotting backend
+    run_case(circuit_data, plot=plot, **settings)
+    runs = [run_case(circuit_data, plot=plot, **settings) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run["time"])
+    best["phases"] = {phase: min(run["phases"][phase] for run in runs if phase in run["phases"])
+                      for phase in PHASES if phase in best["phases"]}
+    best["time"] = sum(best["phases"].values())
+
+    # Tracing slows Python code down, so memory is measured in its own run
+    tracemalloc.start()
+    try:
+        run_case(circuit_data, plot=plot, **settings)
+        best["peak_memory"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best
+
+def compare(results, baseline, tolerances):
+    """Return a list of regressions of results against baseline.
+
+    Timing differences below TIME_NOISE_FLOOR seconds are ignored, so very
+    short phases do not fail on scheduler jitter.
+    """
+    regressions = []
+    for name, metrics in results["cases"].items():
+        reference = baseline.get("cases", {}).get(name)
+        if reference is None:
+            continue
+        checks = [(metric, metrics.get(metric), reference.get(metric)) for metric in tolerances]
+        checks += [(f"time.{phase}", metrics["phases"].get(phase), reference.get("phases", {}).get(phase))
+                   for phase in PHASES]
+        for metric, value, expected in checks:
+            if value is None or expected is None:
+                continue
+            kind = metric.split(".")[0]
+            if kind == "time" and value - expected < TIME_NOISE_FLOOR:
+                continue
+            if value > expected * (1 + tolerances[kind]):
+                regressions.append({"case": name, "metric": metric, "value": value, "baseline": expected,
+                                    "change": value / expected - 1 if expected else float("inf")})
+    return regressions
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "platform": platform.platform(), "processor": platform.processor()}
+
+def parse_tolerances(entries):
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for entry in entries or []:
+        metric, _, value = entry.partition("=")
+        if metric not in DEFAULT_TOLERANCES:
+            raise SystemExit(f"Unknown metric '{metric}', expected one of {', '.join(DEFAULT_TOLERANCES)}")
+        tolerances[metric] = float(value)
+    return tolerances
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="run a reduced set of cases")
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--no-plot", action="store_true", help="skip the plot rendering phase")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE,
+                        help=f"write the results as the new baseline (default {DEFAULT_BASELINE})")
+    parser.add_argument("--tolerance", action="append", metavar="METRIC=FRACTION",
+                        help="allowed relative increase of a metric: " + ", ".join(
+                            f"{metric}={value}" for metric, value in DEFAULT_TOLERANCES.items()))
+    args = parser.parse_args(argv)
+    tolerances = parse_tolerances(args.tolerance)
+
+    results = {"environment": environment(), "cases": {}}
+    print(f"{'case':<34}{'model':>20}{'samples':>9}{'nfev':>8}{'total':>10}"
+          + "".join(f"{phase:>10}" for phase in PHASES) + f"{'peak':>9}{'bytes':>10}")
+    for name, circuit_data, settings in benchmark_cases(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        metrics = measure(circuit_data, settings, repeat=args.repeat, plot=not args.no_plot)
+        metrics["settings"] = settings
+        results["cases"][name] = metrics
+        phases = "".join(f"{1e3 * metrics['phases'][phase]:>8.1f}ms" if phase in metrics["phases"] else f"{'-':>10}"
+                         for phase in PHASES)
+        print(f"{name:<34}{metrics['model']:>20}{metrics['samples']:>9}{metrics['nfev']:>8}"
+              f"{1e3 * metrics['time']:>8.1f}ms{phases}{metrics['peak_memory'] / 2**20:>7.1f}MB"
+              f"{metrics['response_bytes']:>10}")
+        sys.stdout.flush()
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, tolerances)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} {regression['metric']}: "
+                  f"{regression['value']:.6g} vs baseline {regression['baseline']:.6g} "
+                  f"({100 * regression['change']:+.1f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
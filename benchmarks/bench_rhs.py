@@ -0,0 +1,43 @@
+# benchmarks/bench_rhs.py
+"""Per-call cost of the converter RHS before and after compilation.
+
+Run from the repository root:  python -m benchmarks.bench_rhs
+"""
+import timeit
+import numpy as np
+from models.circuit import Circuit
+from models.component import MOSFET, Diode, Inductor, Capacitor, VoltageSource, Resistor, PWMSource
+from simulation.components.converters import BuckConverter, BoostConverter, BuckBoostConverter
+from simulation.compiled import compile_model
+
+MODELS = (BuckConverter, BoostConverter, BuckBoostConverter)
+
+def converter_circuit():
+    """Return a circuit holding the parts every converter model looks for."""
+    circuit = Circuit("benchmark")
+    for component in (MOSFET(name="Q1"), Diode(name="D1"), Inductor(1e-4, name="L1"),
+                      Capacitor(1e-5, name="C1"), VoltageSource(12, name="V1"),
+                      Resistor(10, name="R1"), PWMSource(5, 10000, 0.4, name="PWM")):
+        circuit.add_component(component)
+    return circuit
+
+def time_per_call(function, calls):
+    """Return the best per-call time in microseconds over a few repeats."""
+    # Sample the switch-on, switch-off and diode-blocking branches
+    samples = [(2e-5, np.array([1.0, 5.0])), (7e-5, np.array([1.0, 5.0])), (7e-5, np.array([0.0, 5.0]))]
+    best = min(timeit.repeat(lambda: [function(t, y) for t, y in samples], number=calls, repeat=5))
+    return 1e6 * best / (calls * len(samples))
+
+def main(calls=20000):
+    circuit = converter_circuit()
+    print(f"{'model':<20}{'derivatives':>14}{'compiled':>12}{'symbolic':>12}{'speedup':>10}")
+    for model_class in MODELS:
+        model = model_class(circuit.components, circuit.connections)
+        baseline = time_per_call(model.derivatives, calls)
+        compiled = time_per_call(compile_model(model).rhs, calls)
+        symbolic = time_per_call(compile_model(model, symbolic=True).rhs, calls)
+        print(f"{model_class.__name__:<20}{baseline:>12.2f}us{compiled:>10.2f}us"
+              f"{symbolic:>10.2f}us{baseline / compiled:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,45 @@
+import os
+
 class Config:
     SECRET_KEY = 'your-secret-key-here'  # Change this to a random string in production
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'json', 'xml'}
     DEBUG = True
+    # Saved circuits and per-session working circuits
+    CIRCUIT_LIBRARY_PATH = 'uploads/circuits.db'
+    MAX_SESSIONS = 1000
     # Simulation settings
     MAX_SIMULATION_TIME = 1.0  # seconds
     DEFAULT_STEP_SIZE = 1e-6   # seconds
-    MAX_ITERATIONS = 10000
\ No newline at end of file
+    MAX_ITERATIONS = 10000
+    # Output samples: default sampling policy and the per-run sample budget
+    SAMPLING_POLICY = 'budget'
+    MAX_OUTPUT_SAMPLES = 1000000
+    # Parameter sweeps
+    SWEEP_WORKERS = None  # worker processes, defaults to the number of CPUs
+    MAX_SWEEP_RUNS = 10000
+    # Background simulation jobs
+    JOB_WORKERS = 2         # concurrent simulations
+    JOB_RESULT_TTL = 600    # seconds a finished job is kept
+    MAX_QUEUED_JOBS = 100
+    # Response size: waveforms are decimated to at most this many samples
+    MAX_RESPONSE_POINTS = 10000
+    # Streaming: samples integrated per chunk and points sent per chunk
+    STREAM_CHUNK_SAMPLES = 50000
+    STREAM_CHUNK_POINTS = 2000
+    # Content-addressed cache of simulation results
+    RESULT_CACHE_BYTES = 256 * 2**20       # memory tier
+    RESULT_CACHE_DISK = True               # spill to UPLOAD_FOLDER/result_cache
+    RESULT_CACHE_DISK_BYTES = 2 * 2**30
+    # Out-of-core results, memory-mapped from UPLOAD_FOLDER/results
+    RESULT_STORE_BYTES = 20 * 2**30
+    MAX_STORED_SAMPLES = 500000000
+    # Per-request sampling profiler ("profile": true in /simulate), off unless
+    # the ALLOW_PROFILING environment variable is set, e.g. for development
+    ALLOW_PROFILING = os.environ.get('ALLOW_PROFILING', '').lower() in ('1', 'true', 'yes')
+    PROFILER_INTERVAL = 0.002  # seconds between stack samples
+    # Simulation models kept per editor session for incremental re-runs
+    MODEL_SESSIONS = 64
+    # Result and plot caches
+    RESULT_STORE_SIZE = 32  # simulation results kept for on-demand plots
+    PLOT_CACHE_SIZE = 128   # rendered PNG images
@@ -1,28 +1,114 @@
 # models/circuit.py
+import copy
 import json
 import uuid
 
+def _indexable(connection):
+    """Return True for a (component1_id, terminal1, component2_id, terminal2) connection."""
+    return isinstance(connection, (list, tuple)) and len(connection) == 4
+
+def _canonical(value):
+    """Return a JSON dump of value that compares equal for equal contents."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
 class Circuit:
-    """Circuit model representing a complete power electronics circuit."""
+    """Circuit model representing a complete power electronics circuit.
+    
+    Alongside the components the circuit keeps a connectivity index: the set
+    of connections, the connections of each component, and a union-find
+    structure merging connected (component_id, terminal) pairs into
+    electrical nodes.  connect, disconnect and membership tests are O(1);
+    connect merges nodes incrementally, while removals mark the nodes for a
+    rebuild on the next query.  Edit the circuit through these methods so the
+    index stays current.
+    """
     
     def __init__(self, name="Untitled Circuit"):
         self.id = str(uuid.uuid4())
         self.name = name
         self.components = {}  # component_id -> Component
-        self.connections = []  # list of (component1_id, terminal1, component2_id, terminal2)
-        
+        self._connections = {}  # (component1_id, terminal1, component2_id, terminal2) -> None, in order
+        self._unindexed = []  # connections in other formats, kept for serialisation only
+        self._adjacency = {}  # component_id -> set of connections touching it
+        self._parent = {}  # (component_id, terminal) -> union-find parent
+        self._nodes_stale = False
+        self._node_numbers = None
+    
+    @property
+    def connections(self):
+        """List of (component1_id, terminal1, component2_id, terminal2) connections."""
+        return list(self._connections)
+    
+    @connections.setter
+    def connections(self, connections):
+        self._connections = {}
+        self._unindexed = []
+        self._adjacency = {}
+        for connection in connections:
+            if _indexable(connection):
+                self._index_connection(tuple(connection))
+            else:
+                self._unindexed.append(connection)
+        self._invalidate_nodes(rebuild=True)
+    
+    def _index_connection(self, connection):
+        self._connections[connection] = None
+        self._adjacency.setdefault(connection[0], set()).add(connection)
+        self._adjacency.setdefault(connection[2], set()).add(connection)
+    
+    def _unindex_connection(self, connection):
+        del self._connections[connection]
+        for comp_id in (connection[0], connection[2]):
+            adjacent = self._adjacency.get(comp_id)
+            if adjacent is not None:
+                adjacent.discard(connection)
+    
+    def _invalidate_nodes(self, rebuild=False):
+        self._node_numbers = None
+        if rebuild:
+            self._nodes_stale = True
+    
+    def _find(self, key):
+        parent = self._parent
+        if key not in parent:
+            parent[key] = key
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+    
+    def _union(self, a, b):
+        self._parent[self._find(a)] = self._find(b)
+    
+    def _rebuild_nodes(self):
+        self._parent = {}
+        for comp_id, component in self.components.items():
+            for terminal in component.terminals:
+                self._parent[(comp_id, terminal)] = (comp_id, terminal)
+        for comp1_id, terminal1, comp2_id, terminal2 in self._connections:
+            a, b = (comp1_id, terminal1), (comp2_id, terminal2)
+            if a in self._parent and b in self._parent:
+                self._union(a, b)
+        self._nodes_stale = False
+    
     def add_component(self, component):
         """Add a component to the circuit."""
         self.components[component.id] = component
+        self._adjacency.setdefault(component.id, set())
+        for terminal in component.terminals:
+            self._parent.setdefault((component.id, terminal), (component.id, terminal))
+        self._invalidate_nodes()
         return component.id
     
     def remove_component(self, component_id):
         """Remove a component from the circuit."""
         if component_id in self.components:
             # Remove all connections to this component
-            self.connections = [conn for conn in self.connections 
-                               if conn[0] != component_id and conn[2] != component_id]
+            for connection in list(self._adjacency.get(component_id, ())):
+                self._unindex_connection(connection)
+            self._adjacency.pop(component_id, None)
             del self.components[component_id]
+            self._invalidate_nodes(rebuild=True)
             return True
         return False
     
@@ -38,28 +124,144 @@ class Circuit:
             
             if terminal1 in comp1.terminals and terminal2 in comp2.terminals:
                 connection = (component1_id, terminal1, component2_id, terminal2)
-                if connection not in self.connections:
-                    self.connections.append(connection)
+                if connection not in self._connections:
+                    self._index_connection(connection)
+                    if not self._nodes_stale:
+                        self._union((component1_id, terminal1), (component2_id, terminal2))
+                    self._invalidate_nodes()
                     return True
         return False
     
     def disconnect(self, component1_id, terminal1, component2_id, terminal2):
         """Disconnect two component terminals."""
         connection = (component1_id, terminal1, component2_id, terminal2)
-        if connection in self.connections:
-            self.connections.remove(connection)
+        if connection in self._connections:
+            self._unindex_connection(connection)
+            self._invalidate_nodes(rebuild=True)
             return True
         return False
     
-    def to_json(self):
-        """Convert circuit to JSON representation."""
-        return {
+    def is_connected(self, component1_id, terminal1, component2_id, terminal2):
+        """Return True if the two terminals share an electrical node."""
+        return self.node_of(component1_id, terminal1) == self.node_of(component2_id, terminal2)
+    
+    def component_connections(self, component_id):
+        """Return the connections touching a component."""
+        return list(self._adjacency.get(component_id, ()))
+    
+    def neighbors(self, component_id):
+        """Return the ids of components wired directly to a component."""
+        return {comp_id
+                for connection in self._adjacency.get(component_id, ())
+                for comp_id in (connection[0], connection[2])
+                if comp_id != component_id}
+    
+    def node_index(self):
+        """Return a dict mapping every (component_id, terminal) to an electrical node number.
+        
+        Node numbers follow the order of components and terminals; terminals
+        that are not connected to anything get a node of their own.  The
+        mapping is cached until the circuit is edited.
+        """
+        if self._node_numbers is None:
+            if self._nodes_stale:
+                self._rebuild_nodes()
+            numbers = {}
+            self._node_numbers = {
+                (comp_id, terminal): numbers.setdefault(self._find((comp_id, terminal)), len(numbers))
+                for comp_id, component in self.components.items()
+                for terminal in component.terminals
+            }
+        return self._node_numbers
+    
+    def node_of(self, component_id, terminal):
+        """Return the node number of a component terminal."""
+        return self.node_index()[(component_id, terminal)]
+    
+    def nodes(self):
+        """Return the electrical nodes as lists of (component_id, terminal) pairs."""
+        grouped = {}
+        for key, node in self.node_index().items():
+            grouped.setdefault(node, []).append(key)
+        return [grouped[node] for node in sorted(grouped)]
+    
+    def to_json(self, compact=False):
+        """Convert circuit to JSON representation.
+        
+        With compact, connections are replaced by the electrical nodes that
+        join two or more terminals, which is smaller for densely wired nodes
+        and is accepted back by from_json.
+        """
+        data = {
             "id": self.id,
             "name": self.name,
             "components": {id: comp.to_json() for id, comp in self.components.items()},
-            "connections": self.connections
         }
+        if compact:
+            data["nodes"] = [[list(key) for key in node] for node in self.nodes() if len(node) > 1]
+        else:
+            data["connections"] = self.connections + self._unindexed
+        return data
     
+    def update_from_json(self, data):
+        """Apply an edited JSON representation of this circuit in place if only values changed.
+
+        When data has this circuit's id, components (ids, types and
+        terminals) and connections, the components whose parameters, name or
+        placement differ are replaced by new objects built from data and the
+        connectivity index is kept.  Connections in other formats, such as
+        the editor's connection objects, are compared by content.  Returns True if the circuit was updated,
+        or False, leaving it untouched, if data describes a structurally
+        different circuit, which should be loaded with from_json instead.
+        """
+        from models.component import create_component_from_json
+
+        components = data.get("components", {})
+        connections = data.get("connections")
+        if (data.get("id", self.id) != self.id or connections is None or
+                list(components) != list(self.components)):
+            return False
+        for comp_id, comp_data in components.items():
+            component = self.components[comp_id]
+            if (comp_data.get("type", "").lower() != component.type or
+                    list(comp_data.get("terminals", component.terminals)) != list(component.terminals)):
+                return False
+        indexed = [tuple(c) for c in connections if _indexable(c)]
+        unindexed = [c for c in connections if not _indexable(c)]
+        if (len(indexed) != len(self._connections) or any(c not in self._connections for c in indexed) or
+                sorted(map(_canonical, unindexed)) != sorted(map(_canonical, self._unindexed))):
+            return False
+
+        self.name = data.get("name", self.name)
+        for comp_id, comp_data in components.items():
+            component = self.components[comp_id]
+            if (comp_data.get("parameters", {}) != component.parameters or
+                    comp_data.get("name", component.name) != component.name or
+                    _canonical(comp_data.get("position", component.position)) != _canonical(component.position) or
+                    comp_data.get("rotation", component.rotation) != component.rotation):
+                self.components[comp_id] = create_component_from_json(comp_data)
+        return True
+
+    def copy(self):
+        """Return a copy sharing the component objects, with its own component map and connectivity index."""
+        circuit = copy.copy(self)
+        circuit.components = dict(self.components)
+        circuit._connections = dict(self._connections)
+        circuit._unindexed = list(self._unindexed)
+        circuit._adjacency = {comp_id: set(connections) for comp_id, connections in self._adjacency.items()}
+        circuit._parent = dict(self._parent)
+        return circuit
+
+    def edited_from_json(self, data):
+        """Return a copy of this circuit with update_from_json applied, or None.
+
+        This circuit is left untouched, so a simulation still reading it
+        never sees a half-applied edit; None means data describes a
+        structurally different circuit, to be loaded with from_json.
+        """
+        circuit = self.copy()
+        return circuit if circuit.update_from_json(data) else None
+
     @classmethod
     def from_json(cls, data):
         """Create circuit from JSON representation."""
@@ -73,7 +275,14 @@ class Circuit:
             component = create_component_from_json(comp_data)
             circuit.components[comp_id] = component
         
-        # Add connections
-        circuit.connections = data.get("connections", [])
+        # Add connections, or a star of connections per node in the compact form
+        if "connections" in data or "nodes" not in data:
+            circuit.connections = data.get("connections", [])
+        else:
+            circuit.connections = [
+                (node[0][0], node[0][1], comp_id, terminal)
+                for node in data["nodes"]
+                for comp_id, terminal in node[1:]
+            ]
         
-        return circuit
\ No newline at end of file
+        return circuit
@@ -0,0 +1,216 @@
+# models/circuit_library.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from models.circuit import Circuit
+from simulation.cache import LRUCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS circuits (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    component_count INTEGER NOT NULL,
+    connection_count INTEGER NOT NULL,
+    component_types TEXT NOT NULL,
+    topology TEXT,
+    source TEXT,
+    created REAL NOT NULL,
+    modified REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS circuits_modified ON circuits (modified DESC);
+CREATE INDEX IF NOT EXISTS circuits_name ON circuits (name COLLATE NOCASE);
+CREATE UNIQUE INDEX IF NOT EXISTS circuits_source ON circuits (source) WHERE source IS NOT NULL;
+CREATE TABLE IF NOT EXISTS session_circuits (
+    session_id TEXT PRIMARY KEY,
+    revision TEXT NOT NULL,
+    modified REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS session_circuits_modified ON session_circuits (modified DESC);
+"""
+
+LISTING_COLUMNS = ("id", "name", "component_count", "connection_count",
+                   "component_types", "topology", "created", "modified")
+
+class CircuitLibrary:
+    """Persistent, indexed library of saved circuits in a SQLite database.
+
+    Listing reads only the indexed metadata columns, so it stays fast with
+    tens of thousands of circuits; the circuit JSON is parsed only when a
+    circuit is loaded.  Each thread uses its own connection and the database
+    runs in WAL mode, so several worker processes can share one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, circuit, topology=None, source=None):
+        """Insert or update a circuit and return its id."""
+        data = circuit.to_json()
+        component_types = {}
+        for component in circuit.components.values():
+            component_types[component.type] = component_types.get(component.type, 0) + 1
+
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                """INSERT INTO circuits (id, name, component_count, connection_count, component_types,
+                                         topology, source, created, modified, data)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (id) DO UPDATE SET
+                       name = excluded.name,
+                       component_count = excluded.component_count,
+                       connection_count = excluded.connection_count,
+                       component_types = excluded.component_types,
+                       topology = excluded.topology,
+                       source = COALESCE(circuits.source, excluded.source),
+                       modified = excluded.modified,
+                       data = excluded.data""",
+                (circuit.id, circuit.name, len(circuit.components), len(circuit.connections),
+                 json.dumps(component_types), topology, source, now, now, json.dumps(data))
+            )
+        return circuit.id
+
+    def list(self, limit=100, offset=0, search=None):
+        """Return metadata of saved circuits, most recently modified first."""
+        query = f"SELECT {', '.join(LISTING_COLUMNS)} FROM circuits"
+        parameters = []
+        if search:
+            query += " WHERE name LIKE ? COLLATE NOCASE"
+            parameters.append(f"%{search}%")
+        query += " ORDER BY modified DESC LIMIT ? OFFSET ?"
+        parameters += [limit, offset]
+
+        rows = self._connection().execute(query, parameters).fetchall()
+        return [dict(row, component_types=json.loads(row["component_types"])) for row in rows]
+
+    def count(self, search=None):
+        """Return the number of saved circuits, optionally matching a name."""
+        if search:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM circuits WHERE name LIKE ? COLLATE NOCASE", (f"%{search}%",)
+            ).fetchone()
+        else:
+            row = self._connection().execute("SELECT COUNT(*) FROM circuits").fetchone()
+        return row[0]
+
+    def load(self, circuit_id):
+        """Return the saved circuit with the given id, or None."""
+        row = self._connection().execute("SELECT data FROM circuits WHERE id = ?", (circuit_id,)).fetchone()
+        if row is None:
+            return None
+        return Circuit.from_json(json.loads(row["data"]))
+
+    def delete(self, circuit_id):
+        """Delete a saved circuit; return True if it existed."""
+        with self._connection() as connection:
+            cursor = connection.execute("DELETE FROM circuits WHERE id = ?", (circuit_id,))
+        return cursor.rowcount > 0
+
+    def import_directory(self, directory, describe=None):
+        """Index loose circuit JSON files from a directory, once per file.
+
+        describe(circuit) may return the topology to record.  Files that are
+        already indexed or that do not hold a circuit are skipped; returns the
+        number of circuits imported.
+        """
+        known = {row[0] for row in self._connection().execute(
+            "SELECT source FROM circuits WHERE source IS NOT NULL")}
+        imported = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".json") or entry.path in known:
+                continue
+            try:
+                with open(entry.path) as f:
+                    data = json.load(f)
+                if not isinstance(data, dict) or "components" not in data:
+                    continue
+                circuit = Circuit.from_json(data)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                continue
+            self.save(circuit, topology=describe(circuit) if describe else None, source=entry.path)
+            imported += 1
+        return imported
+
+class SessionCircuitStore:
+    """Map from browser session to that session's working circuit.
+
+    Circuits are kept in the session_circuits table of a CircuitLibrary's
+    database, so every worker process sees a session's latest circuit.
+    Parsed circuits of recently used sessions are cached in an LRU and
+    served while their stored revision is unchanged, so a read costs one
+    indexed lookup instead of parsing the circuit JSON.  Sessions beyond
+    max_sessions are dropped least recently written first.  A stored
+    circuit is shared by the requests of its session: replace it with set
+    rather than editing it in place.
+    """
+
+    def __init__(self, library, max_sessions=1000):
+        self.library = library
+        self.max_sessions = max_sessions
+        self._circuits = LRUCache(maxsize=max_sessions)  # session_id -> (revision, circuit)
+
+    def get(self, session_id):
+        """Return the session's working circuit, or None."""
+        connection = self.library._connection()
+        row = connection.execute("SELECT revision FROM session_circuits WHERE session_id = ?",
+                                 (session_id,)).fetchone()
+        if row is None:
+            return None
+        cached = self._circuits.get(session_id)
+        if cached is not None and cached[0] == row["revision"]:
+            return cached[1]
+
+        row = connection.execute("SELECT revision, data FROM session_circuits WHERE session_id = ?",
+                                 (session_id,)).fetchone()
+        if row is None:
+            return None
+        circuit = Circuit.from_json(json.loads(row["data"]))
+        self._circuits.put(session_id, (row["revision"], circuit))
+        return circuit
+
+    def set(self, session_id, circuit):
+        """Store circuit as the session's working circuit; None forgets it."""
+        if circuit is None:
+            with self.library._connection() as connection:
+                connection.execute("DELETE FROM session_circuits WHERE session_id = ?", (session_id,))
+            return
+        revision = uuid.uuid4().hex
+        with self.library._connection() as connection:
+            connection.execute(
+                """INSERT INTO session_circuits (session_id, revision, modified, data) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (session_id) DO UPDATE SET
+                       revision = excluded.revision,
+                       modified = excluded.modified,
+                       data = excluded.data""",
+                (session_id, revision, time.time(), json.dumps(circuit.to_json()))
+            )
+            connection.execute(
+                """DELETE FROM session_circuits WHERE session_id IN (
+                       SELECT session_id FROM session_circuits ORDER BY modified DESC LIMIT -1 OFFSET ?)""",
+                (self.max_sessions,)
+            )
+        self._circuits.put(session_id, (revision, circuit))
+
+    def __len__(self):
+        return self.library._connection().execute("SELECT COUNT(*) FROM session_circuits").fetchone()[0]
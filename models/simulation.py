@@ -1,57 +1,188 @@
 # models/simulation.py
 import json
+import struct
+import uuid
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from io import BytesIO
 import base64
+from simulation.decimation import decimation_indices, minmax_indices, time_window
+from simulation.spectral import analysis_window, spectrum
+
+# Binary columnar result encoding, negotiated through the Accept header
+COLUMNAR_MIME_TYPE = "application/x-simulation-columnar"
+COLUMNAR_DTYPES = ("float32", "float64")
 
 class SimulationResult:
     """Class to store and process simulation results."""
     
-    def __init__(self, time_points, variables, circuit_id):
+    def __init__(self, time_points, variables, circuit_id, metadata=None):
+        self.id = str(uuid.uuid4())
         self.time_points = time_points
         self.variables = variables  # dict of variable_name -> array of values
         self.circuit_id = circuit_id
+        self.metadata = metadata or {}  # solver statistics and run settings
+        self._spectra = {}  # memoised spectral analyses
         
     def get_variable(self, name):
         """Get simulation data for a specific variable."""
         return self.variables.get(name)
     
-    def plot(self, variable_names=None):
-        """Generate plot for specified variables."""
+    def decimate(self, max_points, t_start=None, t_end=None, method="minmax"):
+        """Return a reduced copy of the result for transfer or plotting.
+        
+        Samples are restricted to [t_start, t_end] and reduced to at most
+        max_points on a shared time axis, keeping each signal's per-bucket
+        extrema ("minmax") or its visually dominant points ("lttb").  A window
+        holding no more than max_points samples comes back at full resolution.
+        The copy keeps this result's id so it can still be used for plots.
+        """
+        window = time_window(self.time_points, t_start, t_end)
+        time_points = self.time_points[window]
+        variables = {name: np.asarray(values)[window] for name, values in self.variables.items()}
+        indices = decimation_indices(time_points, list(variables.values()), max_points, method)
+        
+        metadata = dict(self.metadata, decimation={
+            "method": method,
+            "source_points": len(time_points),
+            "points": len(indices),
+            "t_start": float(time_points[0]) if len(time_points) else None,
+            "t_end": float(time_points[-1]) if len(time_points) else None,
+        })
+        reduced = SimulationResult(time_points[indices],
+                                   {name: values[indices] for name, values in variables.items()},
+                                   self.circuit_id, metadata=metadata)
+        reduced.id = self.id
+        return reduced
+    
+    def spectrum(self, name, window="hann", t_start=None, t_end=None, fundamental=None,
+                 harmonics=40, steady_fraction=0.5):
+        """Return the spectral analysis of one variable (see simulation.spectral).
+        
+        The fundamental defaults to the switching frequency recorded in the
+        metadata, and the analysed span to a whole number of its periods at
+        the end of the run.  Results are memoised on the result.
+        """
+        if name not in self.variables:
+            raise KeyError(f"Unknown variable '{name}'")
+        fundamental = fundamental or self.metadata.get("switching_frequency")
+        key = (name, window, t_start, t_end, fundamental, harmonics, steady_fraction)
+        if key not in self._spectra:
+            span = analysis_window(self.time_points, fundamental, t_start, t_end, steady_fraction)
+            self._spectra[key] = spectrum(self.time_points[span], np.asarray(self.variables[name])[span],
+                                          window=window, fundamental=fundamental, harmonics=harmonics)
+        return self._spectra[key]
+    
+    def render_png(self, variable_names=None, width=1000, height=600):
+        """Render the specified variables to PNG bytes at the given pixel size.
+        
+        Each trace is decimated to per-pixel minima and maxima first, so the
+        cost depends on the image width rather than the number of samples.
+        """
         if variable_names is None:
             variable_names = list(self.variables.keys())
         
-        plt.figure(figsize=(10, 6))
+        dpi = 100
+        figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        axes = figure.subplots()
         for name in variable_names:
             if name in self.variables:
-                plt.plot(self.time_points, self.variables[name], label=name)
+                values = np.asarray(self.variables[name])
+                index = minmax_indices(values, width)
+                axes.plot(self.time_points[index], values[index], label=name)
         
-        plt.xlabel('Time (s)')
-        plt.ylabel('Value')
-        plt.grid(True)
-        plt.legend()
+        axes.set_xlabel('Time (s)')
+        axes.set_ylabel('Value')
+        axes.grid(True)
+        axes.legend()
         
-        # Convert plot to base64 for embedding in HTML
         buffer = BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
-        
+        figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+    
+    def plot(self, variable_names=None, width=1000, height=600):
+        """Generate plot for specified variables as a base64 data URI."""
+        image_base64 = base64.b64encode(self.render_png(variable_names, width, height)).decode('utf-8')
         return f"data:image/png;base64,{image_base64}"
     
     def to_json(self):
-        """Convert simulation results to JSON."""
+        """Convert simulation results to JSON.
+        
+        Plots are not included; they are rendered on demand from the result id.
+        """
         # Convert numpy arrays to lists for JSON serialization
         result = {
+            "result_id": self.id,
             "circuit_id": self.circuit_id,
             "time_points": self.time_points.tolist(),
             "variables": {k: v.tolist() for k, v in self.variables.items()},
-            # Generate plots for all variables
-            "plots": {
-                "all": self.plot(),
-                "individual": {var: self.plot([var]) for var in self.variables}
-            }
+            "metadata": self.metadata
         }
-        return result
\ No newline at end of file
+        return result
+    
+    def to_columnar(self, dtype="float64"):
+        """Encode the result as a binary columnar payload.
+        
+        Layout: a little-endian uint32 header length, a UTF-8 JSON header, zero
+        padding up to an 8-byte boundary, then one contiguous little-endian
+        column per signal (time first) in the header's column order.  Each
+        column entry gives its name, byte offset from the start of the data
+        section and number of values, so a client can view every column as a
+        typed array without copying.
+        
+        Returns a list of buffers to be written out in order; columns already
+        stored with the requested dtype are passed through as memoryviews of the
+        NumPy arrays rather than copied.
+        """
+        if dtype not in COLUMNAR_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {COLUMNAR_DTYPES}")
+        
+        arrays = [("time", self.time_points)] + list(self.variables.items())
+        columns = []
+        buffers = []
+        offset = 0
+        for name, values in arrays:
+            values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+            columns.append({"name": name, "offset": offset, "length": len(values)})
+            buffers.append(memoryview(values).cast("B"))
+            offset += values.nbytes
+        
+        header = json.dumps({
+            "result_id": self.id,
+            "circuit_id": self.circuit_id,
+            "dtype": dtype,
+            "columns": columns,
+            "metadata": self.metadata
+        }).encode("utf-8")
+        # Pad so the data section starts 8-byte aligned for Float64Array views
+        header += b" " * (-(len(header) + 4) % 8)
+        return [struct.pack("<I", len(header)), header] + buffers
+
+class BatchSimulationResult:
+    """Simulation results for several parameter variants sharing one time axis."""
+    
+    def __init__(self, time_points, variables, circuit_id, parameter_sets, metadata=None):
+        self.time_points = time_points
+        self.variables = variables  # dict of variable_name -> (n_variants, n_samples) array
+        self.circuit_id = circuit_id
+        self.parameter_sets = parameter_sets
+        self.metadata = metadata or {}
+    
+    def __len__(self):
+        return len(self.parameter_sets)
+    
+    def __getitem__(self, index):
+        """Return the SimulationResult of a single variant."""
+        metadata = dict(self.metadata, variant=index, parameters=self.parameter_sets[index])
+        variables = {name: values[index] for name, values in self.variables.items()}
+        return SimulationResult(self.time_points, variables, self.circuit_id, metadata=metadata)
+    
+    def to_json(self):
+        """Convert batch results to JSON, one list of values per variant."""
+        return {
+            "circuit_id": self.circuit_id,
+            "time_points": self.time_points.tolist(),
+            "parameter_sets": self.parameter_sets,
+            "variables": {k: v.tolist() for k, v in self.variables.items()},
+            "metadata": self.metadata
+        }
\ No newline at end of file
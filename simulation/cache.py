@@ -0,0 +1,76 @@
+# simulation/cache.py
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss/eviction counters.
+
+    The cache holds at most maxsize entries (unbounded if None) and, if
+    maxbytes is given, at most maxbytes in total as measured by sizeof(value).
+    """
+
+    def __init__(self, maxsize=128, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key and mark it as recently used."""
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._sizes[key]
+            self._items[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            self._items.move_to_end(key)
+            while (self.maxsize is not None and len(self._items) > self.maxsize) or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes):
+                evicted, _ = self._items.popitem(last=False)
+                self.nbytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,159 @@
+# simulation/compiled.py
+import numpy as np
+
+# solve_ivp methods that copy each derivative they are handed before the next call
+BUFFER_SAFE_METHODS = ("LSODA",)
+
+class CompiledRHS:
+    """Specialised right-hand side and Jacobian generated for one converter model.
+
+    rhs(t, y) and jacobian(t, y) have every parameter frozen into the
+    generated code as a literal, so a call does no dictionary lookups, no
+    property evaluation and no switch-period arithmetic beyond one modulo.
+    The state is unpacked into Python floats so the arithmetic avoids NumPy
+    scalar overhead, and rhs writes the derivatives into an output array
+    allocated once per compiled model instead of building a new one: the
+    array it returns is overwritten by the next call (see solver_rhs).
+    source holds the generated Python for inspection.
+    """
+
+    def __init__(self, rhs, jacobian, source, configurations):
+        self.rhs = rhs
+        self.jacobian = jacobian
+        self.source = source
+        self.configurations = configurations
+
+    def solver_rhs(self, method):
+        """Return rhs for a solve_ivp method.
+
+        The solve_ivp methods written in Python keep derivatives across
+        later calls (the last one, and the initial one while choosing the
+        first step), so for them each call's output is copied out of the
+        shared array; LSODA copies it itself and takes rhs as it is.
+        """
+        if method in BUFFER_SAFE_METHODS:
+            return self.rhs
+        rhs = self.rhs
+
+        def copied(t, y):
+            return rhs(t, y).copy()
+
+        return copied
+
+def _affine_terms(A, b):
+    """Return per-row lists of (coefficient, state index) and constant terms."""
+    rows = []
+    for i in range(A.shape[0]):
+        terms = [(A[i, j], j) for j in range(A.shape[1]) if A[i, j] != 0.0]
+        rows.append((terms, b[i]))
+    return rows
+
+def _row_expression(terms, constant):
+    """Print one affine row with zero terms dropped and constants as literals."""
+    parts = [f"{float(coefficient)!r} * x{j}" for coefficient, j in terms]
+    if constant != 0.0:
+        parts.append(repr(float(constant)))
+    return " + ".join(parts) if parts else "0.0"
+
+def _symbolic_expressions(A, b):
+    """Simplify the rows of A x + b with sympy and print them as Python.
+
+    Common subexpressions across rows are hoisted into temporaries, which pays
+    off for larger state vectors; returns (assignments, row expressions).
+    """
+    import sympy
+    from sympy.printing.pycode import pycode
+
+    n = A.shape[0]
+    x = sympy.symbols(f"x0:{n}")
+    rows = [sympy.Add(*(sympy.Float(A[i, j]) * x[j] for j in range(n)), sympy.Float(b[i]))
+            for i in range(n)]
+    replacements, reduced = sympy.cse(rows, symbols=sympy.numbered_symbols("c"))
+    assignments = [f"{symbol} = {pycode(expression)}" for symbol, expression in replacements]
+    return assignments, [pycode(expression) for expression in reduced]
+
+def compile_model(model, symbolic=False):
+    """Generate a CompiledRHS for a switched converter model.
+
+    The model's state-space matrices for the switch-on, switch-off and
+    diode-blocking configurations are frozen into straight-line code; the
+    generated rhs reproduces model.derivatives and the Jacobian is the
+    active configuration's A matrix.  With symbolic the rows are simplified
+    and printed through sympy.  Models without state-space matrices return
+    None; the generic MNA model is not compiled, and its derivatives still
+    allocate their output.
+    """
+    if not hasattr(model, "state_space"):
+        return None
+
+    n = len(model.get_initial_state())
+    u = model.inputs()
+    configurations = [(True, False), (False, False)]
+    if model.diode_component is not None:
+        configurations.append((False, True))
+
+    matrices = {}
+    for configuration in configurations:
+        A, B = model.state_space(*configuration)
+        matrices[configuration] = (np.array(A, dtype=float), np.array(B @ u, dtype=float))
+
+    def body(configuration, indent):
+        A, b = matrices[configuration]
+        if symbolic:
+            assignments, expressions = _symbolic_expressions(A, b)
+        else:
+            assignments = []
+            expressions = [_row_expression(terms, constant) for terms, constant in _affine_terms(A, b)]
+        lines = [indent + line for line in assignments]
+        return lines, expressions
+
+    def returned(expressions, indent):
+        # Fill the preallocated output row by row
+        return [f"{indent}out[{i}] = {expression}" for i, expression in enumerate(expressions)] + \
+            [f"{indent}return out"]
+
+    period = float(model.switching_period)
+    duty_cycle = float(model.duty_cycle)
+    state_names = ", ".join(f"x{i}" for i in range(n))
+
+    source = [
+        "def rhs(t, y, out=out):",
+        f"    {state_names}, = y.tolist()",
+        f"    if (t % {period!r}) / {period!r} < {duty_cycle!r}:",
+    ]
+    lines, expressions = body((True, False), "        ")
+    source += lines + returned(expressions, "        ")
+
+    lines, expressions = body((False, False), "    ")
+    source += lines
+    if (False, True) in matrices:
+        # The diode blocks when the inductor current would go negative
+        source += [f"    d0 = {expressions[0]}",
+                   "    if x0 <= 0.0 and d0 <= 0.0:"]
+        blocked_lines, blocked = body((False, True), "        ")
+        source += blocked_lines + returned(blocked, "        ")
+        expressions = ["d0"] + expressions[1:]
+    source += returned(expressions, "    ") + [""]
+
+    # The Jacobian returns the precomputed A matrix of the active configuration
+    source += [
+        "def jacobian(t, y):",
+        f"    {state_names}, = y.tolist()",
+        f"    if (t % {period!r}) / {period!r} < {duty_cycle!r}:",
+        "        return A_on",
+    ]
+    if (False, True) in matrices:
+        off_current = _row_expression(*_affine_terms(*matrices[(False, False)])[0])
+        source += [f"    if x0 <= 0.0 and {off_current} <= 0.0:",
+                   "        return A_blocking"]
+    source += ["    return A_off", ""]
+
+    source = "\n".join(source)
+    namespace = {
+        "out": np.empty(n),
+        "A_on": matrices[(True, False)][0],
+        "A_off": matrices[(False, False)][0],
+        "A_blocking": matrices.get((False, True), (None,))[0],
+    }
+    exec(compile(source, f"<compiled {type(model).__name__}>", "exec"), namespace)
+    return CompiledRHS(namespace["rhs"], namespace["jacobian"], source, configurations)
@@ -1,27 +1,66 @@
 # simulation/components/converters.py
 import numpy as np
+from simulation.probes import LazyVariables, memoised
 
-class BuckConverter:
-    """Buck converter simulation model."""
-    
-    def __init__(self, components, connections):
+DEFAULT_SWITCHING_FREQUENCY = 10000  # 10 kHz
+DEFAULT_DUTY_CYCLE = 0.5  # 50% duty cycle
+
+# Model attribute holding the component bound to each topology template kind
+ROLE_ATTRIBUTES = {
+    "switch": "switch_component",
+    "diode": "diode_component",
+    "inductor": "inductor_component",
+    "capacitor": "capacitor_component",
+    "voltage_source": "source_component",
+    "resistor": "load_component",
+}
+
+# Parameters the models read from the components bound to each template kind;
+# the switch and diode are ideal, so their on-resistance and forward voltage
+# are not used
+ROLE_PARAMETERS = {
+    "inductor": ("inductance",),
+    "capacitor": ("capacitance",),
+    "voltage_source": ("voltage",),
+    "resistor": ("resistance",),
+}
+PWM_PARAMETERS = ("duty_cycle", "frequency")
+
+class SwitchingConverter:
+    """Common behaviour shared by the hard-switched converter models.
+
+    roles maps topology template kinds to component ids, as returned by
+    simulation.topology.recognise_topology; without it the components are
+    picked by type, which is only meaningful for unwired circuits.
+    """
+
+    def __init__(self, components, connections, roles=None):
         self.components = components
         self.connections = connections
+        self.roles = roles
         self.state_vars = []
         self.switch_component = None
         self.diode_component = None
         self.inductor_component = None
         self.capacitor_component = None
         self.source_component = None
+        self.pwm_component = None
+        self.load_component = None
         self.load_resistance = 100.0  # Default load resistance
-        
+
         self.initialize_model()
-    
+
     def initialize_model(self):
         """Identify components and set up the model."""
-        # Find the key components
+        # Bind the components the topology match found, then the gate drive
+        for kind, comp_id in (self.roles or {}).items():
+            setattr(self, ROLE_ATTRIBUTES[kind], self.components[comp_id])
         for comp_id, component in self.components.items():
-            if component.type in ["mosfet", "igbt"]:
+            if component.type == "pwm_source":
+                self.pwm_component = component
+            elif self.roles:
+                continue
+            elif component.type in ["mosfet", "igbt"]:
                 self.switch_component = component
             elif component.type == "diode":
                 self.diode_component = component
@@ -33,8 +72,10 @@ class BuckConverter:
                 self.source_component = component
             elif component.type == "resistor":
                 # Assume this is the load resistor
-                self.load_resistance = component.parameters["resistance"]
-        
+                self.load_component = component
+        if self.load_component is not None:
+            self.load_resistance = self.load_component.parameters["resistance"]
+
         # Set up state variables (inductor current and capacitor voltage)
         if self.inductor_component:
             self.state_vars.append({
@@ -43,7 +84,7 @@ class BuckConverter:
                 "type": "current",
                 "initial_value": 0.0
             })
-        
+
         if self.capacitor_component:
             self.state_vars.append({
                 "name": "capacitor_voltage",
@@ -51,64 +92,594 @@ class BuckConverter:
                 "type": "voltage",
                 "initial_value": 0.0
             })
-    
+
+    def update_parameters(self, components, changed):
+        """Apply parameter edits in place: parameters are read live from the components."""
+        self.components = components
+        self.state_vars = []
+        self.load_component = None
+        self.initialize_model()
+
+    def used_parameters(self):
+        """Return the (component id, parameter) pairs the model reads; others do not affect it."""
+        used = set()
+        for kind, attribute in ROLE_ATTRIBUTES.items():
+            component = getattr(self, attribute)
+            if component is not None:
+                used.update((component.id, parameter) for parameter in ROLE_PARAMETERS.get(kind, ()))
+        if self.pwm_component is not None:
+            used.update((self.pwm_component.id, parameter) for parameter in PWM_PARAMETERS)
+        return used
+
+    @property
+    def inductance(self):
+        return self.inductor_component.parameters["inductance"]
+
+    @property
+    def capacitance(self):
+        return self.capacitor_component.parameters["capacitance"] if self.capacitor_component else 1e-6
+
+    @property
+    def input_voltage(self):
+        return self.source_component.parameters["voltage"] if self.source_component else 12.0
+
+    @property
+    def duty_cycle(self):
+        if self.pwm_component:
+            return self.pwm_component.parameters.get("duty_cycle", DEFAULT_DUTY_CYCLE)
+        return DEFAULT_DUTY_CYCLE
+
+    @property
+    def switching_frequency(self):
+        if self.pwm_component:
+            return self.pwm_component.parameters.get("frequency", DEFAULT_SWITCHING_FREQUENCY)
+        return DEFAULT_SWITCHING_FREQUENCY
+
+    @property
+    def switching_period(self):
+        return 1.0 / self.switching_frequency
+
+    @property
+    def max_step(self):
+        """Longest adaptive step, the shorter of the on and off intervals, so no pulse is stepped over."""
+        duty_cycle = min(max(self.duty_cycle, 0.0), 1.0)
+        width = min(duty_cycle, 1.0 - duty_cycle) * self.switching_period
+        return width if width > 0 else np.inf
+
     def get_initial_state(self):
         """Get initial state vector for simulation."""
         return np.array([var["initial_value"] for var in self.state_vars])
-    
+
+    def switch_on(self, t):
+        """Return True while the PWM signal drives the switch on."""
+        switch_period = 1.0 / self.switching_frequency
+        return (t % switch_period) / switch_period < self.duty_cycle
+
+    def switching_instants(self, end_time):
+        """Return interval boundaries over [0, end_time] and the switch state in each interval.
+
+        The boundaries start at 0 and finish at end_time; interval k spans
+        boundaries[k] to boundaries[k + 1] with the switch on when states[k] is True.
+        """
+        switch_period = 1.0 / self.switching_frequency
+        duty_cycle = min(max(self.duty_cycle, 0.0), 1.0)
+        n_periods = int(np.ceil(end_time / switch_period))
+        period_starts = np.arange(n_periods) * switch_period
+
+        # Interleave turn-on and turn-off edges, dropping degenerate intervals at D = 0 or 1
+        edges = np.empty(2 * n_periods)
+        edges[0::2] = period_starts
+        edges[1::2] = period_starts + duty_cycle * switch_period
+        states = np.tile([True, False], n_periods)
+
+        boundaries = np.append(edges, end_time)
+        keep = (np.diff(boundaries) > 0) & (edges < end_time)
+        boundaries = np.append(edges[keep], end_time)
+        return boundaries, states[keep]
+
+    def diode_blocking(self, inductor_current, di_dt):
+        """Return True when the diode blocks with the switch off (discontinuous conduction)."""
+        return self.diode_component is not None and inductor_current <= 0.0 and di_dt <= 0.0
+
+    def state_space(self, switch_on, diode_blocking=False):
+        """Return the (A, B) pair for a switch configuration with inputs [input_voltage].
+
+        With the diode blocking, the inductor current is held at zero and the
+        remaining states follow the switch-off dynamics.
+        """
+        if switch_on or not diode_blocking:
+            return self.switch_state_space(switch_on)
+
+        A, B = self.switch_state_space(False)
+        A, B = A.copy(), np.zeros_like(B)
+        A[0, :] = 0.0
+        A[:, 0] = 0.0
+        return A, B
+
+    def switch_state_space(self, switch_on):
+        """Return the (A, B) pair with the diode conducting whenever the switch is off."""
+        raise NotImplementedError
+
+    def critical_k(self, duty_cycle):
+        """Return the value of K = 2L / (R T) below which the topology runs in discontinuous conduction."""
+        raise NotImplementedError
+
+    def conduction_mode(self):
+        """Return the steady-state conduction mode the parameters give, "continuous" or "discontinuous".
+
+        The inductor current falls to zero every period when K = 2L / (R T)
+        is below the topology's critical_k; without a diode the current
+        simply reverses.
+        """
+        if self.diode_component is None:
+            return "continuous"
+        duty_cycle = min(max(self.duty_cycle, 0.0), 1.0)
+        k = 2.0 * self.inductance / (self.load_resistance * self.switching_period)
+        return "discontinuous" if k < self.critical_k(duty_cycle) else "continuous"
+
+    def jacobian(self, t, y):
+        """Return the analytic Jacobian of derivatives: the active configuration's A matrix."""
+        switch_on = self.switch_on(t)
+        A, B = self.state_space(switch_on)
+        if not switch_on and self.diode_component is not None:
+            di_dt = A[0] @ y + B[0] @ self.inputs()
+            if self.diode_blocking(y[0], di_dt):
+                A, _ = self.state_space(False, diode_blocking=True)
+        return A
+
+    def linearisations(self):
+        """Return the Jacobian of every switch and diode configuration the model visits."""
+        configurations = [(True, False), (False, False)]
+        if self.diode_component is not None:
+            configurations.append((False, True))
+        return [self.state_space(*configuration)[0] for configuration in configurations]
+
+    def inputs(self):
+        """Return the input vector u used with the state-space matrices."""
+        return np.array([self.input_voltage])
+
+    def averaged(self, ripple_envelope=False):
+        """Return the state-space averaged counterpart of this model."""
+        return AveragedConverter(self, ripple_envelope=ripple_envelope)
+
+    def process_results(self, t, y):
+        """Return the named signals of a run, each computed only when read.
+
+        Besides the signal names, probes may name a component's voltage or
+        current as "<component id>.v" or "<component id>.i" where the model
+        tracks it.
+        """
+        variables = LazyVariables(len(t))
+
+        # State variables
+        variables.add("inductor_current", lambda: y[0, :])
+        if y.shape[0] > 1:
+            variables.add("capacitor_voltage", lambda: y[1, :])
+        else:
+            variables.add_constant("capacitor_voltage", 0.0)
+
+        # Derived variables
+        variables.add_constant("input_voltage", self.input_voltage)
+
+        # Output current (same as load current)
+        variables.add("output_current", lambda: variables["capacitor_voltage"] / self.load_resistance)
+
+        for component, probe, target in [
+            (self.inductor_component, "i", "inductor_current"),
+            (self.capacitor_component, "v", "capacitor_voltage"),
+            (self.source_component, "v", "input_voltage"),
+            (self.load_component, "v", "capacitor_voltage"),
+            (self.load_component, "i", "output_current"),
+        ]:
+            if component is not None:
+                variables.add_alias(f"{component.id}.{probe}", target)
+
+        return variables
+
+class BuckConverter(SwitchingConverter):
+    """Buck converter simulation model."""
+
     def derivatives(self, t, y):
         """Calculate derivatives for buck converter state variables."""
         dy = np.zeros_like(y)
-        
+
         # Extract state variables
         inductor_current = y[0]
         capacitor_voltage = y[1] if len(y) > 1 else 0.0
-        
+
         # Circuit parameters
-        inductance = self.inductor_component.parameters["inductance"]
-        capacitance = self.capacitor_component.parameters["capacitance"] if self.capacitor_component else 1e-6
-        input_voltage = self.source_component.parameters["voltage"] if self.source_component else 12.0
-        
-        # Determine switch state (simplified PWM model)
-        # For a real implementation, we'd use the actual PWM signal
-        # For now, use a simple duty cycle model
-        duty_cycle = 0.5  # 50% duty cycle
-        switching_frequency = 10000  # 10 kHz
-        switch_period = 1.0 / switching_frequency
-        switch_on = (t % switch_period) / switch_period < duty_cycle
-        
+        inductance = self.inductance
+        capacitance = self.capacitance
+        input_voltage = self.input_voltage
+
         # Calculate derivatives
-        if switch_on:
+        if self.switch_on(t):
             # Switch ON: inductor charges from input
             di_dt = (input_voltage - capacitor_voltage) / inductance
         else:
             # Switch OFF: inductor discharges through diode
             di_dt = -capacitor_voltage / inductance
-        
+            if self.diode_blocking(inductor_current, di_dt):
+                # Diode blocks: inductor current is held at zero
+                inductor_current, di_dt = 0.0, 0.0
+
         # Capacitor voltage derivative
         dv_dt = (inductor_current - capacitor_voltage / self.load_resistance) / capacitance
-        
+
+        dy[0] = di_dt
+        if len(y) > 1:
+            dy[1] = dv_dt
+
+        return dy
+
+    def switch_state_space(self, switch_on):
+        """Return the (A, B) pair with the diode conducting whenever the switch is off."""
+        L, C, R = self.inductance, self.capacitance, self.load_resistance
+        A = np.array([[0.0, -1.0 / L],
+                      [1.0 / C, -1.0 / (R * C)]])
+        # The input only drives the inductor while the switch conducts
+        B = np.array([[1.0 / L if switch_on else 0.0],
+                      [0.0]])
+        return A, B
+
+    def critical_k(self, duty_cycle):
+        return 1.0 - duty_cycle
+
+class BoostConverter(SwitchingConverter):
+    """Boost converter simulation model."""
+
+    def derivatives(self, t, y):
+        """Calculate derivatives for boost converter state variables."""
+        dy = np.zeros_like(y)
+
+        # Extract state variables
+        inductor_current = y[0]
+        capacitor_voltage = y[1] if len(y) > 1 else 0.0
+
+        # Circuit parameters
+        inductance = self.inductance
+        capacitance = self.capacitance
+        input_voltage = self.input_voltage
+
+        if self.switch_on(t):
+            # Switch ON: inductor charges from input, load is fed by the capacitor
+            di_dt = input_voltage / inductance
+            dv_dt = -capacitor_voltage / (self.load_resistance * capacitance)
+        else:
+            # Switch OFF: inductor and input feed the output through the diode
+            di_dt = (input_voltage - capacitor_voltage) / inductance
+            if self.diode_blocking(inductor_current, di_dt):
+                # Diode blocks: inductor current is held at zero
+                inductor_current, di_dt = 0.0, 0.0
+            dv_dt = (inductor_current - capacitor_voltage / self.load_resistance) / capacitance
+
         dy[0] = di_dt
         if len(y) > 1:
             dy[1] = dv_dt
-        
+
         return dy
-    
+
+    def switch_state_space(self, switch_on):
+        """Return the (A, B) pair with the diode conducting whenever the switch is off."""
+        L, C, R = self.inductance, self.capacitance, self.load_resistance
+        if switch_on:
+            A = np.array([[0.0, 0.0],
+                          [0.0, -1.0 / (R * C)]])
+        else:
+            A = np.array([[0.0, -1.0 / L],
+                          [1.0 / C, -1.0 / (R * C)]])
+        B = np.array([[1.0 / L],
+                      [0.0]])
+        return A, B
+
+    def critical_k(self, duty_cycle):
+        return duty_cycle * (1.0 - duty_cycle) ** 2
+
     def process_results(self, t, y):
         """Process raw simulation results into named variables."""
-        variables = {}
-        
+        variables = super().process_results(t, y)
+
+        # Input current is the inductor current for a boost stage
+        variables.add("input_current", lambda: variables["inductor_current"])
+
+        return variables
+
+class BuckBoostConverter(SwitchingConverter):
+    """Inverting buck-boost converter simulation model.
+
+    The capacitor voltage follows the usual sign convention for this topology
+    and settles at a negative value.
+    """
+
+    def derivatives(self, t, y):
+        """Calculate derivatives for buck-boost converter state variables."""
+        dy = np.zeros_like(y)
+
         # Extract state variables
-        inductor_current = y[0, :]
-        capacitor_voltage = y[1, :] if y.shape[0] > 1 else np.zeros_like(t)
-        
-        # Store basic state variables
-        variables["inductor_current"] = inductor_current
-        variables["capacitor_voltage"] = capacitor_voltage
-        
-        # Calculate derived variables
-        input_voltage = self.source_component.parameters["voltage"] if self.source_component else 12.0
-        variables["input_voltage"] = np.ones_like(t) * input_voltage
-        
-        # Output current (same as load current)
-        variables["output_current"] = capacitor_voltage / self
\ No newline at end of file
+        inductor_current = y[0]
+        capacitor_voltage = y[1] if len(y) > 1 else 0.0
+
+        # Circuit parameters
+        inductance = self.inductance
+        capacitance = self.capacitance
+        input_voltage = self.input_voltage
+
+        if self.switch_on(t):
+            # Switch ON: inductor charges from input, load is fed by the capacitor
+            di_dt = input_voltage / inductance
+            dv_dt = -capacitor_voltage / (self.load_resistance * capacitance)
+        else:
+            # Switch OFF: inductor discharges into the output through the diode
+            di_dt = capacitor_voltage / inductance
+            if self.diode_blocking(inductor_current, di_dt):
+                # Diode blocks: inductor current is held at zero
+                inductor_current, di_dt = 0.0, 0.0
+            dv_dt = (-inductor_current - capacitor_voltage / self.load_resistance) / capacitance
+
+        dy[0] = di_dt
+        if len(y) > 1:
+            dy[1] = dv_dt
+
+        return dy
+
+    def switch_state_space(self, switch_on):
+        """Return the (A, B) pair with the diode conducting whenever the switch is off."""
+        L, C, R = self.inductance, self.capacitance, self.load_resistance
+        if switch_on:
+            A = np.array([[0.0, 0.0],
+                          [0.0, -1.0 / (R * C)]])
+            B = np.array([[1.0 / L],
+                          [0.0]])
+        else:
+            A = np.array([[0.0, 1.0 / L],
+                          [-1.0 / C, -1.0 / (R * C)]])
+            B = np.array([[0.0],
+                          [0.0]])
+        return A, B
+
+    def critical_k(self, duty_cycle):
+        return (1.0 - duty_cycle) ** 2
+
+class AveragedConverter:
+    """State-space averaged model of a switched converter.
+
+    The switch is replaced by its duty-cycle-weighted dynamics
+    A = D A_on + (1 - D) A_off, b = D B_on u + (1 - D) B_off u, which removes the
+    switching discontinuities so long runs take large solver steps.
+
+    With a diode the model also covers discontinuous conduction: the diode
+    conducts for the fraction d2 of the period given by diode_duty, the
+    inductor current is zero for the rest, and the three intervals are
+    averaged with weights D, d2 and 1 - D - d2.  The inductor current only
+    flows during the first two, where it averages i_L / (D + d2), so its
+    coupling into the other states is scaled by 1 / (D + d2).  In continuous
+    conduction d2 = 1 - D and this reduces to the plain average.
+    conduction_mode records the steady-state mode the parameters give.
+
+    With ripple_envelope set, process_results also reconstructs the upper and
+    lower switching-ripple envelope of every state around the averaged
+    trajectory from the first- and second-order ripple terms, which are
+    affine in the averaged state; the envelope assumes continuous conduction.
+    """
+
+    def __init__(self, model, ripple_envelope=False, ripple_points=32):
+        self.model = model
+        self.state_vars = model.state_vars
+        self.ripple_envelope = ripple_envelope
+
+        duty_cycle = min(max(model.duty_cycle, 0.0), 1.0)
+        u = model.inputs()
+        A_on, B_on = model.state_space(True)
+        A_off, B_off = model.state_space(False)
+        self.A = duty_cycle * A_on + (1.0 - duty_cycle) * A_off
+        self.b = duty_cycle * (B_on @ u) + (1.0 - duty_cycle) * (B_off @ u)
+        self.has_diode = model.diode_component is not None
+        self.conduction_mode = model.conduction_mode()
+
+        # Per-interval dynamics for discontinuous conduction
+        self.duty_cycle = duty_cycle
+        self.A_on, self.b_on = A_on, B_on @ u
+        self.A_off, self.b_off = A_off, B_off @ u
+        if self.has_diode:
+            A_blocking, B_blocking = model.state_space(False, diode_blocking=True)
+            self.A_blocking, self.b_blocking = A_blocking, B_blocking @ u
+
+        if ripple_envelope:
+            self.ripple = self._ripple_operators(A_on, B_on @ u, A_off, B_off @ u, duty_cycle, ripple_points)
+
+    def _ripple_operators(self, A_on, b_on, A_off, b_off, duty_cycle, points):
+        """Return R (points, n, n + 1) such that the ripple at phase k is R[k] @ [x_avg, 1]."""
+        period = self.model.switching_period
+        n = self.A.shape[0]
+
+        # Slopes as affine maps of [x_avg, 1]
+        S_on = np.hstack([A_on, b_on[:, None]])
+        S_off = np.hstack([A_off, b_off[:, None]])
+        S_avg = np.hstack([self.A, self.b[:, None]])
+
+        # Phase grid with the turn-off instant included exactly
+        t_off = duty_cycle * period
+        tau = np.unique(np.concatenate([np.linspace(0.0, t_off, points // 2 + 1),
+                                        np.linspace(t_off, period, points // 2 + 1)]))
+        on = tau < t_off
+
+        # First order: integral of the slope deviation, piecewise linear in tau
+        first = np.where(on[:, None, None],
+                         (S_on - S_avg) * tau[:, None, None],
+                         (S_on - S_avg) * t_off + (S_off - S_avg) * (tau - t_off)[:, None, None])
+
+        # Second order: integral of A_k times the first-order ripple; the
+        # integrand is linear on each piece, so the trapezoidal rule is exact
+        integrand = np.where(on[:, None, None], A_on, A_off) @ first
+        second = np.zeros_like(first)
+        second[1:] = np.cumsum(0.5 * (integrand[1:] + integrand[:-1]) * np.diff(tau)[:, None, None], axis=0)
+        # Remove the secular drift so the ripple is periodic
+        second -= second[-1] * (tau / period)[:, None, None]
+
+        ripple = first + second
+        weights = np.gradient(tau)
+        ripple -= np.tensordot(weights, ripple, axes=1) / weights.sum()
+        return ripple
+
+    @property
+    def switching_period(self):
+        return self.model.switching_period
+
+    def get_initial_state(self):
+        """Get initial state vector for simulation."""
+        return self.model.get_initial_state()
+
+    def diode_duty(self, y):
+        """Return the fraction of the period the diode conducts at state y.
+
+        Over the on time the inductor current rises from zero at the on-state
+        slope m_on to its peak i_pk = m_on D T and then falls back to zero
+        over the diode interval, so i_L = i_pk (D + d2) / 2 and
+        d2 = 2 i_L / (m_on D T) - D.  This is clipped to 1 - D, continuous
+        conduction, which is also assumed without a diode or a rising on-state
+        current.
+        """
+        duty_cycle = self.duty_cycle
+        if not self.has_diode or duty_cycle <= 0.0:
+            return 1.0 - duty_cycle
+        slope = self.A_on[0] @ y + self.b_on[0]
+        if slope <= 0.0:
+            return 1.0 - duty_cycle
+        diode_duty = 2.0 * y[0] / (slope * duty_cycle * self.switching_period) - duty_cycle
+        return min(max(diode_duty, 0.0), 1.0 - duty_cycle)
+
+    def _dynamics(self, diode_duty):
+        """Return the averaged (A, b) for a diode conduction fraction diode_duty."""
+        duty_cycle = self.duty_cycle
+        if diode_duty >= 1.0 - duty_cycle:
+            return self.A, self.b
+        blocked = 1.0 - duty_cycle - diode_duty
+        A = duty_cycle * self.A_on + diode_duty * self.A_off + blocked * self.A_blocking
+        b = duty_cycle * self.b_on + diode_duty * self.b_off + blocked * self.b_blocking
+        # The inductor current flows only while the switch or diode conducts
+        A[1:, 0] /= duty_cycle + diode_duty
+        return A, b
+
+    def derivatives(self, t, y):
+        """Calculate the averaged state derivatives."""
+        A, b = self._dynamics(self.diode_duty(y))
+        dy = A @ y + b
+        if self.has_diode and y[0] <= 0.0 and dy[0] < 0.0:
+            # The diode keeps the averaged inductor current from reversing
+            dy[0] = 0.0
+        return dy
+
+    def jacobian(self, t, y):
+        """Return the analytic Jacobian of derivatives."""
+        diode_duty = self.diode_duty(y)
+        A, b = self._dynamics(diode_duty)
+        if self.has_diode and y[0] <= 0.0 and A[0] @ y + b[0] < 0.0:
+            A = A.copy()
+            A[0, :] = 0.0
+            return A
+        duty_cycle = self.duty_cycle
+        if not 0.0 < diode_duty < 1.0 - duty_cycle:
+            return A
+
+        # Discontinuous conduction: add the dependence of the dynamics on d2
+        conducting = duty_cycle + diode_duty
+        dA = self.A_off - self.A_blocking
+        dA[1:, 0] = (dA[1:, 0] - A[1:, 0]) / conducting
+        df_dd2 = dA @ y + self.b_off - self.b_blocking
+        slope = self.A_on[0] @ y + self.b_on[0]
+        scale = 2.0 / (slope * duty_cycle * self.switching_period)
+        dd2_dy = -scale * y[0] / slope * self.A_on[0]
+        dd2_dy[0] += scale
+        return A + np.outer(df_dd2, dd2_dy)
+
+    def linearisations(self):
+        """Return the Jacobians the averaged dynamics can take."""
+        if self.has_diode:
+            return [self.A, self._dynamics(0.0)[0]]
+        return [self.A]
+
+    def process_results(self, t, y, chunk_size=20000):
+        """Return the named signals of a run, each computed only when read."""
+        variables = self.model.process_results(t, y)
+        if not self.ripple_envelope:
+            return variables
+
+        @memoised
+        def envelope():
+            upper = np.empty_like(y)
+            lower = np.empty_like(y)
+            for start in range(0, y.shape[1], chunk_size):
+                chunk = slice(start, start + chunk_size)
+                z = np.vstack([y[:, chunk], np.ones(y[:, chunk].shape[1])])
+                ripple = np.einsum("kij,js->kis", self.ripple, z)
+                upper[:, chunk] = y[:, chunk] + ripple.max(axis=0)
+                lower[:, chunk] = y[:, chunk] + ripple.min(axis=0)
+            return upper, lower
+
+        for i, state_var in enumerate(self.state_vars):
+            variables.add(f"{state_var['name']}_upper", lambda i=i: envelope()[0][i])
+            variables.add(f"{state_var['name']}_lower", lambda i=i: envelope()[1][i])
+        return variables
+
+class ConverterBatch:
+    """Parameter variants of one converter topology integrated as a single system.
+
+    The states of all variants are stacked into an (n_variants x n_states) array
+    and the switched state-space matrices of every variant are evaluated at once,
+    so one solve_ivp call advances the whole batch.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self.n_variants = len(models)
+        self.n_states = len(models[0].get_initial_state())
+
+        # Stack the per-variant configuration matrices: A (n_variants, n, n), b = B u (n_variants, n)
+        def stacked(switch_on, diode_blocking=False):
+            pairs = [model.state_space(switch_on, diode_blocking) for model in models]
+            A = np.stack([A for A, _ in pairs])
+            b = np.stack([B @ model.inputs() for (_, B), model in zip(pairs, models)])
+            return A, b
+
+        self.A_on, self.b_on = stacked(True)
+        self.A_off, self.b_off = stacked(False)
+        self.A_blocking, self.b_blocking = stacked(False, True)
+
+        self.period = np.array([1.0 / model.switching_frequency for model in models])
+        self.duty_cycle = np.array([model.duty_cycle for model in models])
+        self.has_diode = np.array([model.diode_component is not None for model in models])
+        self.max_step = min(model.max_step for model in models)
+
+    def get_initial_state(self):
+        """Get the flattened initial state of every variant."""
+        return np.concatenate([model.get_initial_state() for model in self.models])
+
+    def derivatives(self, t, y):
+        """Calculate derivatives for all variants from the flattened state vector."""
+        Y = y.reshape(self.n_variants, self.n_states)
+        switch_on = (t % self.period) / self.period < self.duty_cycle
+
+        A = np.where(switch_on[:, None, None], self.A_on, self.A_off)
+        b = np.where(switch_on[:, None], self.b_on, self.b_off)
+        dY = np.einsum("kij,kj->ki", A, Y) + b
+
+        # Diode blocks: inductor current is held at zero
+        blocking = ~switch_on & self.has_diode & (Y[:, 0] <= 0.0) & (dY[:, 0] <= 0.0)
+        if blocking.any():
+            dY[blocking] = np.einsum("kij,kj->ki", self.A_blocking[blocking], Y[blocking]) + self.b_blocking[blocking]
+
+        return dY.ravel()
+
+    def process_results(self, t, y):
+        """Return the named signals of shape (n_variants, n_samples), each computed only when read."""
+        Y = y.reshape(self.n_variants, self.n_states, -1)
+        per_variant = [model.process_results(t, Y[k]) for k, model in enumerate(self.models)]
+        variables = LazyVariables((self.n_variants, len(t)))
+        listed = set(per_variant[0])
+        for name in per_variant[0].names():
+            stacked = lambda name=name: np.stack([signals[name] for signals in per_variant])
+            if name in listed:
+                variables.add(name, stacked)
+            else:
+                variables.add_alias(name, stacked)
+        return variables
@@ -1,92 +1,540 @@
 # simulation/components/generic.py
+from collections import OrderedDict
 import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from simulation.probes import LazyVariables, memoised
+
+GMIN = 1e-12  # Conductance from every node to ground so floating nodes stay solvable
+SWITCH_OFF_RESISTANCE = 1e6
+DIODE_ON_RESISTANCE = 1e-3
+IGBT_ON_RESISTANCE = 1e-3
+
+def build_node_index(components, connections):
+    """Merge connected terminals into electrical nodes.
+
+    Returns a dict mapping (component_id, terminal) to a node number; terminals
+    that are not connected to anything get a node of their own.
+    """
+    parent = {}
+    for comp_id, component in components.items():
+        for terminal in component.terminals:
+            parent[(comp_id, terminal)] = (comp_id, terminal)
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for comp1_id, terminal1, comp2_id, terminal2 in connections:
+        a, b = (comp1_id, terminal1), (comp2_id, terminal2)
+        if a in parent and b in parent:
+            parent[find(a)] = find(b)
+
+    node_numbers = {}
+    return {key: node_numbers.setdefault(find(key), len(node_numbers)) for key in parent}
 
 class GenericCircuitModel:
-    """A generic circuit model for simulation."""
-    
-    def __init__(self, components, connections):
+    """A generic circuit model for simulation based on Modified Nodal Analysis.
+
+    Capacitor voltages and inductor currents are the state variables.  At each
+    instant the circuit is reduced to a resistive network in which capacitors
+    act as voltage sources and inductors as current sources; solving it gives
+    the capacitor currents and inductor voltages, i.e. the state derivatives.
+    The network matrix is stamped once with scipy.sparse and only the switch
+    and diode conductances depend on the configuration, so one sparse LU
+    factorisation is reused for as long as the configuration does not change.
+    """
+
+    def __init__(self, components, connections, max_factorizations=64, node_index=None):
         self.components = components
         self.connections = connections
+        # A circuit's maintained connectivity index saves rebuilding the nodes here
+        self.node_index = node_index
         self.state_vars = []
+        self.max_factorizations = max_factorizations
+        self._factorizations = OrderedDict()
+        self._jacobians = OrderedDict()
         self.initialize_model()
-    
+
     def initialize_model(self):
         """Initialize the circuit model by analyzing components and connections."""
-        # Identify state variables (capacitor voltages, inductor currents)
+        terminal_nodes = self.node_index or build_node_index(self.components, self.connections)
+        self.ground = self._select_ground(terminal_nodes)
+
+        # Renumber so that ground is dropped from the unknowns (index -1)
+        nodes = sorted(set(terminal_nodes.values()) - {self.ground})
+        node_index = {node: i for i, node in enumerate(nodes)}
+        node_index[self.ground] = -1
+        self.n_nodes = len(nodes)
+
+        def node(comp_id, terminal):
+            return node_index[terminal_nodes[(comp_id, terminal)]]
+
+        # Unknown index of every component terminal, for probes
+        self.terminal_nodes = {key: node_index[number] for key, number in terminal_nodes.items()}
+
+        resistors, voltage_sources, pwm_sources = [], [], []
+        capacitors, inductors, switches, diodes = [], [], [], []
+        # Where each component's parameters live in the arrays built below
+        self.parameter_slots = {}
+
+        # Identify state variables (capacitor voltages, inductor currents) and branches
         for comp_id, component in self.components.items():
+            params = component.parameters
             if component.type == "capacitor":
                 # Add capacitor voltage as state variable
+                self.parameter_slots[comp_id] = ("capacitor", len(capacitors))
+                capacitors.append((node(comp_id, "t1"), node(comp_id, "t2"), params["capacitance"], len(self.state_vars)))
                 self.state_vars.append({
                     "name": f"v_{comp_id}",
                     "component_id": comp_id,
                     "type": "voltage",
                     "initial_value": 0.0
                 })
-            
+
             elif component.type == "inductor":
                 # Add inductor current as state variable
+                self.parameter_slots[comp_id] = ("inductor", len(inductors))
+                inductors.append((node(comp_id, "t1"), node(comp_id, "t2"), params["inductance"], len(self.state_vars)))
                 self.state_vars.append({
                     "name": f"i_{comp_id}",
                     "component_id": comp_id,
                     "type": "current",
                     "initial_value": 0.0
                 })
-    
+
+            elif component.type == "resistor":
+                self.parameter_slots[comp_id] = ("resistor", len(resistors))
+                resistors.append((node(comp_id, "t1"), node(comp_id, "t2"), params["resistance"], comp_id))
+
+            elif component.type == "voltage_source":
+                self.parameter_slots[comp_id] = ("voltage_source", len(voltage_sources))
+                voltage_sources.append((node(comp_id, "positive"), node(comp_id, "negative"), params["voltage"]))
+
+            elif component.type == "pwm_source":
+                self.parameter_slots[comp_id] = ("pwm_source", len(pwm_sources))
+                pwm_sources.append((node(comp_id, "output"), node(comp_id, "reference"), params, terminal_nodes[(comp_id, "output")]))
+
+            elif component.type == "mosfet":
+                self.parameter_slots[comp_id] = ("switch", len(switches))
+                switches.append((node(comp_id, "drain"), node(comp_id, "source"), params["rds_on"], 0.0,
+                                 params["threshold_voltage"], terminal_nodes[(comp_id, "gate")]))
+
+            elif component.type == "igbt":
+                self.parameter_slots[comp_id] = ("switch", len(switches))
+                switches.append((node(comp_id, "collector"), node(comp_id, "emitter"), IGBT_ON_RESISTANCE,
+                                 params["vce_sat"], params["threshold_voltage"], terminal_nodes[(comp_id, "gate")]))
+
+            elif component.type == "diode":
+                self.parameter_slots[comp_id] = ("diode", len(diodes))
+                diodes.append((node(comp_id, "anode"), node(comp_id, "cathode"), params["forward_voltage"]))
+
+        # Static conductances: resistors plus GMIN from every node to ground
+        self.resistor_ids = [r[3] for r in resistors]
+        self.resistor_incidence = self._incidence([(r[0], r[1]) for r in resistors])
+        self.resistor_conductance = np.array([1.0 / r[2] for r in resistors])
+
+        # Voltage-defined branches, each adding a current unknown:
+        # DC sources, then PWM sources, then capacitors
+        voltage_branches = ([(v[0], v[1]) for v in voltage_sources] +
+                            [(p[0], p[1]) for p in pwm_sources] +
+                            [(c[0], c[1]) for c in capacitors])
+        self.voltage_incidence = self._incidence(voltage_branches).T.tocsc()
+        self.n_voltage_branches = len(voltage_branches)
+        self.dc_values = np.array([v[2] for v in voltage_sources], dtype=float)
+        self.pwm_slice = slice(len(voltage_sources), len(voltage_sources) + len(pwm_sources))
+        self.capacitor_slice = slice(self.pwm_slice.stop, self.n_voltage_branches)
+
+        # PWM waveforms
+        self.pwm_amplitude = np.array([p[2].get("amplitude", 5.0) for p in pwm_sources], dtype=float)
+        self.pwm_period = np.array([1.0 / p[2].get("frequency", 10000) for p in pwm_sources], dtype=float)
+        self.pwm_duty = np.array([p[2].get("duty_cycle", 0.5) for p in pwm_sources], dtype=float)
+
+        # Capacitors and inductors
+        self.capacitor_states = np.array([c[3] for c in capacitors], dtype=int)
+        self.capacitor_values = np.array([c[2] for c in capacitors], dtype=float)
+        self.inductor_states = np.array([l[3] for l in inductors], dtype=int)
+        self.inductor_values = np.array([l[2] for l in inductors], dtype=float)
+        self.inductor_incidence = self._incidence([(l[0], l[1]) for l in inductors])
+        self.inductor_injection = (-self.inductor_incidence.T).tocsr()
+
+        # Switching elements: controlled switches followed by diodes, each an
+        # on/off conductance with an on-state voltage offset
+        self.n_switches = len(switches)
+        self.n_diodes = len(diodes)
+        self.switching_incidence = self._incidence([(s[0], s[1]) for s in switches] + [(d[0], d[1]) for d in diodes])
+        self.on_conductance = np.array([1.0 / s[2] for s in switches] + [1.0 / DIODE_ON_RESISTANCE] * len(diodes))
+        self.on_offset = np.array([s[3] for s in switches] + [d[2] for d in diodes], dtype=float)
+        self.diode_forward_voltage = np.array([d[2] for d in diodes], dtype=float)
+        self.diode_on = np.zeros(self.n_diodes, dtype=bool)
+
+        # A switch is gated by the PWM source driving its gate node, if any,
+        # directly or through gate resistors (gates draw no current)
+        pwm_by_node = {p[3]: i for i, p in enumerate(pwm_sources)}
+        resistor_links = {}
+        for comp_id in self.resistor_ids:
+            t1, t2 = terminal_nodes[(comp_id, "t1")], terminal_nodes[(comp_id, "t2")]
+            resistor_links.setdefault(t1, []).append(t2)
+            resistor_links.setdefault(t2, []).append(t1)
+
+        def driving_pwm(gate):
+            seen, frontier = {gate}, [gate]
+            while frontier:
+                node_number = frontier.pop()
+                if node_number in pwm_by_node:
+                    return pwm_by_node[node_number]
+                for linked in resistor_links.get(node_number, ()):
+                    if linked not in seen:
+                        seen.add(linked)
+                        frontier.append(linked)
+            return -1
+
+        self.switch_pwm = np.array([driving_pwm(s[5]) for s in switches], dtype=int)
+        self.switch_threshold = np.array([s[4] for s in switches], dtype=float)
+        self.diode_incidence = self.switching_incidence[self.n_switches:]
+        self._derive_from_parameters()
+
+    def _derive_from_parameters(self):
+        """Recompute the quantities that follow from the parameter arrays."""
+        # dv/dt = i/C and di/dt = v/L: the per-state factors of the network response
+        self.state_scale = np.empty(len(self.state_vars))
+        self.state_scale[self.capacitor_states] = 1.0 / self.capacitor_values
+        self.state_scale[self.inductor_states] = 1.0 / self.inductor_values
+
+        G = self.resistor_incidence.T @ sparse.diags(self.resistor_conductance) @ self.resistor_incidence
+        self.static_conductance = (G + GMIN * sparse.identity(self.n_nodes)).tocsc()
+
+        gated = self.switch_pwm >= 0
+        self.switch_enabled = np.zeros(self.n_switches, dtype=bool)
+        self.switch_enabled[gated] = self.pwm_amplitude[self.switch_pwm[gated]] >= self.switch_threshold[gated]
+
+        # Adaptive steps must not skip over whole PWM pulses
+        pulse_widths = np.minimum(self.pwm_duty, 1.0 - self.pwm_duty) * self.pwm_period
+        pulse_widths = pulse_widths[pulse_widths > 0]
+        self.max_step = pulse_widths.min() if len(pulse_widths) else np.inf
+        # Steady-state analysis shoots over the longest PWM period
+        self.switching_period = self.pwm_period.max() if len(self.pwm_period) else None
+
+    def update_parameters(self, components, changed):
+        """Apply parameter edits in place instead of rebuilding the model.
+
+        components is the edited circuit's component dict, with the same
+        components and wiring the model was built from, and changed the ids
+        whose parameters differ.  Only their entries in the parameter arrays
+        are rewritten.  LU factorisations and the network responses behind
+        the Jacobians are kept unless a conductance or on-state offset
+        changed.
+        """
+        self.components = components
+        network_changed = False
+        for comp_id in changed:
+            kind, k = self.parameter_slots.get(comp_id, (None, None))
+            component = components[comp_id]
+            params = component.parameters
+            if kind == "capacitor":
+                self.capacitor_values[k] = params["capacitance"]
+            elif kind == "inductor":
+                self.inductor_values[k] = params["inductance"]
+            elif kind == "resistor":
+                self.resistor_conductance[k] = 1.0 / params["resistance"]
+                network_changed = True
+            elif kind == "voltage_source":
+                self.dc_values[k] = params["voltage"]
+            elif kind == "pwm_source":
+                self.pwm_amplitude[k] = params.get("amplitude", 5.0)
+                self.pwm_period[k] = 1.0 / params.get("frequency", 10000)
+                self.pwm_duty[k] = params.get("duty_cycle", 0.5)
+            elif kind == "switch":
+                if component.type == "mosfet":
+                    self.on_conductance[k], self.on_offset[k] = 1.0 / params["rds_on"], 0.0
+                else:
+                    self.on_conductance[k], self.on_offset[k] = 1.0 / IGBT_ON_RESISTANCE, params["vce_sat"]
+                self.switch_threshold[k] = params["threshold_voltage"]
+                network_changed = True
+            elif kind == "diode":
+                self.on_offset[self.n_switches + k] = params["forward_voltage"]
+                self.diode_forward_voltage[k] = params["forward_voltage"]
+                network_changed = True
+
+        self._derive_from_parameters()
+        if network_changed:
+            self._factorizations.clear()
+            self._jacobians.clear()
+
+    def _select_ground(self, terminal_nodes):
+        """Pick the reference node: a source's negative terminal if there is one."""
+        for comp_id, component in self.components.items():
+            if component.type == "voltage_source":
+                return terminal_nodes[(comp_id, "negative")]
+        for comp_id, component in self.components.items():
+            if component.type == "pwm_source":
+                return terminal_nodes[(comp_id, "reference")]
+        return 0
+
+    def _incidence(self, branches):
+        """Build a sparse (n_branches x n_nodes) incidence matrix, skipping ground."""
+        rows, cols, vals = [], [], []
+        for k, (plus, minus) in enumerate(branches):
+            if plus >= 0:
+                rows.append(k)
+                cols.append(plus)
+                vals.append(1.0)
+            if minus >= 0:
+                rows.append(k)
+                cols.append(minus)
+                vals.append(-1.0)
+        return sparse.csr_matrix((vals, (rows, cols)), shape=(len(branches), self.n_nodes))
+
     def get_initial_state(self):
         """Get initial state vector for simulation."""
         return np.array([var["initial_value"] for var in self.state_vars])
-    
+
+    def _pwm_high(self, t):
+        """Return which PWM sources are high at time(s) t; shape (n_pwm,) + shape(t)."""
+        t = np.asarray(t)
+        period = self.pwm_period.reshape((-1,) + (1,) * t.ndim)
+        duty = self.pwm_duty.reshape(period.shape)
+        return (t % period) / period < duty
+
+    def _switch_states(self, pwm_high):
+        """Return which controlled switches conduct given the PWM source states."""
+        switch_on = np.zeros((self.n_switches,) + pwm_high.shape[1:], dtype=bool)
+        switch_on[self.switch_enabled] = pwm_high[self.switch_pwm[self.switch_enabled]]
+        return switch_on
+
+    def _factorization(self, configuration):
+        """Return the cached LU factorisation and offset injection for a switch/diode configuration."""
+        key = configuration.tobytes()
+        if key in self._factorizations:
+            self._factorizations.move_to_end(key)
+            return self._factorizations[key]
+
+        conductance = np.where(configuration, self.on_conductance, 1.0 / SWITCH_OFF_RESISTANCE)
+        G = self.static_conductance + (
+            self.switching_incidence.T @ sparse.diags(conductance) @ self.switching_incidence
+        )
+        matrix = sparse.bmat([[G, self.voltage_incidence],
+                              [self.voltage_incidence.T, None]], format="csc")
+        try:
+            lu = splu(matrix)
+        except RuntimeError:
+            raise ValueError("Circuit matrix is singular; check for loops of voltage sources and capacitors")
+
+        # Conducting elements inject G_on * V_offset into their nodes
+        offset_current = np.where(configuration, self.on_conductance * self.on_offset, 0.0)
+        offset_injection = self.switching_incidence.T @ offset_current
+
+        self._factorizations[key] = (lu, offset_injection)
+        if len(self._factorizations) > self.max_factorizations:
+            self._factorizations.popitem(last=False)
+        return lu, offset_injection
+
+    def _solve_network(self, configuration, pwm_high, y):
+        """Solve the resistive network for one configuration.
+
+        pwm_high and y may carry a trailing sample axis; returns node voltages
+        and voltage-branch currents with the same trailing shape.
+        """
+        samples = y.shape[1:]
+        lu, offset_injection = self._factorization(configuration)
+        rhs = np.empty((self.n_nodes + self.n_voltage_branches,) + samples)
+
+        # Inductors inject their current; conducting elements inject their offset current
+        rhs[:self.n_nodes] = self.inductor_injection @ y[self.inductor_states]
+        rhs[:self.n_nodes] += offset_injection.reshape((-1,) + (1,) * len(samples))
+
+        sources = rhs[self.n_nodes:]
+        sources[:len(self.dc_values)] = self.dc_values.reshape((-1,) + (1,) * len(samples))
+        sources[self.pwm_slice] = pwm_high * self.pwm_amplitude.reshape((-1,) + (1,) * len(samples))
+        sources[self.capacitor_slice] = y[self.capacitor_states]
+
+        solution = lu.solve(rhs.reshape(len(rhs), -1)).reshape(rhs.shape)
+        return solution[:self.n_nodes], solution[self.n_nodes:]
+
+    def _diode_voltages(self, node_voltages):
+        """Return anode-cathode voltages for the diodes."""
+        branch_voltages = self.diode_incidence @ node_voltages.reshape(self.n_nodes, -1)
+        return branch_voltages.reshape((self.n_diodes,) + node_voltages.shape[1:])
+
+    def _consistent_solution(self, switch_on, pwm_high, y, diode_on):
+        """Solve the network, flipping diodes until every diode state is consistent."""
+        for _ in range(2 * self.n_diodes + 1):
+            configuration = np.concatenate([switch_on, diode_on])
+            node_voltages, branch_currents = self._solve_network(configuration, pwm_high, y)
+            if self.n_diodes == 0:
+                break
+            conducting = self._diode_voltages(node_voltages) > self.diode_forward_voltage
+            if np.array_equal(conducting, diode_on):
+                break
+            diode_on = conducting
+        return node_voltages, branch_currents, diode_on
+
     def derivatives(self, t, y):
         """Calculate derivatives for all state variables."""
-        # This is a simplified implementation
-        # In a real circuit simulator, we'd solve Kirchhoff's laws here
-        
-        # For demonstration, we'll implement a simple RC circuit behavior
-        dy = np.zeros_like(y)
-        
-        # Process each state variable
-        for i, state_var in enumerate(self.state_vars):
-            comp_id = state_var["component_id"]
-            component = self.components[comp_id]
-            
-            if component.type == "capacitor":
-                # dv/dt = i/C
-                # Find connected components to determine current
-                capacitance = component.parameters["capacitance"]
-                # Simplified: assume discharging through a fixed resistance
-                resistance = 1000  # Fixed value for demo
-                # RC circuit: dv/dt = -v/(R*C)
-                dy[i] = -y[i] / (resistance * capacitance)
-            
-            elif component.type == "inductor":
-                # di/dt = v/L
-                # Find connected components to determine voltage
-                inductance = component.parameters["inductance"]
-                # Simplified: assume fixed voltage source
-                voltage = 5.0  # Fixed value for demo
-                # L circuit: di/dt = v/L
-                dy[i] = voltage / inductance
-        
+        pwm_high = self._pwm_high(t)
+        switch_on = self._switch_states(pwm_high)
+
+        # Start from the previous diode states; they rarely change between calls
+        node_voltages, branch_currents, self.diode_on = self._consistent_solution(
+            switch_on, pwm_high, y, self.diode_on
+        )
+
+        dy = np.empty_like(y)
+        # dv/dt = i/C for capacitors, di/dt = v/L for inductors
+        dy[self.capacitor_states] = branch_currents[self.capacitor_slice] / self.capacitor_values
+        dy[self.inductor_states] = (self.inductor_incidence @ node_voltages) / self.inductor_values
         return dy
-    
+
+    def jacobian(self, t, y):
+        """Return the analytic Jacobian of derivatives as a sparse matrix.
+
+        Within one switch/diode configuration the derivatives are affine in
+        the state, so the Jacobian only depends on the configuration active
+        at (t, y) and is cached with its factorisation.
+        """
+        pwm_high = self._pwm_high(t)
+        switch_on = self._switch_states(pwm_high)
+        _, _, diode_on = self._consistent_solution(switch_on, pwm_high, y, self.diode_on)
+        return self._configuration_jacobian(np.concatenate([switch_on, diode_on]))
+
+    def linearisations(self, samples=16):
+        """Return the Jacobians of the configurations met over one PWM period from the initial state."""
+        y = self.get_initial_state()
+        period = self.switching_period or 1.0
+        configurations = {}
+        for t in (np.arange(samples) + 0.5) * period / samples:
+            pwm_high = self._pwm_high(t)
+            switch_on = self._switch_states(pwm_high)
+            _, _, diode_on = self._consistent_solution(switch_on, pwm_high, y, self.diode_on)
+            configuration = np.concatenate([switch_on, diode_on])
+            configurations[configuration.tobytes()] = configuration
+        return [self._configuration_jacobian(configuration) for configuration in configurations.values()]
+
+    def _configuration_jacobian(self, configuration, block=256):
+        """Return the sparse Jacobian for one configuration.
+
+        Each state enters the network as a source term, so column k is the
+        response of the derivatives to a unit source at state k; the columns
+        are solved in blocks with the cached LU factorisation.  The network
+        response (capacitor currents and inductor voltages) is cached and
+        only scaled by 1/C and 1/L here, so capacitance and inductance edits
+        keep it.
+        """
+        key = configuration.tobytes()
+        if key in self._jacobians:
+            self._jacobians.move_to_end(key)
+        else:
+            self._jacobians[key] = self._network_response(configuration, block)
+            if len(self._jacobians) > self.max_factorizations:
+                self._jacobians.popitem(last=False)
+        return (sparse.diags(self.state_scale) @ self._jacobians[key]).tocsc()
+
+    def _network_response(self, configuration, block):
+        """Return the sparse response of capacitor currents and inductor voltages to unit state sources."""
+        lu, _ = self._factorization(configuration)
+        n_states = len(self.state_vars)
+        n_total = self.n_nodes + self.n_voltage_branches
+        capacitor_rows = self.n_nodes + np.arange(self.capacitor_slice.start, self.capacitor_slice.stop)
+
+        # Unit source of each state: inductor currents into nodes, capacitor voltages into their branch rows
+        sources = sparse.lil_matrix((n_total, n_states))
+        sources[:self.n_nodes, self.inductor_states] = self.inductor_injection
+        sources[capacitor_rows, self.capacitor_states] = 1.0
+        sources = sources.tocsc()
+
+        blocks = []
+        for start in range(0, n_states, block):
+            response = lu.solve(sources[:, start:start + block].toarray())
+            columns = np.zeros((n_states, response.shape[1]))
+            columns[self.capacitor_states] = response[capacitor_rows]
+            columns[self.inductor_states] = self.inductor_incidence @ response[:self.n_nodes]
+            # Drop round-off left by the LU solve, relative to each row so scaling does not matter
+            magnitude = np.abs(columns)
+            columns[magnitude <= 1e-12 * magnitude.max(axis=1, keepdims=True, initial=0.0)] = 0.0
+            blocks.append(sparse.csc_matrix(columns))
+        return sparse.hstack(blocks, format="csc") if blocks else sparse.csc_matrix((0, 0))
+
+    def solve_network(self, t, y, chunk_size=10000):
+        """Solve the network at every sample of a trajectory.
+
+        Returns node voltages (n_nodes x n_samples).  Samples are grouped by
+        switch/diode configuration so each group is one batched LU solve.
+        """
+        node_voltages = np.zeros((self.n_nodes, len(t)))
+        for start in range(0, len(t), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            pwm_high = self._pwm_high(t[chunk])
+            switch_on = self._switch_states(pwm_high)
+            diode_on = np.repeat(self.diode_on[:, None], switch_on.shape[1], axis=1)
+
+            for _ in range(2 * self.n_diodes + 1):
+                configurations = np.concatenate([switch_on, diode_on]).T
+                if configurations.shape[1]:
+                    unique, inverse = np.unique(configurations, axis=0, return_inverse=True)
+                else:
+                    unique, inverse = configurations[:1], np.zeros(len(configurations), dtype=int)
+                voltages = np.zeros((self.n_nodes, configurations.shape[0]))
+                for k, configuration in enumerate(unique):
+                    members = np.flatnonzero(inverse.ravel() == k)
+                    voltages[:, members], _ = self._solve_network(
+                        configuration, pwm_high[:, members], y[:, chunk][:, members]
+                    )
+                if self.n_diodes == 0:
+                    break
+                conducting = self._diode_voltages(voltages) > self.diode_forward_voltage[:, None]
+                if np.array_equal(conducting, diode_on):
+                    break
+                diode_on = conducting
+            node_voltages[:, chunk] = voltages
+        return node_voltages
+
     def process_results(self, t, y):
-        """Process raw simulation results into named variables."""
-        variables = {}
-        
+        """Return the named signals of a run, each computed only when read.
+
+        Node voltages come from one network solution over the trajectory,
+        solved when the first signal that needs it is read.  Besides the
+        signal names, probes may name the voltage of a component terminal as
+        "<component id>.<terminal>" and a component's voltage, current or
+        power as "<component id>.v", ".i" or ".p" where the model tracks it, and
+        a switch's gate drive as "<component id>.vgs".
+        """
+        variables = LazyVariables(len(t))
+
         # Map state variables
         for i, state_var in enumerate(self.state_vars):
-            variables[state_var["name"]] = y[i, :]
-        
-        # Calculate additional derived quantities
-        # For example, power in resistors: P = I²R
+            variables.add(state_var["name"], lambda i=i: y[i, :])
+
+        # Node voltages from the network solution at every sample
+        node_voltages = memoised(lambda: self.solve_network(t, y))
+        for i in range(self.n_nodes):
+            variables.add(f"v_node_{i}", lambda i=i: node_voltages()[i])
+
+        def voltage(node):
+            return variables[f"v_node_{node}"] if node >= 0 else np.zeros(len(t))
+
+        # Power in resistors: P = V²/R
+        resistor_voltages = memoised(lambda: self.resistor_incidence @ node_voltages())
+        for k, comp_id in enumerate(self.resistor_ids):
+            variables.add(f"p_{comp_id}", lambda k=k: resistor_voltages()[k] ** 2 * self.resistor_conductance[k])
+            variables.add_alias(f"{comp_id}.i", lambda k=k: resistor_voltages()[k] * self.resistor_conductance[k])
+            variables.add_alias(f"{comp_id}.p", f"p_{comp_id}")
+
+        # Component probes, resolved only when asked for
+        for state_var in self.state_vars:
+            probe = "v" if state_var["type"] == "voltage" else "i"
+            variables.add_alias(f"{state_var['component_id']}.{probe}", state_var["name"])
+        for (comp_id, terminal), node in self.terminal_nodes.items():
+            variables.add_alias(f"{comp_id}.{terminal}", lambda node=node: voltage(node))
         for comp_id, component in self.components.items():
-            if component.type == "resistor":
-                resistance = component.parameters["resistance"]
-                # Find current through this resistor (simplified)
-                # In a real implementation, we'd trace through the circuit
-                # For now, use a dummy current
-                current = np.ones_like(t) * 0.01  # 10mA dummy current
-                power = current**2 * resistance
-                variables[f"p_{comp_id}"] = power
-        
-        return variables
\ No newline at end of file
+            terminals = list(component.terminals)
+            if len(terminals) == 2:
+                plus, minus = (self.terminal_nodes[(comp_id, terminal)] for terminal in terminals)
+                variables.add_alias(f"{comp_id}.v", lambda plus=plus, minus=minus: voltage(plus) - voltage(minus))
+            elif component.type in ("mosfet", "igbt"):
+                gate = self.terminal_nodes[(comp_id, "gate")]
+                reference = self.terminal_nodes[(comp_id, "source" if component.type == "mosfet" else "emitter")]
+                variables.add_alias(f"{comp_id}.vgs", lambda gate=gate, reference=reference: voltage(gate) - voltage(reference))
+
+        return variables
@@ -0,0 +1,97 @@
+# simulation/decimation.py
+import numpy as np
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+def minmax_indices(values, buckets):
+    """Return sorted indices of the minimum and maximum of each bucket.
+
+    values is split into equal-length buckets (the last one possibly short) and
+    each bucket contributes its extrema, so switching ripple peaks survive any
+    reduction.  Fully vectorised: the full buckets are reduced along the rows
+    of a (buckets, width) view, so contiguous or memory-mapped values are not
+    copied, and the short last bucket is reduced on its own.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= 2 * buckets:
+        return np.arange(n)
+
+    width = -(-n // buckets)
+    full = n // width
+    rows = values[:full * width].reshape(full, width)
+    start = np.arange(full) * width
+    low = start + np.argmin(rows, axis=1)
+    high = start + np.argmax(rows, axis=1)
+    if full * width < n:
+        tail = values[full * width:]
+        low = np.append(low, full * width + np.argmin(tail))
+        high = np.append(high, full * width + np.argmax(tail))
+    return np.unique(np.concatenate(([0, n - 1], low, high)))
+
+def lttb_indices(time, values, n_out):
+    """Return indices chosen by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last samples are always kept; every bucket in between keeps
+    the sample forming the largest triangle with the previously kept sample
+    and the mean of the next bucket.  The scan over buckets is sequential but
+    each bucket is evaluated with vector operations.
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Mean of each inner bucket, plus the last sample as the final "next bucket"
+    counts = np.diff(edges)
+    mean_t = np.append(np.add.reduceat(time[1:n - 1], edges[:-1] - 1) / counts, time[-1])
+    mean_v = np.append(np.add.reduceat(values[1:n - 1], edges[:-1] - 1) / counts, values[-1])
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        t0, v0 = time[previous], values[previous]
+        area = np.abs((t0 - mean_t[k + 1]) * (values[lo:hi] - v0)
+                      - (t0 - time[lo:hi]) * (mean_v[k + 1] - v0))
+        previous = lo + np.argmax(area)
+        indices[k + 1] = previous
+    return indices
+
+def decimation_indices(time, columns, max_points, method="minmax"):
+    """Return sorted sample indices shared by all columns, at most max_points long.
+
+    Each column is reduced on its own and the selections are merged so one
+    time axis serves every signal.  If the merged set exceeds the budget the
+    per-column resolution is halved until it fits.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation method '{method}'")
+    n = len(time)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 2:
+        raise ValueError("max_points must be at least 2")
+
+    budget = max_points
+    while True:
+        if method == "minmax":
+            selected = [minmax_indices(values, max(1, budget // 2)) for values in columns]
+        else:
+            selected = [lttb_indices(time, values, budget) for values in columns]
+        indices = np.unique(np.concatenate(selected)) if selected else np.array([0, n - 1])
+        if len(indices) <= max_points:
+            return indices
+        if budget <= 4:
+            # More signals than budget: keep the bound, drop the surplus extrema
+            return indices[np.linspace(0, len(indices) - 1, max_points).astype(int)]
+        budget //= 2
+
+def time_window(time, t_start=None, t_end=None):
+    """Return the slice of samples with t_start <= t <= t_end."""
+    lo = 0 if t_start is None else np.searchsorted(time, t_start, side="left")
+    hi = len(time) if t_end is None else np.searchsorted(time, t_end, side="right")
+    return slice(lo, hi)
@@ -1,104 +1,626 @@
 # simulation/engine.py
+import copy
+import uuid
 import numpy as np
 from scipy.integrate import solve_ivp
-from models.simulation import SimulationResult
+from models.simulation import SimulationResult, BatchSimulationResult
 from models.circuit import Circuit
+from simulation.solvers import PiecewiseLinearSolver, SegmentedSolver
+from simulation.steady_state import find_periodic_steady_state
+from simulation.compiled import compile_model
+from simulation.topology import recognise_topology
+from simulation.stiffness import select_method
+from simulation.instrumentation import PhaseTimer, counting_method, rejected_steps
+from simulation.result_cache import circuit_fingerprint, result_nbytes
+from simulation.probes import ALL_SIGNALS, alias_names, check_probes, select_probes
+from simulation.sampling import DEFAULT_MAX_SAMPLES, StepSamples, sample_count, sample_times, sampling_plan
 
-def simulate_circuit(circuit, end_time=1.0, step_size=1e-6):
-    """Run simulation for the given circuit."""
-    # Get circuit components and connections
-    components = circuit.components
-    connections = circuit.connections
+SIMULATION_MODES = ("adaptive", "piecewise_linear", "segmented")
+
+MODEL_VARIANTS = ("switched", "averaged")
+
+IMPLICIT_METHODS = ("BDF", "Radau", "LSODA")
+
+def simulate_circuit(circuit, end_time=1.0, step_size=1e-6, mode="adaptive",
+                     model_variant="switched", ripple_envelope=False, progress=None,
+                     sampling="budget", max_samples=DEFAULT_MAX_SAMPLES, samples_per_period=20,
+                     solver_method="auto", probes=None, optional_probes=None, session=None,
+                     warm_start=None):
+    """Run simulation for the given circuit.
+
+    mode selects the integration strategy:
+    - "adaptive": integrate the model derivatives with the solve_ivp method
+      given by solver_method, by default chosen from the stiffness of the
+      model (see simulation.stiffness), within the model's max_step
+    - "piecewise_linear": advance each switching interval exactly using the
+      model's state-space matrices (switched converter models only)
+    - "segmented": restart RK45 on every smooth segment between PWM edges and
+      diode commutations located as events (switched converter models only)
     
-    # Build the simulation model
-    model = build_circuit_model(components, connections)
+    model_variant "averaged" replaces converter switching with its
+    duty-cycle-weighted average dynamics for long-horizon runs, in continuous
+    or discontinuous conduction, recorded in metadata["conduction_mode"];
+    with ripple_envelope the switching-ripple envelope is reconstructed
+    around it.
+    
+    progress, if given, is called as progress(t, nfev) with the simulated time
+    reached and the RHS evaluations so far (None for piecewise_linear, which
+    evaluates none).  An exception raised by it aborts the run.
+    
+    sampling, max_samples and samples_per_period choose the output times as
+    described in simulation.sampling.sampling_plan; the number of samples is
+    checked against max_samples before anything is allocated, and the plan
+    is recorded in metadata["sampling"].
+    
+    probes names the signals to return (see the models' process_results);
+    only those are derived from the trajectory, and unknown names are
+    rejected before the run.  optional_probes names signals returned only
+    if the model has them; the others are dropped and listed in
+    metadata["unknown_probes"].  None for both returns every signal.
+    simulation.probes.ALL_SIGNALS among the probes returns every signal
+    along with the others, and the ones that are aliases of listed signals
+    are recorded in metadata["aliases"].
+    
+    session, a simulation.incremental.ModelSession, keeps the model between
+    runs so a parameter edit updates it in place instead of rebuilding it.
+    warm_start "final" or "steady_state" then starts the run from the
+    session's last final or steady state instead of rest, when it has one;
+    metadata["session"] records what was reused.
+    
+    metadata["instrumentation"] records the time spent in each phase, the
+    solver's accepted and rejected steps and the size of the result, and
+    metadata["solver"] the adaptive method used and why it was chosen.
+    """
+    timer = PhaseTimer()
+    model = _prepare_model(circuit, mode, model_variant, ripple_envelope, timer=timer, session=session)
+    probes, unknown_probes = check_probes(model, probes, optional_probes)
     
     # Set up initial conditions
-    initial_state = model.get_initial_state()
+    initial_state, warm_info = _initial_state(model, session, warm_start)
     
     # Set up time points
     t_span = (0, end_time)
-    t_eval = np.arange(0, end_time, step_size)
+    t_eval, sampling_info = _output_times(model, mode, end_time, step_size, sampling,
+                                          max_samples, samples_per_period)
+    
+    metadata = {"mode": mode, "model_variant": model_variant, "topology": model.topology,
+                "switching_frequency": _switching_frequency(model),
+                "sampling": sampling_info}
+    if model_variant == "averaged":
+        metadata["conduction_mode"] = model.conduction_mode
+    if unknown_probes:
+        metadata["unknown_probes"] = unknown_probes
+    if session is not None:
+        metadata["session"] = dict(session.stats(), warm_start=warm_info)
     
-    # Solve the differential equations
+    if mode in ("piecewise_linear", "segmented"):
+        solver = _switched_solver(model, mode)
+        with timer.phase("solve"):
+            t, y, stats = solver.solve(t_eval, end_time, initial_state, progress=progress)
+        metadata.update(stats)
+    else:
+        # Solve the differential equations
+        with timer.phase("stiffness"):
+            rhs, options, metadata["solver"] = _integration_options(model, end_time, solver_method)
+        # Solver step points are kept within the budget as the solver takes them
+        samples = StepSamples(0, initial_state, max_samples) if t_eval is None and max_samples else None
+        with timer.phase("solve"):
+            t, y, stats = _solve_counted(_reporting_rhs(rhs, progress) if progress else rhs,
+                                         t_span, initial_state, t_eval, options, samples)
+        metadata.update(stats)
+        if t_eval is None:
+            sampling_info["stride"] = samples.stride if samples else 1
+            sampling_info["samples"] = len(t)
+    if session is not None and len(t):
+        session.record(final_state=y[:, -1])
+    
+    # Process results
+    with timer.phase("process"):
+        signals = model.process_results(t, y)
+        variables = select_probes(signals, probes)
+    if probes and ALL_SIGNALS in probes:
+        metadata["aliases"] = alias_names(signals, variables)
+    
+    result = SimulationResult(t, variables, circuit.id, metadata=metadata)
+    metadata["instrumentation"] = _instrumentation(timer, metadata, result)
+    return result
+
+def simulate_circuit_stream(circuit, end_time=1.0, step_size=1e-6, mode="adaptive",
+                            model_variant="switched", ripple_envelope=False,
+                            chunk_samples=50000, max_points=2000, progress=None, probes=None,
+                            optional_probes=None):
+    """Simulate the circuit in time chunks, yielding each chunk as it is computed.
+
+    Takes the same arguments as simulate_circuit.  Each yielded
+    SimulationResult covers one chunk of about chunk_samples output samples,
+    decimated to max_points, and shares the run's result id; its metadata
+    records the chunk index, time span and whether it is the last one.  Only
+    one chunk is held in memory at a time.  For switched solvers the chunks
+    span whole switching periods so every chunk restarts on a PWM period
+    boundary.  max_points None keeps the chunks at full resolution, and
+    progress(t, nfev) is reported after every chunk.
+    """
+    model = _prepare_model(circuit, mode, model_variant, ripple_envelope)
+    probes, unknown_probes = check_probes(model, probes, optional_probes)
+    solver = _switched_solver(model, mode) if mode != "adaptive" else None
+    if solver is None:
+        rhs, options, selection = _integration_options(model, end_time)
+    
+    chunk_duration = chunk_samples * step_size
+    period = getattr(model, "switching_period", None)
+    if solver is not None and period:
+        chunk_duration = max(1, round(chunk_duration / period)) * period
+    n_chunks = max(1, int(np.ceil(end_time / chunk_duration - 1e-9)))
+    n_samples = int(np.ceil(end_time / step_size - 1e-9))
+    
+    stream_id = str(uuid.uuid4())
+    state = np.array(model.get_initial_state(), dtype=float)
+    first = 0
+    for k in range(n_chunks):
+        t_start = k * chunk_duration
+        t_stop = min((k + 1) * chunk_duration, end_time)
+        # Output samples i * step_size that fall inside [t_start, t_stop)
+        last = n_samples if k == n_chunks - 1 else min(n_samples, int(np.ceil(t_stop / step_size - 1e-9)))
+        t_eval = np.append(np.clip(np.arange(first, last) * step_size, t_start, t_stop), t_stop)
+        
+        metadata = {"mode": mode, "model_variant": model_variant, "chunk": k,
+                    "chunks": n_chunks, "t_start": t_start, "t_stop": t_stop,
+                    "final": k == n_chunks - 1,
+                    "switching_frequency": _switching_frequency(model)}
+        if unknown_probes:
+            metadata["unknown_probes"] = unknown_probes
+        if solver is not None:
+            # The PWM schedule is periodic, so each chunk is solved from t = 0
+            t, y, stats = solver.solve(t_eval - t_start, t_stop - t_start, state)
+            t = t + t_start
+            metadata.update(stats)
+        else:
+            metadata["solver"] = selection
+            solution = solve_ivp(rhs, (t_start, t_stop), state, t_eval=t_eval, **options)
+            t, y = solution.t, solution.y
+            metadata["nfev"] = solution.nfev
+            metadata["njev"] = solution.njev
+        
+        # The appended chunk end only carries the state into the next chunk
+        state = y[:, -1].copy()
+        t, y = t[:-1], y[:, :-1]
+        first = last
+        
+        chunk = SimulationResult(t, select_probes(model.process_results(t, y), probes), circuit.id,
+                                 metadata=metadata)
+        if max_points:
+            chunk = chunk.decimate(max_points)
+        chunk.id = stream_id
+        if progress is not None:
+            progress(t_stop, metadata.get("nfev"))
+        yield chunk
+
+def simulate_to_store(circuit, store, end_time=1.0, step_size=1e-6, mode="adaptive",
+                      model_variant="switched", ripple_envelope=False, progress=None,
+                      chunk_samples=50000, max_samples=None, probes=None, optional_probes=None):
+    """Simulate the circuit chunk by chunk straight into a ResultStore.
+
+    Takes the simulate_circuit arguments; the run is integrated as in
+    simulate_circuit_stream and every full-resolution chunk is appended to
+    the store's column files, so memory use is bounded by chunk_samples
+    however long the run.  max_samples bounds the samples written.  Returns
+    the stored result, whose arrays are memory-mapped from disk.
+    """
+    samples = sample_count(end_time, step_size)
+    if max_samples is not None and samples > max_samples:
+        raise ValueError(f"{samples} samples exceed the storage budget of {max_samples}")
+    
+    writer = None
+    totals = {"nfev": 0, "njev": 0, "switching_intervals": 0, "segments": 0}
+    try:
+        for chunk in simulate_circuit_stream(circuit, end_time, step_size, mode, model_variant,
+                                             ripple_envelope, chunk_samples=chunk_samples,
+                                             max_points=None, progress=progress, probes=probes,
+                                             optional_probes=optional_probes):
+            if writer is None:
+                writer = store.writer(chunk.id, circuit.id)
+            writer.append(chunk.time_points, chunk.variables)
+            for key in totals:
+                totals[key] += chunk.metadata.get(key) or 0
+            chunks = chunk.metadata["chunks"]
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    
+    metadata = {"mode": mode, "model_variant": model_variant, "chunks": chunks,
+                "switching_frequency": chunk.metadata.get("switching_frequency"),
+                "sampling": {"policy": "fixed", "max_samples": max_samples,
+                             "requested_step": step_size, "step": step_size,
+                             "stride": 1, "samples": writer.samples}}
+    if "unknown_probes" in chunk.metadata:
+        metadata["unknown_probes"] = chunk.metadata["unknown_probes"]
+    metadata.update({key: value for key, value in totals.items() if value})
+    return writer.close(metadata)
+
+def _prepare_model(circuit, mode, model_variant, ripple_envelope, timer=None, session=None):
+    """Validate the run settings and build the model to integrate, or take it from session."""
+    if mode not in SIMULATION_MODES:
+        raise ValueError(f"Unknown simulation mode '{mode}'")
+    if model_variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{model_variant}'")
+    
+    # Build the simulation model
+    model = _circuit_model(circuit, timer, session)
+    if model_variant == "averaged":
+        if not hasattr(model, "averaged"):
+            raise ValueError("The averaged variant requires a switched converter model")
+        if mode != "adaptive":
+            raise ValueError("The averaged variant has no switching and only supports the adaptive mode")
+        topology, stiffness_key = model.topology, model.stiffness_key
+        model = model.averaged(ripple_envelope=ripple_envelope)
+        model.topology = topology
+        model.stiffness_key = (stiffness_key, model_variant, ripple_envelope)
+    return model
+
+def _circuit_model(circuit, timer=None, session=None):
+    """Build the circuit's model, or update the session's model to the circuit."""
+    if session is not None:
+        model = session.model_for(circuit, timer=timer)
+    else:
+        model = build_circuit_model(circuit.components, circuit.connections, node_index=circuit.node_index(),
+                                    timer=timer)
+    # Circuits with the same physics share one stiffness estimate, whatever their ids
+    model.stiffness_key = circuit_fingerprint(circuit)
+    return model
+
+def _initial_state(model, session, warm_start):
+    """Return the run's initial state and, for a warm start, where it came from."""
+    if warm_start is None:
+        return model.get_initial_state(), None
+    if session is None:
+        raise ValueError("A warm start needs a model session")
+    state = session.warm_state(model, warm_start)
+    if state is None:
+        return model.get_initial_state(), {"requested": warm_start, "applied": False}
+    return state, {"requested": warm_start, "applied": True}
+
+def _output_times(model, mode, end_time, step_size, sampling, max_samples, samples_per_period):
+    """Return (t_eval, sampling info) for a run; t_eval None leaves the choice to the solver.
+
+    The interval-wise solvers need explicit times, so for them the solver
+    policy samples the switching instants.
+    """
+    period = getattr(model, "switching_period", None)
+    step, count, info = sampling_plan(end_time, step_size, sampling, max_samples,
+                                      period=period, samples_per_period=samples_per_period)
+    if step is not None:
+        return sample_times(step, count), info
+    if mode == "adaptive":
+        return None, info
+    
+    instants = 2 * sample_count(end_time, period) + 1
+    if max_samples is not None and instants > max_samples:
+        raise ValueError(f"{instants} switching instants exceed the budget of {max_samples}")
+    boundaries, _ = model.switching_instants(end_time)
+    info["samples"] = len(boundaries)
+    return np.asarray(boundaries, dtype=float), info
+
+def _switched_solver(model, mode):
+    """Return the interval-wise solver for the piecewise_linear or segmented mode."""
+    if not hasattr(model, "state_space"):
+        raise ValueError(f"The {mode} mode requires a switched converter model")
+    if mode == "piecewise_linear":
+        return PiecewiseLinearSolver(model)
+    return SegmentedSolver(model)
+
+def _switching_frequency(model):
+    """Return the model's switching frequency, or None if it does not switch."""
+    period = getattr(model, "switching_period", None)
+    return 1.0 / period if period else None
+
+def _integration_options(model, end_time, method="auto"):
+    """Return the RHS to integrate, the solve_ivp options and the method selection.
+
+    The method is chosen from the model's stiffness unless one is requested
+    (see simulation.stiffness.select_method).  A compiled RHS is used when
+    the model has one.  The implicit methods get the analytic Jacobian, from
+    the compiled model or the model's jacobian method; LSODA only takes
+    dense Jacobians.
+    """
+    selection = select_method(model, end_time, method)
+    method = selection["method"]
+    options = {"method": method, "max_step": getattr(model, 'max_step', np.inf)}
+    compiled = getattr(model, 'compiled', None)
+    rhs = model.derivatives if compiled is None else compiled.solver_rhs(method)
+    if method in IMPLICIT_METHODS:
+        jacobian = getattr(model, 'jacobian', None) if compiled is None else compiled.jacobian
+        if jacobian is not None and method == "LSODA":
+            jacobian = _dense_jacobian(jacobian)
+        if jacobian is not None:
+            options["jac"] = jacobian
+        selection["jacobian"] = "analytic" if jacobian is not None else "finite differences"
+    return rhs, options, selection
+
+def _dense_jacobian(jacobian):
+    """Wrap a Jacobian that may return a sparse matrix so it returns an array."""
+    def dense(t, y):
+        matrix = jacobian(t, y)
+        return matrix.toarray() if hasattr(matrix, "toarray") else matrix
+    return dense
+
+def _solve_counted(rhs, t_span, initial_state, t_eval, options, samples=None):
+    """Run solve_ivp counting accepted steps; return (t, y, solver statistics).
+
+    The statistics hold the RHS and Jacobian evaluations, LU decompositions,
+    accepted steps and, for the explicit Runge-Kutta methods, rejected steps.
+    With t_eval None the output is the solver's step points, recorded in
+    samples (a simulation.sampling.StepSamples) if given rather than all
+    kept by solve_ivp.
+    """
+    method = counting_method(options["method"], on_step=samples.record if samples else None)
+    if samples is not None:
+        # An empty t_eval stops solve_ivp from collecting every step itself
+        t_eval = np.empty(0)
+    solution = solve_ivp(rhs, t_span, initial_state, t_eval=t_eval, **dict(options, method=method))
+    stats = {
+        "nfev": solution.nfev,
+        "njev": solution.njev,
+        "nlu": solution.nlu,
+        "steps": method.steps,
+        "rejected_steps": rejected_steps(options["method"], solution.nfev, method.steps),
+    }
+    if samples is not None:
+        return (*samples.points(), stats)
+    return solution.t, solution.y, stats
+
+def _instrumentation(timer, metadata, result):
+    """Summarise where a run spent its time and how large its result is."""
+    return {
+        "phases": dict(timer.timings),
+        "total_time": sum(timer.timings.values()),
+        "samples": len(result.time_points),
+        "variables": len(result.variables),
+        "result_bytes": result_nbytes(result),
+        "rhs_evaluations": metadata.get("nfev", 0),
+    }
+
+def _reporting_rhs(derivatives, progress, every=200):
+    """Wrap a RHS so progress(t, nfev) is reported every few evaluations."""
+    nfev = 0
+    
+    def rhs(t, y):
+        nonlocal nfev
+        nfev += 1
+        if nfev % every == 0:
+            progress(t, nfev)
+        return derivatives(t, y)
+    
+    return rhs
+
+def simulate_steady_state(circuit, periods=3, step_size=1e-6, tolerance=1e-9, max_iterations=50,
+                          progress=None, max_samples=DEFAULT_MAX_SAMPLES, probes=None, optional_probes=None,
+                          session=None, warm_start=None):
+    """Simulate a few periods of the circuit's periodic steady state.
+
+    The steady state is found by Newton shooting over one switching period
+    instead of integrating through the startup transient.  progress is
+    reported once per shooting iteration, at time 0, and while the final
+    periods are simulated, as in simulate_circuit, so a run can be
+    cancelled during the search too.
+    The output is sampled every step_size, thinned to at most max_samples,
+    and probes and optional_probes select the signals returned, as in
+    simulate_circuit.
+    
+    With a session the model is kept between runs as in simulate_circuit,
+    and warm_start seeds the shooting with the session's last steady or
+    final state, so after a small parameter edit Newton starts next to the
+    new solution.
+    """
+    timer = PhaseTimer()
+    model = _circuit_model(circuit, timer, session)
+    probes, unknown_probes = check_probes(model, probes, optional_probes)
+    guess, warm_info = _initial_state(model, session, warm_start)
+    with timer.phase("shooting"):
+        initial_state, info = find_periodic_steady_state(model, tolerance=tolerance, max_iterations=max_iterations,
+                                                         initial_state=guess, progress=progress)
+    
+    end_time = periods * info["period"]
+    step, count, sampling_info = sampling_plan(end_time, step_size, "budget", max_samples)
+    t_eval = sample_times(step, count)
+    
+    stats = {}
+    with timer.phase("solve"):
+        if hasattr(model, "state_space"):
+            t, y, _ = PiecewiseLinearSolver(model).solve(t_eval, end_time, initial_state, progress=progress)
+        else:
+            rhs, options, stats["solver"] = _integration_options(model, end_time)
+            t, y, solver_stats = _solve_counted(_reporting_rhs(rhs, progress) if progress else rhs,
+                                                (0, end_time), initial_state, t_eval, options)
+            stats.update(solver_stats)
+    
+    if session is not None:
+        session.record(final_state=y[:, -1] if len(t) else None, steady_state=initial_state)
+        stats["session"] = dict(session.stats(), warm_start=warm_info)
+    
+    with timer.phase("process"):
+        signals = model.process_results(t, y)
+        variables = select_probes(signals, probes)
+    metadata = dict(info, mode="steady_state", periods=periods, topology=model.topology,
+                    switching_frequency=_switching_frequency(model), sampling=sampling_info, **stats)
+    if unknown_probes:
+        metadata["unknown_probes"] = unknown_probes
+    if probes and ALL_SIGNALS in probes:
+        metadata["aliases"] = alias_names(signals, variables)
+    
+    result = SimulationResult(t, variables, circuit.id, metadata=metadata)
+    metadata["instrumentation"] = _instrumentation(timer, metadata, result)
+    return result
+
+def simulate_batch(circuit, parameter_sets, end_time=1.0, step_size=1e-6, max_samples=DEFAULT_MAX_SAMPLES,
+                   probes=None):
+    """Simulate many parameter variants of one converter circuit in a single solve.
+
+    Each parameter set maps a component id (or name) to the parameters that
+    override that component's values, e.g. {"L1": {"inductance": 2e-4}}.
+    max_samples bounds the samples of all variants together, and probes
+    selects the signals returned, as in simulate_circuit.
+    """
+    if not parameter_sets:
+        raise ValueError("At least one parameter set is required")
+    
+    # Identify the topology once; every variant shares it
+    base_model = build_circuit_model(circuit.components, circuit.connections, node_index=circuit.node_index())
+    if not hasattr(base_model, "state_space"):
+        raise ValueError("Batch simulation requires a switched converter topology")
+    check_parameters(base_model, circuit.components, parameter_sets)
+    
+    from simulation.components.converters import ConverterBatch
+    models = [
+        type(base_model)(apply_parameters(circuit.components, parameters), circuit.connections,
+                         roles=base_model.roles)
+        for parameters in parameter_sets
+    ]
+    batch = ConverterBatch(models)
+    check_probes(base_model, probes)
+    
+    budget = None if max_samples is None else max(1, max_samples // len(models))
+    step, count, sampling_info = sampling_plan(end_time, step_size, "budget", budget)
+    t_eval = sample_times(step, count)
     solution = solve_ivp(
-        model.derivatives,
-        t_span,
-        initial_state,
+        batch.derivatives,
+        (0, end_time),
+        batch.get_initial_state(),
         method='RK45',
-        t_eval=t_eval
+        t_eval=t_eval,
+        max_step=batch.max_step
     )
     
-    # Process results
-    variables = model.process_results(solution.t, solution.y)
+    variables = select_probes(batch.process_results(solution.t, solution.y), probes)
+    metadata = {"mode": "batch", "variants": batch.n_variants, "nfev": solution.nfev,
+                "sampling": sampling_info}
     
-    return SimulationResult(solution.t, variables, circuit.id)
+    return BatchSimulationResult(solution.t, variables, circuit.id, list(parameter_sets), metadata=metadata)
+
+def apply_parameters(components, parameters):
+    """Return a copy of components with parameter overrides applied.
+
+    parameters maps a component id or name to a dict of parameter values;
+    components that are not overridden are shared with the original circuit.
+    """
+    by_name = {component.name: comp_id for comp_id, component in components.items()}
+    updated = dict(components)
+    for key, values in parameters.items():
+        comp_id = key if key in components else by_name.get(key)
+        if comp_id is None:
+            raise ValueError(f"Unknown component '{key}' in parameter set")
+        
+        component = copy.copy(components[comp_id])
+        component.parameters = dict(component.parameters, **values)
+        updated[comp_id] = component
+    return updated
 
-def build_circuit_model(components, connections):
-    """Build appropriate simulation model based on circuit topology."""
-    # First identify the circuit topology
-    topology = identify_topology(components, connections)
+def check_parameters(model, components, parameter_sets):
+    """Raise ValueError if parameter_sets vary parameters the model does not read.
+
+    Such as the on-resistance of the converter models' ideal switch, which
+    would silently leave every variant identical.  Models without
+    used_parameters are taken to read every parameter.
+    """
+    used_parameters = getattr(model, "used_parameters", None)
+    if used_parameters is None:
+        return
+    used = used_parameters()
+    by_name = {component.name: comp_id for comp_id, component in components.items()}
+    unused = sorted({
+        f"{key}.{parameter}"
+        for parameters in parameter_sets
+        for key, values in parameters.items()
+        for parameter in values
+        if (key if key in components else by_name.get(key), parameter) not in used
+    })
+    if unused:
+        raise ValueError(f"The {model.topology or type(model).__name__} model does not use parameter(s) "
+                         f"{', '.join(unused)}; varying them would not change the results")
+
+def build_circuit_model(components, connections, compile_rhs=True, node_index=None, timer=None):
+    """Build appropriate simulation model based on circuit topology.
     
+    With compile_rhs, switched converter models also get a compiled
+    right-hand side and Jacobian with their parameters frozen in, attached
+    as model.compiled (None for models that cannot be compiled).  node_index
+    is the circuit's terminal-to-node mapping (Circuit.node_index()); when
+    given, the generic model uses it instead of recomputing the nodes.
+    The detected topology is kept as model.topology, and with a PhaseTimer
+    the topology, model and compile phases are timed.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase("topology"):
+        topology, roles = _identify_topology(components, connections, node_index)
+    with timer.phase("model"):
+        model = _topology_model(topology, components, connections, node_index, roles)
+    with timer.phase("compile"):
+        model.compiled = compile_model(model) if compile_rhs else None
+    model.topology = topology
+    return model
+
+def _topology_model(topology, components, connections, node_index=None, roles=None):
+    """Instantiate the model class for an identified circuit topology.
+
+    roles binds the converter models' components, as returned by
+    recognise_topology.
+    """
     # Based on topology, create the appropriate model
     if topology == "buck_converter":
         from simulation.components.converters import BuckConverter
-        return BuckConverter(components, connections)
+        return BuckConverter(components, connections, roles=roles)
         
     elif topology == "boost_converter":
         from simulation.components.converters import BoostConverter
-        return BoostConverter(components, connections)
+        return BoostConverter(components, connections, roles=roles)
     
     elif topology == "buck_boost_converter":
         from simulation.components.converters import BuckBoostConverter
-        return BuckBoostConverter(components, connections)
+        return BuckBoostConverter(components, connections, roles=roles)
     
     # If no specific topology identified, use a generic circuit model
     from simulation.components.generic import GenericCircuitModel
-    return GenericCircuitModel(components, connections)
+    return GenericCircuitModel(components, connections, node_index=node_index)
+
+def identify_topology(components, connections, node_index=None):
+    """Identify the converter topology of a circuit from its wiring.
 
-def identify_topology(components, connections):
-    """Identify circuit topology based on component types and connections."""
-    # Count component types
+    The circuit's component/net graph is matched against the templates in
+    simulation.topology, memoised by a hash of the wiring so parameter edits
+    do not repeat the matching.  node_index is the circuit's terminal-to-node
+    mapping (Circuit.node_index()) and is rebuilt from connections if not
+    given.  Circuits without any wiring fall back to counting component
+    types, with the component names telling boost and buck-boost apart.
+    """
+    return _identify_topology(components, connections, node_index)[0]
+
+def _identify_topology(components, connections, node_index=None):
+    """Return (topology, roles) as identify_topology and recognise_topology do; roles is None if unwired."""
+    if not connections:
+        return _topology_from_counts(components), None
+
+    if node_index is None:
+        from simulation.components.generic import build_node_index
+        node_index = build_node_index(components, connections)
+    topology, roles, _ = recognise_topology(components, node_index)
+    return topology or "generic", roles
+
+def _topology_from_counts(components):
+    """Guess the topology of an unwired circuit from its component types."""
     component_counts = {}
     for component in components.values():
         component_type = component.type
         component_counts[component_type] = component_counts.get(component_type, 0) + 1
-    
-    # Check for common converter topologies
-    
-    # Buck converter typically has: 
-    # - One switch (MOSFET/IGBT)
-    # - One diode
-    # - One inductor
-    # - One capacitor
+
     if (component_counts.get("mosfet", 0) + component_counts.get("igbt", 0) >= 1 and
         component_counts.get("diode", 0) >= 1 and
         component_counts.get("inductor", 0) >= 1 and
         component_counts.get("capacitor", 0) >= 1):
-        
-        # We also need to check connectivity to confirm it's a buck converter
-        # This would require more detailed analysis of the connections
-        # For simplicity, we're making an assumption based on component count
-        
-        return "buck_converter"
-    
-    # Boost converter has similar components but different topology
-    elif (component_counts.get("mosfet", 0) + component_counts.get("igbt", 0) >= 1 and
-          component_counts.get("diode", 0) >= 1 and
-          component_counts.get("inductor", 0) >= 1 and
-          component_counts.get("capacitor", 0) >= 1):
-          
-        # For a more accurate identification, we would check connections
-        # For now, let's differentiate based on user naming or parameters
-        
-        # This is a simplified approach - in practice, we would analyze connections
-        for component in components.values():
-            if "boost" in component.name.lower():
-                return "boost_converter"
-        
-        # Default to buck if we can't differentiate
+        names = " ".join(component.name.lower() for component in components.values())
+        if "buck-boost" in names or "buck_boost" in names or "buckboost" in names:
+            return "buck_boost_converter"
+        if "boost" in names:
+            return "boost_converter"
         return "buck_converter"
-    
-    # Default to generic circuit model
-    return "generic"
 
+    return "generic"
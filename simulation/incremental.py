@@ -0,0 +1,96 @@
+# simulation/incremental.py
+import hashlib
+import json
+import threading
+import numpy as np
+from simulation.compiled import compile_model
+from simulation.instrumentation import PhaseTimer
+
+WARM_START_MODES = ("final", "steady_state")
+
+def circuit_structure(circuit):
+    """Return a hash of everything a model is built from except parameter values.
+
+    Component ids, types, names and terminals and the wiring contribute;
+    parameters, positions and rotations do not.  Names are included because
+    unwired circuits are recognised by them.
+    """
+    canonical = json.dumps({
+        "components": [[comp_id, component.type, component.name, list(component.terminals)]
+                       for comp_id, component in circuit.components.items()],
+        "connections": sorted([str(value) for value in connection] for connection in circuit.connections),
+    }, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ModelSession:
+    """The simulation model of one editor session, kept between runs.
+
+    model_for(circuit) returns the kept model unchanged when the circuit
+    has not changed, updates it in place through the model's
+    update_parameters when only parameter values changed, and builds a new
+    model when components or wiring did.  Factorisations, Jacobians and the
+    compiled right-hand side that survive an edit are reused.  The session
+    also remembers the state at the last sample of the previous run and the
+    last periodic steady state, for runs that warm-start from them.
+
+    Models keep per-run state, so runs sharing a session must hold lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.model = None
+        self.structure = None
+        self.parameters = {}
+        self.final_state = None
+        self.steady_state = None
+        self.last_change = None
+        self.counts = {"built": 0, "updated": 0, "reused": 0}
+
+    def model_for(self, circuit, timer=None):
+        """Return the model for the circuit's current components and parameters."""
+        timer = timer or PhaseTimer()
+        structure = circuit_structure(circuit)
+        parameters = {comp_id: dict(component.parameters) for comp_id, component in circuit.components.items()}
+
+        if self.model is None or structure != self.structure:
+            from simulation.engine import build_circuit_model
+            self.model = build_circuit_model(circuit.components, circuit.connections,
+                                             node_index=circuit.node_index(), timer=timer)
+            self.structure = structure
+            # States of a different circuit cannot seed this one
+            self.final_state = self.steady_state = None
+            self.last_change = "built"
+        else:
+            changed = [comp_id for comp_id, values in parameters.items() if values != self.parameters.get(comp_id)]
+            if changed:
+                with timer.phase("model"):
+                    self.model.update_parameters(circuit.components, changed)
+                with timer.phase("compile"):
+                    if self.model.compiled is not None:
+                        self.model.compiled = compile_model(self.model)
+                self.last_change = "updated"
+            else:
+                self.last_change = "reused"
+
+        self.parameters = parameters
+        self.counts[self.last_change] += 1
+        return self.model
+
+    def warm_state(self, model, warm_start):
+        """Return a copy of the remembered state warm_start names, or None if there is none."""
+        if warm_start not in WARM_START_MODES:
+            raise ValueError(f"Unknown warm start '{warm_start}', expected one of {WARM_START_MODES}")
+        state = self.steady_state if warm_start == "steady_state" else self.final_state
+        if state is None or len(state) != len(model.get_initial_state()):
+            return None
+        return np.array(state, dtype=float)
+
+    def record(self, final_state=None, steady_state=None):
+        """Remember the states of a finished run for later warm starts."""
+        if final_state is not None:
+            self.final_state = np.array(final_state, dtype=float)
+        if steady_state is not None:
+            self.steady_state = np.array(steady_state, dtype=float)
+
+    def stats(self):
+        return {"model": self.last_change, **self.counts}
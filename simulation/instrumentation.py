@@ -0,0 +1,214 @@
+# simulation/instrumentation.py
+import bisect
+import collections
+import contextlib
+import sys
+import threading
+import time
+from scipy.integrate import RK23, RK45, DOP853, Radau, BDF, LSODA
+
+SOLVER_METHODS = {"RK23": RK23, "RK45": RK45, "DOP853": DOP853, "Radau": Radau, "BDF": BDF, "LSODA": LSODA}
+
+# RHS evaluations per attempted step of the explicit methods whose rejected
+# steps can be recovered from nfev (two more are spent choosing the first step)
+RK_EVALUATIONS_PER_STEP = {"RK23": 3, "RK45": 6}
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(2 ** k for k in range(10, 32, 2))
+
+class PhaseTimer:
+    """Wall-clock time spent in named phases of one run.
+
+    Re-entering a phase adds to its total, so a phase may be timed in pieces.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+def counting_method(method, on_step=None):
+    """Return a solve_ivp method class that counts its accepted steps in .steps.
+
+    on_step, if given, is called as on_step(t, y) after every accepted step.
+    """
+    base = SOLVER_METHODS[method] if isinstance(method, str) else method
+
+    class Counting(base):
+        steps = 0
+
+        def _step_impl(self):
+            accepted, message = super()._step_impl()
+            if accepted:
+                type(self).steps += 1
+                if on_step is not None:
+                    on_step(self.t, self.y)
+            return accepted, message
+
+    Counting.__name__ = base.__name__
+    return Counting
+
+def rejected_steps(method, nfev, steps):
+    """Return the number of rejected steps of an explicit Runge-Kutta run, or None."""
+    per_step = RK_EVALUATIONS_PER_STEP.get(method)
+    if per_step is None or nfev < 2:
+        return None
+    return max(0, (nfev - 2) // per_step - steps)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms rendered in the Prometheus text format.
+
+    Metrics are declared once with their help text and observed with a dict
+    of labels.  collect callbacks registered with add_collector are called at
+    render time and return (name, labels, value) gauge samples, for values
+    that are cheaper to read on demand than to track.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = collections.OrderedDict()  # name -> (type, help, buckets)
+        self._values = collections.defaultdict(dict)  # name -> labels -> value or histogram state
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        self._metrics[name] = ("counter", help_text, None)
+
+    def gauge(self, name, help_text):
+        self._metrics[name] = ("gauge", help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._metrics[name] = ("histogram", help_text, tuple(buckets))
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def inc(self, name, value=1, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name, value, labels=None):
+        buckets = self._metrics[name][2]
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            state = self._values[name].get(key)
+            if state is None:
+                state = self._values[name][key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        collected = collections.defaultdict(dict)
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                collected[name][tuple(sorted(labels.items()))] = value
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._metrics.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                values = {**self._values.get(name, {}), **collected.get(name, {})}
+                for labels, value in values.items():
+                    if kind != "histogram":
+                        lines.append(f"{name}{_label_text(labels)} {value:g}")
+                        continue
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_label_text(labels, [('le', f'{bound:g}')])} {cumulative}")
+                    lines.append(f"{name}_bucket{_label_text(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {total:g}")
+                    lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+class SamplingProfiler:
+    """Statistical profiler of one thread, sampling its Python stack at a fixed interval.
+
+    A background thread reads the target thread's current frame every
+    interval seconds, so the profiled code runs unmodified and the overhead
+    does not depend on how many functions it calls.  Use as a context
+    manager around the code to profile, then read report().
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self._self_counts = collections.Counter()
+        self._total_counts = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                location = f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+                if leaf:
+                    self._self_counts[location] += 1
+                    leaf = False
+                if location not in seen:
+                    # Recursive frames count once towards their total
+                    seen.add(location)
+                    self._total_counts[location] += 1
+                frame = frame.f_back
+
+    def report(self, top=25):
+        """Return the sample count and the functions with most samples of their own.
+
+        self counts samples in which the function itself was running, total
+        those in which it was anywhere on the stack.
+        """
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "functions": [
+                {"function": location, "self": count, "total": self._total_counts[location],
+                 "fraction": count / self.samples}
+                for location, count in self._self_counts.most_common(top)
+            ],
+        }
@@ -0,0 +1,181 @@
+# simulation/jobs.py
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+JOB_STATES = ("queued", "running", "completed", "failed", "cancelled")
+
+class JobCancelled(Exception):
+    """Raised inside a running job to abort its integration."""
+
+class SimulationJob:
+    """A queued simulation with its progress, outcome and cancellation flag."""
+
+    def __init__(self, function, kwargs, owner, end_time=None):
+        self.id = str(uuid.uuid4())
+        self.function = function
+        self.kwargs = kwargs
+        self.owner = owner
+        self.end_time = end_time
+        self.status = "queued"
+        self.simulated_time = 0.0
+        self.nfev = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed", "cancelled")
+
+    @property
+    def progress(self):
+        """Fraction of the simulated time span covered so far."""
+        if self.status == "completed":
+            return 1.0
+        if not self.end_time:
+            return 0.0
+        return min(1.0, self.simulated_time / self.end_time)
+
+    def report(self, t, nfev):
+        """Progress callback handed to the integrator; aborts it once cancelled."""
+        self.simulated_time = float(t)
+        self.nfev = nfev
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        """Execute the job in the calling thread and record its outcome."""
+        if self._cancel.is_set():
+            self.status = "cancelled"
+            self.finished_at = time.time()
+            return
+
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            self.result = self.function(progress=self.report, **self.kwargs)
+            self.status = "completed"
+        except JobCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        self.finished_at = time.time()
+
+    def to_json(self):
+        """Convert the job status to JSON."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "simulated_time": self.simulated_time,
+            "nfev": self.nfev,
+            "error": self.error,
+            "result_id": self.result.id if self.result is not None else None,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    """Bounded pool of worker threads running simulation jobs.
+
+    Every owner (one browser session) has its own FIFO queue and workers take
+    jobs from the owners in round-robin order, so one user submitting many
+    long runs cannot starve the others.  Finished jobs are kept for
+    result_ttl seconds and then evicted.
+    """
+
+    def __init__(self, max_workers=2, result_ttl=600, max_queued=100):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.max_queued = max_queued
+        self._jobs = {}
+        self._queues = OrderedDict()  # owner -> deque of queued jobs, in service order
+        self._queued = 0
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Workers start lazily so importing the app spawns no threads
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, function, kwargs, owner=None, end_time=None):
+        """Queue function(progress=..., **kwargs) and return the job."""
+        job = SimulationJob(function, kwargs, owner, end_time=end_time)
+        with self._condition:
+            self._evict_expired()
+            if self._queued >= self.max_queued:
+                raise RuntimeError("Too many queued simulations, try again later")
+            self._jobs[job.id] = job
+            self._queues.setdefault(owner, deque()).append(job)
+            self._queued += 1
+            self._ensure_workers()
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if unknown or expired."""
+        with self._condition:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; a running job stops at its next progress report."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        with self._condition:
+            queue = self._queues.get(job.owner)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[job.owner]
+                job.run()  # records the cancellation without running
+        return job
+
+    def _next_job(self):
+        """Pop the next job, rotating the serviced owner to the back."""
+        owner, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        del self._queues[owner]
+        if queue:
+            self._queues[owner] = queue
+        self._queued -= 1
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queues:
+                    self._condition.wait()
+                job = self._next_job()
+            job.run()
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        """Return queue and job counts by state."""
+        with self._condition:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {"workers": self.max_workers, "queued": self._queued, "jobs": counts}
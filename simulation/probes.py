@@ -0,0 +1,151 @@
+# simulation/probes.py
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+
+# Unknown-probe errors list at most this many of the available names
+LISTED_PROBES = 20
+
+# Probe name selecting every listed signal, alongside any other probes
+ALL_SIGNALS = "*"
+
+class LazyVariables(Mapping):
+    """Named signals of a run, each computed from the trajectory when first read.
+
+    Models register every signal they can derive as a function of no
+    arguments; it is evaluated (once) only when read, so asking for a few
+    probes never computes the others.  Constants are registered as scalars
+    and read as read-only broadcast views holding a single value.  Aliases
+    resolve like signals but are not listed, so iterating over all signals
+    returns each one once.
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(np.atleast_1d(shape))
+        self._sources = OrderedDict()  # name -> function, scalar or aliased name
+        self._aliases = {}
+        self._values = {}
+
+    def add(self, name, compute):
+        self._sources[name] = compute
+
+    def add_constant(self, name, value):
+        self._sources[name] = float(value)
+
+    def add_alias(self, name, target):
+        """Make name resolve to target, another signal's name or a function."""
+        self._aliases.setdefault(name, target)
+
+    def constants(self):
+        """Return the scalar value of every constant signal."""
+        return {name: value for name, value in self._sources.items() if isinstance(value, float)}
+
+    def names(self):
+        """Return every resolvable name, listed signals first."""
+        return list(self._sources) + [name for name in self._aliases if name not in self._sources]
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            source = self._sources[name] if name in self._sources else self._aliases[name]
+            if isinstance(source, str):
+                value = self[source]
+            elif callable(source):
+                value = source()
+            else:
+                value = np.broadcast_to(np.float64(source), self.shape)
+            self._values[name] = value
+        return self._values[name]
+
+    def __contains__(self, name):
+        return name in self._sources or name in self._aliases
+
+    def __iter__(self):
+        return iter(self._sources)
+
+    def __len__(self):
+        return len(self._sources)
+
+def memoised(compute):
+    """Return a function of no arguments that calls compute once and keeps its value.
+
+    For intermediate results, such as a network solution, that several
+    signals are derived from.
+    """
+    value = []
+
+    def cached():
+        if not value:
+            value.append(compute())
+        return value[0]
+
+    return cached
+
+def unknown_probes(variables, probes):
+    """Return the requested probe names that variables cannot resolve."""
+    return [name for name in probes if name != ALL_SIGNALS and name not in variables]
+
+def alias_names(variables, names):
+    """Return the names that variables resolves as aliases rather than listed signals."""
+    listed = set(variables)
+    return [name for name in names if name not in listed]
+
+def check_probes(model, probes, optional=None):
+    """Raise ValueError if the model cannot produce every requested probe.
+
+    Builds the model's signals over an empty trajectory, which registers
+    their names without computing anything, so a bad request is rejected
+    before the run rather than after it.
+
+    optional names further signals to return only if the model has them,
+    such as the selections of the simulation page.  Returns (probes,
+    dropped): the probes plus the optional names the model resolves (None,
+    for every signal, if that leaves nothing), and the optional names it
+    cannot resolve.
+    """
+    if probes is None and not optional:
+        return None, []
+    n_states = len(model.get_initial_state())
+    variables = model.process_results(np.empty(0), np.empty((n_states, 0)))
+    unknown = unknown_probes(variables, probes or [])
+    if unknown:
+        available = variables.names() if isinstance(variables, LazyVariables) else list(variables)
+        more = f" and {len(available) - LISTED_PROBES} more" if len(available) > LISTED_PROBES else ""
+        raise ValueError(f"Unknown probe(s) {', '.join(map(str, unknown))}; available: "
+                         f"{', '.join(available[:LISTED_PROBES])}{more}")
+    dropped = unknown_probes(variables, optional or [])
+    selected = list(probes or []) + [name for name in optional or [] if name in variables]
+    return selected or None, dropped
+
+def select_probes(variables, probes=None):
+    """Evaluate the requested signals and return them as a plain dict.
+
+    probes None selects every listed signal, as does ALL_SIGNALS among
+    other probes.  With probes given, signals that are views into a larger array (a row of the state trajectory) are
+    copied, so the result holds only what was asked for and the trajectory
+    can be freed once the run returns.
+    """
+    if probes is None:
+        return {name: variables[name] for name in variables}
+    unknown = unknown_probes(variables, probes)
+    if unknown:
+        raise ValueError(f"Unknown probe(s) {', '.join(map(str, unknown))}")
+    names = []
+    for name in probes:
+        names.extend(variables if name == ALL_SIGNALS else [name])
+    return {name: _detached(variables[name]) for name in dict.fromkeys(names)}
+
+def _detached(values):
+    """Copy values if they are a view keeping a larger array alive."""
+    base = values
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    if isinstance(base, np.ndarray) and base.nbytes > values.nbytes and 0 not in values.strides:
+        return values.copy()
+    return values
+
+def stored_nbytes(values):
+    """Bytes actually held by an array; broadcast constants count once."""
+    values = np.asarray(values)
+    if values.ndim and 0 in values.strides:
+        return values.itemsize * int(np.prod([n for n, s in zip(values.shape, values.strides) if s]))
+    return values.nbytes
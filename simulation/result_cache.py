@@ -0,0 +1,225 @@
+# simulation/result_cache.py
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from models.simulation import SimulationResult
+from simulation.cache import LRUCache
+from simulation.probes import ALL_SIGNALS, stored_nbytes
+
+def _canonical_value(value):
+    """Normalise numbers so 1 and 1.0 hash alike; recurse into containers."""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    return str(value)
+
+def circuit_fingerprint(circuit):
+    """Return a hash of the circuit's physics.
+
+    Component types, terminals and parameters and the wiring between them
+    contribute; ids, names, positions and rotations do not, so a circuit
+    reloaded by the editor under new ids hashes alike.  The wiring enters
+    as the node number of every terminal, numbered in component order as
+    in Circuit.node_index.  Unwired circuits are recognised by their
+    component names, so for them the names are hashed as well.
+    """
+    node_index = circuit.node_index()
+    components = [
+        [component.type, [[terminal, node_index[(comp_id, terminal)]] for terminal in component.terminals],
+         _canonical_value(component.parameters)]
+        for comp_id, component in circuit.components.items()
+    ]
+    canonical = {"components": components}
+    if not circuit.connections:
+        canonical["names"] = [component.name for component in circuit.components.values()]
+    canonical = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def result_key(circuit, analysis, settings):
+    """Return the cache key for running analysis on circuit with settings.
+
+    Ids are not part of the key: a cached result is relabelled for the
+    circuit it serves by select_result.
+    """
+    canonical = json.dumps({
+        "circuit": circuit_fingerprint(circuit),
+        "analysis": analysis,
+        "settings": _canonical_value(settings),
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _relabeled(name, ids):
+    """Rename a signal named after a component id ("v_<id>", "<id>.v") through ids."""
+    component, dot, probe = name.rpartition(".")
+    if dot and component in ids:
+        return f"{ids[component]}.{probe}"
+    prefix, underscore, component = name.partition("_")
+    if underscore and prefix in ("v", "i", "p") and component in ids:
+        return f"{prefix}_{ids[component]}"
+    return name
+
+def _component_ids(result, circuit):
+    """Map the component ids a cached result was run with to circuit's."""
+    return dict(zip(result.metadata.get("component_ids", ()), circuit.components))
+
+def cached_probes(result, circuit, probes=None, optional=None):
+    """Return (probes, optional) for a run whose result serves later selections.
+
+    The run returns every signal (ALL_SIGNALS) and the requested probes,
+    and again the optional names an earlier cached result for the same key
+    resolved as aliases or could not resolve, so it serves every selection
+    that result did.  Record the circuit's component ids in the new result
+    with cache_entry before caching it.
+    """
+    known = []
+    if result is not None:
+        ids = _component_ids(result, circuit)
+        known = [_relabeled(name, ids)
+                 for name in result.metadata.get("aliases", []) + result.metadata.get("unknown_probes", [])]
+    return [ALL_SIGNALS] + list(probes or []), sorted(set(known).union(optional or []))
+
+def cache_entry(result, circuit):
+    """Record the component ids result was run with, for relabelling it later."""
+    result.metadata["component_ids"] = list(circuit.components)
+    return result
+
+def select_result(result, circuit, probes=None, optional=None):
+    """Return the signals of a cached result that probes and optional select.
+
+    result is a run made with ALL_SIGNALS (see cached_probes) on a circuit
+    with the same physics as circuit; its signals and circuit id are
+    relabelled for circuit's ids.  The selection follows
+    simulation.probes.check_probes and comes back as a new result sharing
+    the arrays.  Returns None if result lacks a requested name that its run
+    did not find unknown, so the run must be repeated with it, and raises
+    ValueError for probes the model is known not to have.
+    """
+    ids = _component_ids(result, circuit)
+    metadata = dict(result.metadata)
+    metadata.pop("component_ids", None)
+    aliases = {_relabeled(name, ids) for name in metadata.pop("aliases", ())}
+    unresolved = [_relabeled(name, ids) for name in metadata.pop("unknown_probes", [])]
+    available = {_relabeled(name, ids): values for name, values in result.variables.items()}
+    unknown = [name for name in probes or [] if name in unresolved]
+    if unknown:
+        raise ValueError(f"Unknown probe(s) {', '.join(map(str, unknown))}")
+    requested = list(probes or []) + list(optional or [])
+    if any(name not in available and name not in unresolved for name in requested):
+        return None
+
+    names = [name for name in requested if name in available]
+    if not names:
+        names = [name for name in available if name not in aliases]
+    dropped = [name for name in optional or [] if name not in available]
+    if dropped:
+        metadata["unknown_probes"] = dropped
+    variables = {name: available[name] for name in dict.fromkeys(names)}
+    return SimulationResult(result.time_points, variables, circuit.id, metadata=metadata)
+
+def result_nbytes(result):
+    """Approximate memory held by a result's arrays."""
+    return result.time_points.nbytes + sum(stored_nbytes(v) for v in result.variables.values())
+
+class ResultCache:
+    """Two-tier cache of simulation results keyed by result_key.
+
+    The memory tier is an LRU bounded by the total size of the cached arrays.
+    The optional disk tier stores one .npz file per key under directory and
+    is trimmed to max_disk_bytes, oldest files first; a disk hit is promoted
+    back into memory.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, directory=None, max_disk_bytes=2 * 2**30):
+        self.memory = LRUCache(maxsize=None, maxbytes=max_bytes, sizeof=result_nbytes)
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_writes = 0
+        self._disk_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        result = self.memory.get(key)
+        if result is not None or not self.directory:
+            return result
+
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                header = json.loads(str(data["header"]))
+                variables = {name: data[f"v{i}"] for i, name in enumerate(header["variables"])}
+                result = SimulationResult(data["time"], variables, header["circuit_id"],
+                                          metadata=header["metadata"])
+        except (OSError, KeyError, ValueError):
+            self.disk_misses += 1
+            return None
+
+        self.disk_hits += 1
+        os.utime(path)  # keep recently used files through trimming
+        self.memory.put(key, result)
+        return result
+
+    def put(self, key, result):
+        """Cache a result in memory and, if enabled, on disk."""
+        self.memory.put(key, result)
+        if not self.directory:
+            return
+
+        arrays = {f"v{i}": np.asarray(values) for i, values in enumerate(result.variables.values())}
+        # Write to a temporary name first so readers never see a partial file
+        temporary = self._path(key) + f".{threading.get_ident()}.tmp"
+        try:
+            header = json.dumps({"circuit_id": result.circuit_id, "metadata": result.metadata,
+                                 "variables": list(result.variables)})
+            with open(temporary, "wb") as file:
+                np.savez(file, header=np.array(header), time=result.time_points, **arrays)
+            os.replace(temporary, self._path(key))
+        except (OSError, TypeError, ValueError):
+            # The disk tier is best effort; the result stays cached in memory
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        self.disk_writes += 1
+        self._trim_disk()
+
+    def _trim_disk(self):
+        with self._disk_lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+    def stats(self):
+        """Return counters for both tiers."""
+        return {
+            "memory": self.memory.stats(),
+            "disk": {
+                "enabled": bool(self.directory),
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "writes": self.disk_writes,
+            },
+        }
@@ -0,0 +1,147 @@
+# simulation/result_store.py
+import json
+import os
+import shutil
+import numpy as np
+from models.simulation import SimulationResult
+
+HEADER_FILE = "header.json"
+
+class ResultWriter:
+    """Appends chunks of one result to its column files.
+
+    Each column (time first, then one per variable) is a raw little-endian
+    file that grows with every append; nothing but the current chunk is held
+    in memory.  The result becomes visible to ResultStore.open only once
+    close() has written its header.
+    """
+
+    def __init__(self, store, result_id, circuit_id, dtype="float64"):
+        self.store = store
+        self.result_id = result_id
+        self.circuit_id = circuit_id
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.directory = store._directory(result_id)
+        self.names = None
+        self.samples = 0
+        self._files = []
+        os.makedirs(self.directory, exist_ok=True)
+
+    def append(self, time_points, variables):
+        """Write one chunk; every chunk must carry the same variables."""
+        if self.names is None:
+            self.names = list(variables)
+            self._files = [open(os.path.join(self.directory, f"{i}.bin"), "wb")
+                           for i in range(len(self.names) + 1)]
+        elif list(variables) != self.names:
+            raise ValueError("Every chunk must contain the same variables")
+
+        columns = [time_points] + [variables[name] for name in self.names]
+        for file, values in zip(self._files, columns):
+            file.write(memoryview(np.ascontiguousarray(values, dtype=self.dtype)).cast("B"))
+        self.samples += len(time_points)
+
+    def close(self, metadata=None):
+        """Finish the result and return it reopened from disk."""
+        for file in self._files:
+            file.close()
+        header = {
+            "result_id": self.result_id,
+            "circuit_id": self.circuit_id,
+            "dtype": self.dtype.str,
+            "samples": self.samples,
+            "variables": self.names or [],
+            "metadata": metadata or {},
+        }
+        # Written last and atomically: a header means the columns are complete
+        temporary = os.path.join(self.directory, HEADER_FILE + ".tmp")
+        with open(temporary, "w") as file:
+            json.dump(header, file)
+        os.replace(temporary, os.path.join(self.directory, HEADER_FILE))
+        self.store._trim(keep=self.result_id)
+        return self.store.open(self.result_id)
+
+    def abort(self):
+        """Discard a partially written result."""
+        for file in self._files:
+            file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class ResultStore:
+    """Directory of out-of-core simulation results, one subdirectory per result id.
+
+    Results are opened as SimulationResults whose arrays are read-only
+    np.memmap views of the column files, so slicing a time window, decimating
+    or analysing a span only pages in the samples it touches.  Results
+    survive a process restart and are trimmed to max_bytes, least recently
+    opened first.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _directory(self, result_id):
+        if not result_id or os.sep in result_id or result_id.startswith("."):
+            raise ValueError(f"Invalid result id '{result_id}'")
+        return os.path.join(self.directory, result_id)
+
+    def writer(self, result_id, circuit_id, dtype="float64"):
+        """Start writing a new result."""
+        return ResultWriter(self, result_id, circuit_id, dtype)
+
+    def open(self, result_id):
+        """Return the stored result with the given id, or None."""
+        try:
+            directory = self._directory(result_id)
+            with open(os.path.join(directory, HEADER_FILE)) as file:
+                header = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        dtype, n = np.dtype(header["dtype"]), header["samples"]
+
+        def column(index):
+            if n == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(os.path.join(directory, f"{index}.bin"), dtype=dtype, mode="r", shape=(n,))
+
+        os.utime(os.path.join(directory, HEADER_FILE))  # keep recently used results through trimming
+        variables = {name: column(i + 1) for i, name in enumerate(header["variables"])}
+        metadata = dict(header["metadata"], storage="memmap")
+        result = SimulationResult(column(0), variables, header["circuit_id"], metadata=metadata)
+        result.id = header["result_id"]
+        return result
+
+    def __contains__(self, result_id):
+        try:
+            return os.path.exists(os.path.join(self._directory(result_id), HEADER_FILE))
+        except ValueError:
+            return False
+
+    def delete(self, result_id):
+        """Delete a stored result; return True if it existed."""
+        exists = result_id in self
+        if exists:
+            shutil.rmtree(self._directory(result_id), ignore_errors=True)
+        return exists
+
+    def _trim(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            header = os.path.join(entry.path, HEADER_FILE)
+            if not os.path.exists(header):
+                continue
+            size = sum(item.stat().st_size for item in os.scandir(entry.path))
+            entries.append((os.stat(header).st_mtime, size, entry.name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, result_id in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if result_id == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, result_id), ignore_errors=True)
+            total -= size
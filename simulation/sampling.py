@@ -0,0 +1,104 @@
+# simulation/sampling.py
+import numpy as np
+
+SAMPLING_POLICIES = ("budget", "fixed", "per_period", "solver")
+
+DEFAULT_MAX_SAMPLES = 1000000
+
+def sample_count(end_time, step):
+    """Number of samples step apart in [0, end_time), computed without allocating."""
+    if step <= 0:
+        raise ValueError("The sample step must be positive")
+    return int(np.ceil(end_time / step - 1e-9))
+
+def sampling_plan(end_time, step_size, policy="budget", max_samples=DEFAULT_MAX_SAMPLES,
+                  period=None, samples_per_period=20):
+    """Decide where a run is sampled before any output array is allocated.
+
+    Returns (step, count, info): the output times are the first count
+    multiples of step, or step is None when the solver's own points are
+    used.  The policies are
+    - "budget": every step_size, thinned to every k-th sample when that would
+      exceed max_samples
+    - "fixed": every step_size; a run over max_samples is rejected
+    - "per_period": samples_per_period evenly spaced samples per switching
+      period, thinned like "budget"
+    - "solver": the integrator's own step points, recorded within
+      max_samples while it runs (see StepSamples), or the switching instants
+      for the interval-wise solvers
+    max_samples None disables the budget.  info is recorded in the result
+    metadata.
+    """
+    if policy not in SAMPLING_POLICIES:
+        raise ValueError(f"Unknown sampling policy '{policy}'")
+    if end_time <= 0:
+        raise ValueError("The end time must be positive")
+
+    info = {"policy": policy, "max_samples": max_samples, "requested_step": step_size}
+    if policy == "solver":
+        info.update(step=None, stride=1)
+        return None, None, info
+
+    if policy == "per_period":
+        if not period:
+            raise ValueError("The per_period sampling policy requires a switching model")
+        if samples_per_period < 1:
+            raise ValueError("samples_per_period must be at least 1")
+        step_size = period / samples_per_period
+        info["samples_per_period"] = samples_per_period
+
+    count = sample_count(end_time, step_size)
+    stride = 1
+    if max_samples is not None and count > max_samples:
+        if policy == "fixed":
+            raise ValueError(f"{count} samples exceed the budget of {max_samples}; "
+                             f"increase step_size or use another sampling policy")
+        stride = int(np.ceil(count / max_samples))
+        count = sample_count(end_time, step_size * stride)
+
+    info.update(step=step_size * stride, stride=stride, samples=count)
+    return step_size * stride, count, info
+
+def sample_times(step, count):
+    """Return the planned output times."""
+    return np.arange(count) * step
+
+class StepSamples:
+    """The solver's step points, kept within a sample budget while it runs.
+
+    Every stride-th accepted step is recorded; once max_samples - 1 points
+    are held every other one is dropped and the stride doubles, so the
+    points stay evenly spread over the steps taken and never exceed the
+    budget, however many steps the solver takes.  The initial and final
+    points are always kept.
+    """
+
+    def __init__(self, t0, y0, max_samples):
+        self.max_samples = max(int(max_samples), 2)
+        self.stride = 1
+        self._steps = 0
+        self._t = [float(t0)]
+        self._y = [np.array(y0, dtype=float)]
+        self._last = None
+
+    def record(self, t, y):
+        """Take the solver's point after an accepted step."""
+        self._steps += 1
+        self._last = (t, y.copy())
+        if self._steps % self.stride:
+            return
+        if len(self._t) >= self.max_samples - 1:  # one place is kept for the final point
+            self._t, self._y = self._t[::2], self._y[::2]
+            self.stride *= 2
+            if self._steps % self.stride:
+                return
+        self._t.append(t)
+        self._y.append(self._last[1])
+
+    def points(self):
+        """Return (t, y) of the recorded points, y with one column per point."""
+        t, y = list(self._t), list(self._y)
+        if self._last is not None and self._last[0] != t[-1]:
+            t.append(self._last[0])
+            y.append(self._last[1])
+        return np.array(t), np.stack(y, axis=1)
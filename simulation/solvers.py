@@ -0,0 +1,289 @@
+# simulation/solvers.py
+from collections import OrderedDict
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.linalg import expm
+from scipy.optimize import brentq
+
+def _commutation_weights(model, diode_blocking):
+    """Return (w, c) such that w @ x + c changes sign when the diode commutates.
+
+    While the diode conducts this is the inductor current, which falls through
+    zero as the diode turns off.  While it blocks it is the inductor current
+    slope the conducting circuit would have, which rises through zero as the
+    diode turns back on.
+    """
+    n = len(model.get_initial_state())
+    if not diode_blocking:
+        w = np.zeros(n)
+        w[0] = 1.0
+        return w, 0.0
+
+    A, B = model.state_space(False)
+    return A[0, :], (B @ model.inputs())[0]
+
+def _initial_configuration(model, switch_on, state, weights):
+    """Return the diode state at the start of a switching interval.
+
+    The diode cannot carry reverse current, so a negative inductor current left
+    over from the switch-on interval is pinned to zero at turn-off (in place).
+    """
+    if switch_on or model.diode_component is None:
+        return False
+    if state[0] < 0.0:
+        state[0] = 0.0
+    w, c = weights[True]
+    return model.diode_blocking(state[0], w @ state + c)
+
+class PiecewiseLinearSolver:
+    """Exact integrator for models that are linear within each switching interval.
+
+    Each switch configuration is described by a state-space pair (A_k, B_k) with
+    constant inputs u, so the state over an interval of length h is given by
+    x(h) = expm(A_k h) x(0) + integral_0^h expm(A_k s) ds B_k u.  Both terms are
+    obtained from one exponential of the augmented matrix [[A_k, B_k u], [0, 0]]
+    and cached, so a run costs one small matrix product per switching interval.
+    Diode commutations inside an interval are located on the exact solution.
+    """
+
+    def __init__(self, model, max_cached=256):
+        self.model = model
+        self.max_cached = max_cached
+        self.n_states = len(model.get_initial_state())
+        self._augmented = {}
+        self._propagators = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.diode_commutations = 0
+        self._weights = {blocking: _commutation_weights(model, blocking) for blocking in (False, True)}
+
+    def _augmented_matrix(self, configuration):
+        """Build the augmented matrix [[A, B u], [0, 0]] for a switch configuration."""
+        if configuration not in self._augmented:
+            A, B = self.model.state_space(*configuration)
+            n = self.n_states
+            M = np.zeros((n + 1, n + 1))
+            M[:n, :n] = A
+            M[:n, n] = B @ self.model.inputs()
+            self._augmented[configuration] = M
+        return self._augmented[configuration]
+
+    def _propagator(self, configuration, offsets):
+        """Return stacked augmented propagators expm(M * s) for each offset s."""
+        offsets = np.asarray(offsets, dtype=float)
+        # Offsets repeat from one period to the next whenever the output grid is
+        # commensurate with the switching period; rounding to 0.1 ps lets the
+        # cache absorb floating-point noise in t - t_start
+        key = (configuration, np.round(offsets, 13).tobytes())
+        if key in self._propagators:
+            self.cache_hits += 1
+            self._propagators.move_to_end(key)
+            return self._propagators[key]
+
+        self.cache_misses += 1
+        M = self._augmented_matrix(configuration)
+        propagator = expm(offsets[:, None, None] * M)
+        self._propagators[key] = propagator
+        if len(self._propagators) > self.max_cached:
+            self._propagators.popitem(last=False)
+        return propagator
+
+    def _commutation_time(self, configuration, z, offsets, samples):
+        """Return the offset of the first diode commutation within a segment, if any.
+
+        The commutation function is checked at the output samples and the segment
+        end, so a crossing that recovers before the interval ends is still caught
+        as long as it spans a sample.  The bracketed crossing is then refined on
+        the exact solution.
+        """
+        w, c = self._weights[configuration[1]]
+        g = samples[:, :-1] @ w + c
+        g_start = w @ z[:-1] + c
+        if configuration[1]:
+            crossed = (g > 0.0) & (g_start < 0.0)
+        else:
+            crossed = (g < 0.0) & (g_start > 0.0)
+        if not crossed.any():
+            return None
+
+        first = np.argmax(crossed)
+        lower = offsets[first - 1] if first > 0 else 0.0
+        M = self._augmented_matrix(configuration)
+        return brentq(lambda s: w @ (expm(M * s) @ z)[:-1] + c, lower, offsets[first], xtol=1e-15)
+
+    def solve(self, t_eval, end_time, initial_state, progress=None):
+        """Advance the model over [0, end_time] and sample the state at t_eval.
+
+        Returns the sample times, a (n_states, len(t_eval)) array of states and a
+        dictionary of run statistics.  progress(t, nfev) is called after every
+        switching interval if given.
+        """
+        t_eval = np.asarray(t_eval, dtype=float)
+        boundaries, states = self.model.switching_instants(end_time)
+        has_diode = self.model.diode_component is not None
+        n = self.n_states
+
+        y = np.empty((n, len(t_eval)))
+        z = np.append(np.asarray(initial_state, dtype=float), 1.0)
+        segments = 0
+
+        for k, switch_on in enumerate(states):
+            t_start, t_stop = boundaries[k], boundaries[k + 1]
+            configuration = (switch_on, _initial_configuration(self.model, switch_on, z[:-1], self._weights))
+
+            while t_start < t_stop:
+                # Samples in [t_start, t_stop); the last interval also owns end_time
+                side = "right" if t_stop >= end_time else "left"
+                lo = np.searchsorted(t_eval, t_start, side="left")
+                hi = np.searchsorted(t_eval, t_stop, side=side)
+                offsets = np.append(t_eval[lo:hi] - t_start, t_stop - t_start)
+                samples = self._propagator(configuration, offsets) @ z
+                y[:, lo:hi] = samples[:-1, :n].T
+                z_end = samples[-1]
+                segment_end = t_stop
+
+                if has_diode and not switch_on:
+                    crossing = self._commutation_time(configuration, z, offsets, samples)
+                    if crossing is not None:
+                        # Samples past the crossing are rewritten by the next segment
+                        segment_end = t_start + crossing
+                        z_end = expm(self._augmented_matrix(configuration) * crossing) @ z
+
+                segments += 1
+                z = z_end
+                t_start = segment_end
+                if segment_end < t_stop:
+                    # Diode commutation: toggle the diode and pin the current exactly at zero
+                    self.diode_commutations += 1
+                    configuration = (switch_on, not configuration[1])
+                    z[0] = 0.0
+
+            if progress is not None:
+                progress(t_stop, None)
+
+        stats = {
+            "switching_intervals": len(states),
+            "segments": segments,
+            "diode_commutations": self.diode_commutations,
+            "propagator_cache_hits": self.cache_hits,
+            "propagator_cache_misses": self.cache_misses,
+        }
+        return t_eval, y, stats
+
+class SegmentedSolver:
+    """Adaptive integrator restarted on every smooth segment of a switched model.
+
+    PWM edges come from the model's switching schedule and diode commutations are
+    located as solve_ivp events, so the integrator never steps across a switching
+    discontinuity and does not waste rejected steps discovering it.
+    """
+
+    def __init__(self, model, method='RK45', rtol=1e-3, atol=1e-6):
+        self.model = model
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self._rhs = {}
+        self._weights = {blocking: _commutation_weights(model, blocking) for blocking in (False, True)}
+
+    def _segment_rhs(self, configuration):
+        """Return the linear right-hand side for a switch configuration."""
+        if configuration not in self._rhs:
+            A, B = self.model.state_space(*configuration)
+            b = B @ self.model.inputs()
+            self._rhs[configuration] = lambda t, y: A @ y + b
+        return self._rhs[configuration]
+
+    def _commutation_event(self, diode_blocking):
+        """Build a terminal solve_ivp event for the next diode commutation."""
+        w, c = self._weights[diode_blocking]
+        event = lambda t, y: w @ y + c
+        event.terminal = True
+        event.direction = 1 if diode_blocking else -1
+        return event
+
+    def _solve_segment(self, configuration, t_start, t_stop, state, segment_t, event):
+        """Integrate one smooth segment with solve_ivp."""
+        return solve_ivp(
+            self._segment_rhs(configuration),
+            (t_start, t_stop),
+            state,
+            method=self.method,
+            t_eval=segment_t,
+            events=event,
+            rtol=self.rtol,
+            atol=self.atol
+        )
+
+    def solve(self, t_eval, end_time, initial_state, progress=None):
+        """Advance the model over [0, end_time] and sample the state at t_eval.
+
+        Returns the sample times, a (n_states, len(t_eval)) array of states and a
+        dictionary of run statistics.  progress(t, nfev) is called after every
+        switching interval if given.
+        """
+        t_eval = np.asarray(t_eval, dtype=float)
+        boundaries, states = self.model.switching_instants(end_time)
+        has_diode = self.model.diode_component is not None
+        events = {blocking: self._commutation_event(blocking) for blocking in (False, True)}
+
+        y = np.empty((len(initial_state), len(t_eval)))
+        state = np.array(initial_state, dtype=float)
+        segments = nfev = njev = commutations = 0
+
+        for k, switch_on in enumerate(states):
+            t_start, t_stop = boundaries[k], boundaries[k + 1]
+            diode_blocking = _initial_configuration(self.model, switch_on, state, self._weights)
+
+            while t_start < t_stop:
+                # Request the segment end as well so the final state is available
+                side = "right" if t_stop >= end_time else "left"
+                lo = np.searchsorted(t_eval, t_start, side="left")
+                hi = np.searchsorted(t_eval, t_stop, side=side)
+                segment_t = t_eval[lo:hi]
+                if hi == lo or segment_t[-1] < t_stop:
+                    segment_t = np.append(segment_t, t_stop)
+
+                watch_diode = has_diode and not switch_on
+                solution = self._solve_segment(
+                    (switch_on, diode_blocking), t_start, t_stop, state, segment_t,
+                    events[diode_blocking] if watch_diode else None
+                )
+                if solution.status == 1 and solution.t_events[0][0] <= t_start:
+                    # The event fired on the restart point itself; integrate the segment without it
+                    nfev += solution.nfev
+                    solution = self._solve_segment(
+                        (switch_on, diode_blocking), t_start, t_stop, state, segment_t, None
+                    )
+                segments += 1
+                nfev += solution.nfev
+                njev += solution.njev
+
+                if solution.status == 1:
+                    t_event = solution.t_events[0][0]
+                    kept = np.searchsorted(t_eval[lo:hi], t_event, side="right")
+                    if kept:
+                        y[:, lo:lo + kept] = solution.y[:, :kept]
+
+                    # Toggle the diode and pin the current exactly at zero
+                    commutations += 1
+                    state = solution.y_events[0][0].copy()
+                    state[0] = 0.0
+                    diode_blocking = not diode_blocking
+                    t_start = t_event
+                else:
+                    y[:, lo:hi] = solution.y[:, :hi - lo]
+                    state = solution.y[:, -1]
+                    t_start = t_stop
+
+            if progress is not None:
+                progress(t_stop, nfev)
+
+        stats = {
+            "switching_intervals": len(states),
+            "segments": segments,
+            "diode_commutations": commutations,
+            "nfev": nfev,
+            "njev": njev,
+        }
+        return t_eval, y, stats
@@ -0,0 +1,102 @@
+# simulation/spectral.py
+import numpy as np
+
+SPECTRAL_WINDOWS = {
+    "rectangular": np.ones,
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "blackman": np.blackman,
+}
+
+def analysis_window(time, fundamental=None, t_start=None, t_end=None, steady_fraction=0.5):
+    """Return the slice of samples to analyse.
+
+    Without explicit bounds the last steady_fraction of the run is used, on
+    the assumption that the startup transient has died out by then.  With a
+    known fundamental the window is shortened to a whole number of its
+    periods so the harmonics fall on FFT bins.
+    """
+    if len(time) == 0:
+        return slice(0, 0)
+    t_end = time[-1] if t_end is None else min(t_end, time[-1])
+    if t_start is None:
+        t_start = t_end - steady_fraction * (t_end - time[0])
+    t_start = max(t_start, time[0])
+
+    lo = np.searchsorted(time, t_start - 1e-12, side="left")
+    hi = np.searchsorted(time, t_end, side="right")
+    if fundamental and hi - lo > 1:
+        # Whole periods, excluding the sample that would start the next one
+        step = (time[hi - 1] - time[lo]) / max(hi - lo - 1, 1)
+        per_period = 1.0 / (fundamental * step) if step > 0 else 0.0
+        periods = np.floor((hi - lo) / per_period + 1e-6) if per_period else 0
+        if periods >= 1:
+            lo = hi - int(round(periods * per_period))
+    return slice(lo, hi)
+
+def uniform_samples(time, values):
+    """Return (sample spacing, values) on a uniform grid, resampling if needed."""
+    steps = np.diff(time)
+    step = (time[-1] - time[0]) / (len(time) - 1)
+    if np.allclose(steps, step, rtol=1e-6, atol=0.0):
+        return step, values
+    grid = np.linspace(time[0], time[-1], len(time))
+    return step, np.interp(grid, time, values)
+
+def spectrum(time, values, window="hann", fundamental=None, harmonics=40):
+    """Single-sided amplitude spectrum, harmonics, THD and ripple metrics of one signal.
+
+    Amplitudes are corrected for the window's coherent gain, so a sinusoid of
+    amplitude a reads a at its bin.  Harmonic k is read as the largest bin
+    within two bins of k * fundamental; without a fundamental the strongest
+    non-DC component is used.  THD is the RMS of harmonics 2..harmonics
+    relative to the fundamental.
+    """
+    if window not in SPECTRAL_WINDOWS:
+        raise ValueError(f"Unknown window '{window}'")
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(time) < 4:
+        raise ValueError("At least 4 samples are needed for spectral analysis")
+
+    step, samples = uniform_samples(time, values)
+    n = len(samples)
+    taper = SPECTRAL_WINDOWS[window](n)
+    amplitude = np.abs(np.fft.rfft((samples - samples.mean()) * taper)) * 2.0 / taper.sum()
+    amplitude[0] = abs(samples.mean())
+    frequencies = np.fft.rfftfreq(n, step)
+    resolution = frequencies[1]
+
+    if not fundamental:
+        fundamental = frequencies[1 + np.argmax(amplitude[1:])] if n > 2 else 0.0
+
+    table = []
+    for order in range(1, harmonics + 1):
+        center = int(round(order * fundamental / resolution)) if resolution else 0
+        if center <= 0 or center >= len(amplitude):
+            break
+        lo, hi = max(1, center - 2), min(len(amplitude), center + 3)
+        peak = lo + np.argmax(amplitude[lo:hi])
+        table.append({"order": order, "frequency": float(frequencies[peak]),
+                      "amplitude": float(amplitude[peak])})
+
+    fundamental_amplitude = table[0]["amplitude"] if table else 0.0
+    distortion = np.sqrt(sum(h["amplitude"] ** 2 for h in table[1:]))
+    rms = float(np.sqrt(np.mean(samples ** 2)))
+    dc = float(samples.mean())
+
+    return {
+        "frequencies": frequencies,
+        "amplitudes": amplitude,
+        "fundamental": float(fundamental),
+        "harmonics": table,
+        "thd": float(distortion / fundamental_amplitude) if fundamental_amplitude > 0 else None,
+        "dc": dc,
+        "rms": rms,
+        "ac_rms": float(np.sqrt(max(rms ** 2 - dc ** 2, 0.0))),
+        "ripple": float(np.ptp(samples)),
+        "window": window,
+        "t_start": float(time[0]),
+        "t_end": float(time[-1]),
+        "samples": n,
+    }
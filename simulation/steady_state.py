@@ -0,0 +1,87 @@
+# simulation/steady_state.py
+import numpy as np
+from scipy.integrate import solve_ivp
+from simulation.solvers import PiecewiseLinearSolver
+from simulation.stiffness import select_method
+
+class PeriodMap:
+    """Map an initial state to the state one switching period later."""
+
+    def __init__(self, model, period):
+        self.model = model
+        self.period = period
+        self.evaluations = 0
+        # Switched converter models are advanced exactly and share one
+        # propagator cache across every shooting iteration
+        self.solver = PiecewiseLinearSolver(model) if hasattr(model, "state_space") else None
+        if self.solver is None:
+            # Other models integrate with the method their stiffness calls for
+            method = select_method(model, period)["method"]
+            self.options = {"method": method, "max_step": getattr(model, "max_step", np.inf)}
+            if method in ("Radau", "BDF") and hasattr(model, "jacobian"):
+                self.options["jac"] = model.jacobian
+
+    def __call__(self, state):
+        self.evaluations += 1
+        if self.solver is not None:
+            _, y, _ = self.solver.solve([self.period], self.period, state)
+            return y[:, -1]
+
+        solution = solve_ivp(
+            self.model.derivatives,
+            (0, self.period),
+            state,
+            rtol=1e-8,
+            atol=1e-10,
+            **self.options
+        )
+        return solution.y[:, -1]
+
+def find_periodic_steady_state(model, tolerance=1e-9, max_iterations=50, initial_state=None, progress=None):
+    """Find x0 with x(T_sw) = x0 by Newton shooting over one switching period.
+
+    The monodromy matrix dx(T)/dx(0) is estimated by finite differences.  For a
+    converter in continuous conduction the period map is affine and Newton
+    converges in a single step; discontinuous conduction needs a few more.
+    initial_state is the first guess, the model's initial state by default.
+    progress, if given, is called as progress(0.0, None) before every Newton
+    iteration, no time having been simulated yet; an exception raised by it
+    aborts the search.  Returns the periodic initial state and a dict with iterations and residual.
+    """
+    period = model.switching_period
+    if not period:
+        raise ValueError("Steady-state analysis requires a periodically switched circuit")
+
+    period_map = PeriodMap(model, period)
+    state = np.array(model.get_initial_state() if initial_state is None else initial_state, dtype=float)
+    n = len(state)
+    identity = np.eye(n)
+
+    def converged(residual, state):
+        scale = max(1.0, np.max(np.abs(state), initial=0.0))
+        return np.max(np.abs(residual), initial=0.0) <= tolerance * scale
+
+    residual = period_map(state) - state
+    iterations = 0
+    while iterations < max_iterations and not converged(residual, state):
+        if progress is not None:
+            progress(0.0, None)
+        # Finite-difference monodromy matrix, one column per state
+        end_state = residual + state
+        monodromy = np.empty((n, n))
+        for i in range(n):
+            step = 1e-6 * max(1.0, abs(state[i]))
+            monodromy[:, i] = (period_map(state + step * identity[i]) - end_state) / step
+
+        state = state - np.linalg.solve(monodromy - identity, residual)
+        residual = period_map(state) - state
+        iterations += 1
+
+    info = {
+        "converged": bool(converged(residual, state)),
+        "iterations": iterations,
+        "residual": float(np.max(np.abs(residual), initial=0.0)),
+        "period": float(period),
+        "period_evaluations": period_map.evaluations,
+    }
+    return state, info
@@ -0,0 +1,133 @@
+# simulation/stiffness.py
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import eigs, ArpackError, ArpackNoConvergence
+from simulation.cache import LRUCache
+
+SOLVER_METHOD_CHOICES = ("auto", "RK45", "RK23", "DOP853", "Radau", "BDF", "LSODA")
+
+# Largest |h * lambda| on the negative real axis for which RK45 is stable
+EXPLICIT_STABILITY_LIMIT = 3.3
+# Stability-limited explicit steps per accuracy-limited step above which the
+# problem is treated as stiff, and as mildly stiff from 1 up to this value
+STIFF_STEP_RATIO = 10.0
+# Steps a smooth run needs at least to resolve its output
+MIN_ACCURACY_STEPS = 100
+# Above this many states the spectrum is estimated iteratively and the
+# implicit method keeps the Jacobian sparse
+DENSE_EIGEN_LIMIT = 400
+
+# Stiffness estimates of recently simulated circuits, keyed by model.stiffness_key
+_estimates = LRUCache(maxsize=256)
+
+def spectrum_bounds(jacobian):
+    """Return (fastest decay rate, slowest decay rate) of one linearisation.
+
+    Decay rates are -Re(lambda) over the eigenvalues with negative real
+    part.  Large sparse matrices only get the fastest rate, estimated with
+    ARPACK and bounded by Gershgorin discs if it does not converge; their
+    slowest rate is None.
+    """
+    n = jacobian.shape[0]
+    if n == 0:
+        return 0.0, None
+    if n <= DENSE_EIGEN_LIMIT:
+        dense = jacobian.toarray() if sparse.issparse(jacobian) else np.asarray(jacobian)
+        rates = -np.linalg.eigvals(dense).real
+        rates = rates[rates > 1e-12 * max(rates.max(initial=0.0), 1.0)]
+        return (float(rates.max()), float(rates.min())) if len(rates) else (0.0, None)
+
+    try:
+        values = eigs(sparse.csc_matrix(jacobian), k=min(6, n - 2), which="LM",
+                      return_eigenvectors=False, tol=1e-3)
+        return float(max(-values.real.min(), 0.0)), None
+    except (ArpackNoConvergence, ArpackError):
+        rows = abs(sparse.csr_matrix(jacobian)).sum(axis=1)
+        return float(rows.max()), None
+
+def stiffness_estimate(model):
+    """Return the spectrum bounds of the model's linearisations, or None if it has none.
+
+    The estimate is a dict with the (fastest, slowest) decay rates of every
+    linearisation and the number of states.  Models carrying a
+    stiffness_key (a hash of the circuit and model variant, set by the
+    engine) share one estimate per key, so repeated runs of a circuit skip
+    building the Jacobians and their eigenvalues.
+    """
+    key = getattr(model, "stiffness_key", None)
+    if key is not None:
+        estimate = _estimates.get(key)
+        if estimate is not None:
+            return estimate
+
+    linearisations = model.linearisations() if hasattr(model, "linearisations") else []
+    if not linearisations:
+        return None
+    estimate = {"bounds": [spectrum_bounds(jacobian) for jacobian in linearisations],
+                "states": linearisations[0].shape[0]}
+    if key is not None:
+        _estimates.put(key, estimate)
+    return estimate
+
+def select_method(model, end_time, method="auto"):
+    """Choose the solve_ivp method for a model from the stiffness of its linearisations.
+
+    The model's linearisations() give the Jacobian of every configuration it
+    visits; their spectrum is estimated once per stiffness_key
+    (see stiffness_estimate).  An explicit method needs about end_time * fastest_rate / 3.3
+    steps to stay stable, compared with the steps accuracy alone asks for
+    (end_time / max_step, at least MIN_ACCURACY_STEPS):
+    - stable within the accuracy steps: RK45, which needs no Jacobian
+    - up to STIFF_STEP_RATIO times more: LSODA, which switches between
+      Adams and BDF as the stiffness shows itself
+    - beyond that: Radau for small switched models, since a one-step method
+      restarts at full order after every switching edge, otherwise BDF,
+      which keeps large Jacobians sparse
+    Any method other than "auto" is used as given.  Returns a dict
+    with the method, the reason and the stiffness estimate.
+    """
+    if method not in SOLVER_METHOD_CHOICES:
+        raise ValueError(f"Unknown solver method '{method}'")
+    if method != "auto":
+        return {"method": method, "selected_by": "request", "reason": "requested"}
+
+    estimate = stiffness_estimate(model)
+    if estimate is None:
+        return {"method": "RK45", "selected_by": "default",
+                "reason": "the model provides no linearisation to estimate stiffness"}
+
+    bounds = estimate["bounds"]
+    fastest = max(fast for fast, _ in bounds)
+    slow_rates = [slow for _, slow in bounds if slow is not None]
+    slowest = max(min(slow_rates), 1.0 / end_time) if slow_rates else 1.0 / end_time
+
+    max_step = getattr(model, "max_step", np.inf)
+    accuracy_steps = max(end_time / max_step if np.isfinite(max_step) else 0.0, MIN_ACCURACY_STEPS)
+    stability_steps = end_time * fastest / EXPLICIT_STABILITY_LIMIT
+    step_ratio = stability_steps / accuracy_steps
+    n_states = estimate["states"]
+    switched = len(bounds) > 1
+
+    if step_ratio < 1.0:
+        choice, reason = "RK45", "not stiff: explicit steps are limited by accuracy, not stability"
+    elif step_ratio < STIFF_STEP_RATIO and n_states <= DENSE_EIGEN_LIMIT:
+        choice, reason = "LSODA", "mildly stiff: LSODA switches between Adams and BDF as needed"
+    elif switched and n_states <= DENSE_EIGEN_LIMIT:
+        choice, reason = "Radau", "stiff and switched: a one-step implicit method restarts cleanly at every switching edge"
+    else:
+        choice, reason = "BDF", "stiff: BDF with the analytic Jacobian"
+
+    return {
+        "method": choice,
+        "selected_by": "stiffness",
+        "reason": reason,
+        "stiffness": {
+            "fastest_rate": fastest,
+            "slowest_rate": slowest,
+            "stiffness_ratio": fastest / slowest if slowest else None,
+            "stability_steps": stability_steps,
+            "accuracy_steps": accuracy_steps,
+            "configurations": len(bounds),
+            "states": n_states,
+        },
+    }
@@ -0,0 +1,151 @@
+# simulation/sweep.py
+import copy
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models.circuit import Circuit
+from simulation.engine import simulate_circuit, apply_parameters, build_circuit_model, check_parameters
+
+def expand_grid(grid):
+    """Expand a parameter grid into the Cartesian product of parameter sets.
+
+    grid maps a component id or name to {parameter: [values, ...]}; every
+    combination becomes one parameter set {component: {parameter: value}}.
+    """
+    axes = [(component, parameter, list(values))
+            for component, parameters in grid.items()
+            for parameter, values in parameters.items()]
+
+    parameter_sets = []
+    for combination in itertools.product(*(values for _, _, values in axes)):
+        parameter_set = {}
+        for (component, parameter, _), value in zip(axes, combination):
+            parameter_set.setdefault(component, {})[parameter] = value
+        parameter_sets.append(parameter_set)
+    return parameter_sets
+
+def monte_carlo_sets(circuit, tolerances, runs, distribution="uniform", seed=None):
+    """Draw random parameter sets around the circuit's nominal values.
+
+    tolerances maps a component id or name to {parameter: relative_tolerance},
+    e.g. {"C1": {"capacitance": 0.1}} for ±10 %.  With the "normal"
+    distribution the tolerance is treated as a 3-sigma bound.
+    """
+    if distribution not in ("uniform", "normal"):
+        raise ValueError(f"Unknown distribution '{distribution}'")
+
+    by_name = {component.name: component for component in circuit.components.values()}
+    rng = np.random.default_rng(seed)
+
+    axes = []
+    for key, parameters in tolerances.items():
+        component = circuit.components.get(key) or by_name.get(key)
+        if component is None:
+            raise ValueError(f"Unknown component '{key}' in tolerances")
+        for parameter, tolerance in parameters.items():
+            axes.append((key, parameter, component.parameters[parameter], tolerance))
+
+    # Draw every axis at once: (runs, n_axes) relative deviations
+    tolerance = np.array([axis[3] for axis in axes])
+    if distribution == "uniform":
+        deviations = rng.uniform(-1.0, 1.0, size=(runs, len(axes))) * tolerance
+    else:
+        deviations = rng.normal(0.0, 1.0, size=(runs, len(axes))) * tolerance / 3.0
+
+    parameter_sets = []
+    for row in deviations:
+        parameter_set = {}
+        for (component, parameter, nominal, _), deviation in zip(axes, row):
+            parameter_set.setdefault(component, {})[parameter] = float(nominal * (1.0 + deviation))
+        parameter_sets.append(parameter_set)
+    return parameter_sets
+
+def summarize_result(result, output_variable="capacitor_voltage",
+                     current_variable="inductor_current", steady_fraction=0.1):
+    """Reduce a simulation result to scalar design metrics.
+
+    Steady-state output and ripple are taken over the final steady_fraction of
+    the run; the peak inductor current is taken over the whole run.
+    """
+    t = result.time_points
+    metrics = {"steady_state_output": None, "ripple": None, "peak_inductor_current": None}
+    if len(t) == 0:
+        return metrics
+
+    window = t >= t[-1] - steady_fraction * (t[-1] - t[0])
+    output = result.get_variable(output_variable)
+    if output is not None:
+        metrics["steady_state_output"] = float(np.mean(output[window]))
+        metrics["ripple"] = float(np.ptp(output[window]))
+
+    current = result.get_variable(current_variable)
+    if current is not None:
+        metrics["peak_inductor_current"] = float(np.max(np.abs(current)))
+
+    return metrics
+
+def _run_chunk(circuit_data, indexed_sets, settings, keep_waveforms):
+    """Worker entry point: simulate a chunk of parameter sets."""
+    circuit = Circuit.from_json(circuit_data)
+    outcomes = []
+    for index, parameters in indexed_sets:
+        variant = copy.copy(circuit)
+        variant.components = apply_parameters(circuit.components, parameters)
+        try:
+            result = simulate_circuit(variant, **settings)
+        except Exception as e:
+            outcomes.append((index, {"error": str(e)}, None))
+            continue
+        waveform = result if index in keep_waveforms else None
+        outcomes.append((index, summarize_result(result), waveform))
+    return outcomes
+
+def run_sweep(circuit, parameter_sets, end_time=1.0, step_size=1e-6, mode="adaptive",
+              keep_waveforms=(), max_workers=None, chunk_size=None, executor=None):
+    """Simulate every parameter set across a process pool.
+
+    Each run is reduced to scalar metrics; full SimulationResults are only
+    returned for the indices listed in keep_waveforms.  Returns (metrics,
+    waveforms) where metrics is a list aligned with parameter_sets and
+    waveforms maps index -> SimulationResult.  Parameters the circuit's
+    model does not read are rejected with ValueError before any run.
+    """
+    parameter_sets = list(parameter_sets)
+    model = build_circuit_model(circuit.components, circuit.connections, compile_rhs=False,
+                                node_index=circuit.node_index())
+    check_parameters(model, circuit.components, parameter_sets)
+    keep_waveforms = set(keep_waveforms)
+    settings = {"end_time": end_time, "step_size": step_size, "mode": mode}
+    # The compact form ships electrical nodes instead of every connection
+    circuit_data = circuit.to_json(compact=True)
+
+    workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool busy without per-run overhead
+        chunk_size = max(1, math.ceil(len(parameter_sets) / (workers * 4)))
+    indexed = list(enumerate(parameter_sets))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    if executor is None and workers == 1:
+        outcomes = [_run_chunk(circuit_data, chunk, settings, keep_waveforms) for chunk in chunks]
+    else:
+        own_executor = executor is None
+        executor = executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(_run_chunk, circuit_data, chunk, settings, keep_waveforms)
+                       for chunk in chunks]
+            outcomes = [future.result() for future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    metrics = [None] * len(parameter_sets)
+    waveforms = {}
+    for chunk in outcomes:
+        for index, run_metrics, waveform in chunk:
+            metrics[index] = run_metrics
+            if waveform is not None:
+                waveforms[index] = waveform
+    return metrics, waveforms
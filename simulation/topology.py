@@ -0,0 +1,150 @@
+# simulation/topology.py
+import hashlib
+import networkx as nx
+from networkx.algorithms import isomorphism
+from simulation.cache import LRUCache
+
+# Terminal roles per component type; mosfets and igbts are both "switch"
+COMPONENT_KINDS = {"mosfet": "switch", "igbt": "switch"}
+TERMINAL_ROLES = {
+    "mosfet": {"drain": "high", "source": "low", "gate": "control"},
+    "igbt": {"collector": "high", "emitter": "low", "gate": "control"},
+    "diode": {"anode": "anode", "cathode": "cathode"},
+    "voltage_source": {"positive": "positive", "negative": "negative"},
+    "pwm_source": {"output": "output", "reference": "reference"},
+}
+
+# Each template lists (kind, {role: net}); two-terminal passives use the
+# role "any" for both ends.  Nets are local names that must map to distinct
+# circuit nodes.  The resistor from the output to ground is the load.
+# Templates are tried in order and the first match wins.
+TOPOLOGY_TEMPLATES = {
+    "buck_converter": [
+        ("voltage_source", {"positive": "in", "negative": "gnd"}),
+        ("switch", {"high": "in", "low": "sw"}),
+        ("diode", {"cathode": "sw", "anode": "gnd"}),
+        ("inductor", {"any": ("sw", "out")}),
+        ("capacitor", {"any": ("out", "gnd")}),
+        ("resistor", {"any": ("out", "gnd")}),
+    ],
+    "boost_converter": [
+        ("voltage_source", {"positive": "in", "negative": "gnd"}),
+        ("inductor", {"any": ("in", "sw")}),
+        ("switch", {"high": "sw", "low": "gnd"}),
+        ("diode", {"anode": "sw", "cathode": "out"}),
+        ("capacitor", {"any": ("out", "gnd")}),
+        ("resistor", {"any": ("out", "gnd")}),
+    ],
+    "buck_boost_converter": [
+        ("voltage_source", {"positive": "in", "negative": "gnd"}),
+        ("switch", {"high": "in", "low": "sw"}),
+        ("inductor", {"any": ("sw", "gnd")}),
+        ("diode", {"cathode": "sw", "anode": "out"}),
+        ("capacitor", {"any": ("out", "gnd")}),
+        ("resistor", {"any": ("out", "gnd")}),
+    ],
+}
+
+_template_graphs = {}
+_recognised = LRUCache(maxsize=1024)
+
+def register_topology(name, template):
+    """Add a topology template; later registrations are tried last."""
+    TOPOLOGY_TEMPLATES[name] = template
+    _template_graphs.pop(name, None)
+    _recognised.clear()
+
+def _template_graph(name):
+    if name not in _template_graphs:
+        graph = nx.Graph()
+        for index, (kind, terminals) in enumerate(TOPOLOGY_TEMPLATES[name]):
+            graph.add_node(("c", index), kind=kind)
+            for role, nets in terminals.items():
+                for net in (nets if isinstance(nets, tuple) else (nets,)):
+                    graph.add_node(("n", net), kind="net")
+                    graph.add_edge(("c", index), ("n", net), role=role)
+        _template_graphs[name] = graph
+    return _template_graphs[name]
+
+def circuit_graph(components, node_index):
+    """Build the bipartite component/net graph of a circuit.
+
+    Component vertices carry their kind, net vertices are electrical nodes,
+    and each edge carries the terminal role joining them.  Parameters, names
+    and ids do not appear in the graph.
+    """
+    graph = nx.Graph()
+    for comp_id, component in components.items():
+        kind = COMPONENT_KINDS.get(component.type, component.type)
+        roles = TERMINAL_ROLES.get(component.type, {})
+        graph.add_node(("c", comp_id), kind=kind)
+        for terminal in component.terminals:
+            node = node_index.get((comp_id, terminal))
+            if node is None:
+                continue
+            graph.add_node(("n", node), kind="net")
+            graph.add_edge(("c", comp_id), ("n", node), role=roles.get(terminal, "any"))
+    return graph
+
+def graph_signature(graph):
+    """Hash the labelled structure of a circuit graph."""
+    labels = {vertex: data["kind"] for vertex, data in graph.nodes(data=True)}
+    edges = sorted(
+        tuple(sorted([repr((vertex_a, labels[vertex_a])), repr((vertex_b, labels[vertex_b]))])) + (data["role"],)
+        for vertex_a, vertex_b, data in graph.edges(data=True)
+    )
+    isolated = sorted(repr((vertex, labels[vertex])) for vertex in graph.nodes if graph.degree(vertex) == 0)
+    return hashlib.sha256(repr((edges, isolated)).encode("utf-8")).hexdigest()
+
+def match_topology(graph):
+    """Return (name, roles) for the first template contained in the graph, or (None, {}).
+
+    A template matches when it is a subgraph monomorphism of the circuit
+    graph with equal vertex kinds and edge roles, so the gate drive does
+    not prevent recognition.  roles maps each template kind to the id of
+    the circuit component the match bound to it.  The circuit must hold
+    exactly as many components of each kind the template uses, since the
+    converter models have a single switch, diode, inductor, capacitor and
+    load; anything richer, such as a gate resistor or a bleeder beside the
+    load, is left to the generic model.
+    """
+    counts = {}
+    for _, kind in graph.nodes(data="kind"):
+        counts[kind] = counts.get(kind, 0) + 1
+    for name in TOPOLOGY_TEMPLATES:
+        template_counts = {}
+        for kind, _ in TOPOLOGY_TEMPLATES[name]:
+            template_counts[kind] = template_counts.get(kind, 0) + 1
+        if any(counts.get(kind, 0) != count for kind, count in template_counts.items()):
+            continue
+        matcher = isomorphism.GraphMatcher(
+            graph, _template_graph(name),
+            node_match=lambda a, b: a["kind"] == b["kind"],
+            edge_match=lambda a, b: a["role"] == b["role"],
+        )
+        mapping = next(matcher.subgraph_monomorphisms_iter(), None)
+        if mapping is not None:
+            template = TOPOLOGY_TEMPLATES[name]
+            return name, {template[vertex[1]][0]: comp_vertex[1]
+                          for comp_vertex, vertex in mapping.items() if vertex[0] == "c"}
+    return None, {}
+
+def recognise_topology(components, node_index):
+    """Return (topology name or None, roles, signature), memoised by graph signature.
+
+    roles maps template kinds to component ids as in match_topology.
+    Editing component parameters leaves the signature unchanged, so the
+    subgraph matching only runs again after the wiring changes.
+    """
+    graph = circuit_graph(components, node_index)
+    signature = graph_signature(graph)
+    match = _recognised.get(signature)
+    if match is None:
+        match = match_topology(graph)
+        _recognised.put(signature, match)
+    topology, roles = match
+    return topology, dict(roles), signature
+
+def recognition_stats():
+    """Return the hit/miss counters of the recognition cache."""
+    return _recognised.stats()
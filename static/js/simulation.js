@@ -9,6 +9,10 @@ let timeStep = 0.0001; // Default time step
 let endTime = 0.01; // Default simulation end time
 let selectedNodes = [];
 let selectedVariables = [];
+let windowReloadTimer = null;
+
+// Binary columnar result encoding served by the simulation endpoint
+const COLUMNAR_MIME_TYPE = 'application/x-simulation-columnar';
 
 // Initialize the simulation page
 document.addEventListener('DOMContentLoaded', function() {
@@ -261,6 +265,13 @@ function runSimulation() {
         return;
     }
     
+    // Live runs stream the result into the charts chunk by chunk
+    const live = document.getElementById('live-simulation');
+    if (live && live.checked) {
+        streamSimulation();
+        return;
+    }
+    
     // Show loading state
     document.getElementById('simulation-status').textContent = 'Running simulation...';
     document.getElementById('run-simulation-btn').disabled = true;
@@ -270,19 +281,20 @@ function runSimulation() {
         circuit_id: circuitId,
         nodes: selectedNodes,
         variables: selectedVariables,
-        time_step: timeStep,
+        step_size: timeStep,
         end_time: endTime
     };
     
-    // Send simulation request
-    fetch('/run_simulation', {
+    // Send simulation request; the session's circuit is the one loaded above
+    fetch('/simulate', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept': `${COLUMNAR_MIME_TYPE}, application/json;q=0.9`
         },
         body: JSON.stringify(params)
     })
-    .then(response => response.json())
+    .then(response => parseSimulationResponse(response))
     .then(data => {
         document.getElementById('run-simulation-btn').disabled = false;
         
@@ -296,7 +308,7 @@ function runSimulation() {
             enableExport();
         } else {
             document.getElementById('simulation-status').textContent = 'Simulation failed';
-            showNotification('Simulation failed: ' + data.message, 'error');
+            showNotification('Simulation failed: ' + (data.error || data.message), 'error');
         }
     })
     .catch(error => {
@@ -307,6 +319,167 @@ function runSimulation() {
     });
 }
 
+// Run the simulation as a stream of chunks, appending each to the open charts;
+// used by runSimulation when the live option is checked
+function streamSimulation(mode) {
+    const query = new URLSearchParams({
+        end_time: endTime,
+        step_size: timeStep,
+        mode: mode || 'adaptive',
+        nodes: selectedNodes.join(','),
+        variables: selectedVariables.join(',')
+    });
+    const source = new EventSource(`/simulate/stream?${query}`);
+    
+    document.getElementById('simulation-status').textContent = 'Running simulation...';
+    document.getElementById('run-simulation-btn').disabled = true;
+    simulationResults = null;
+    
+    source.addEventListener('chunk', event => {
+        const chunk = JSON.parse(event.data);
+        const first = simulationResults === null;
+        if (first) {
+            simulationResults = {result_id: chunk.result_id, time: [], node_voltages: {}, variables: {}};
+        }
+        
+        // Append in place: the charts hold references to these arrays
+        chunk.time_points.forEach(t => simulationResults.time.push(t));
+        Object.entries(chunk.variables).forEach(([name, values]) => {
+            const target = name.startsWith('v_node_') ? simulationResults.node_voltages : simulationResults.variables;
+            const key = name.startsWith('v_node_') ? name.slice('v_node_'.length) : name;
+            target[key] = target[key] || [];
+            values.forEach(value => target[key].push(value));
+        });
+        
+        const metadata = chunk.metadata;
+        document.getElementById('simulation-status').textContent =
+            `Running simulation... ${Math.round(100 * (metadata.chunk + 1) / metadata.chunks)}%`;
+        if (first) {
+            updatePlot();
+        } else {
+            Object.values(chartInstances).forEach(chart => chart.update('none'));
+        }
+    });
+    
+    source.addEventListener('done', () => {
+        source.close();
+        document.getElementById('run-simulation-btn').disabled = false;
+        document.getElementById('simulation-status').textContent = 'Simulation completed successfully';
+        showNotification('Simulation completed successfully', 'success');
+        updatePlot();
+        enableExport();
+    });
+    
+    source.addEventListener('error', event => {
+        source.close();
+        document.getElementById('run-simulation-btn').disabled = false;
+        document.getElementById('simulation-status').textContent = 'Simulation failed';
+        const message = event.data ? JSON.parse(event.data).error : 'connection lost';
+        showNotification('Simulation failed: ' + message, 'error');
+    });
+    
+    return source;
+}
+
+// Parse a simulation response as binary columns or JSON depending on its type
+function parseSimulationResponse(response) {
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.startsWith(COLUMNAR_MIME_TYPE)) {
+        // JSON carries either an error or the result in the /simulate JSON layout
+        return response.json().then(data => data.error ? data : {
+            success: response.ok,
+            results: resultColumns(data.result_id, data.metadata, data.time_points,
+                                   Object.entries(data.variables))
+        });
+    }
+    return response.arrayBuffer().then(buffer => ({
+        success: response.ok,
+        results: decodeColumnarResult(buffer)
+    }));
+}
+
+// Re-request a time window of the current result; windows that fit the
+// server's point budget come back at full resolution, and null bounds
+// request the whole run
+function loadResultWindow(tStart, tEnd, points) {
+    if (!simulationResults || !simulationResults.result_id) {
+        return Promise.resolve(null);
+    }
+    
+    const query = new URLSearchParams();
+    if (tStart !== null && tStart !== undefined) {
+        query.set('t_start', tStart);
+    }
+    if (tEnd !== null && tEnd !== undefined) {
+        query.set('t_end', tEnd);
+    }
+    if (points) {
+        query.set('points', points);
+    }
+    return fetch(`/result/${simulationResults.result_id}?${query}`, {
+        headers: {'Accept': COLUMNAR_MIME_TYPE}
+    })
+    .then(response => parseSimulationResponse(response))
+    .then(data => {
+        if (data.success) {
+            simulationResults = data.results;
+            updatePlot();
+        }
+        return data;
+    });
+}
+
+// Zoom and pan options for the time-domain charts (chartjs-plugin-zoom): once
+// the user stops zooming or panning, the visible window is reloaded at the
+// chart's pixel resolution
+function timeWindowZoomOptions() {
+    const reload = ({chart}) => {
+        clearTimeout(windowReloadTimer);
+        windowReloadTimer = setTimeout(() => {
+            const times = chart.data.labels;
+            const first = Math.max(0, Math.floor(chart.scales.x.min));
+            const last = Math.min(times.length - 1, Math.ceil(chart.scales.x.max));
+            loadResultWindow(times[first], times[last], Math.round(chart.width));
+        }, 250);
+    };
+    return {
+        zoom: {wheel: {enabled: true}, pinch: {enabled: true}, mode: 'x', onZoomComplete: reload},
+        pan: {enabled: true, mode: 'x', onPanComplete: reload}
+    };
+}
+
+// Decode a binary columnar result into typed arrays without copying the samples
+function decodeColumnarResult(buffer) {
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const ArrayType = header.dtype === 'float32' ? Float32Array : Float64Array;
+    const dataStart = 4 + headerLength;
+    
+    const columns = header.columns.map(column =>
+        [column.name, new ArrayType(buffer, dataStart + column.offset, column.length)]);
+    const time = columns.find(([name]) => name === 'time')[1];
+    return resultColumns(header.result_id, header.metadata, time, columns.filter(([name]) => name !== 'time'));
+}
+
+// Arrange a result's signals as the charts read them, node voltages by node
+function resultColumns(resultId, metadata, time, signals) {
+    const results = {
+        result_id: resultId,
+        metadata: metadata,
+        time: time,
+        node_voltages: {},
+        variables: {}
+    };
+    signals.forEach(([name, values]) => {
+        if (name.startsWith('v_node_')) {
+            results.node_voltages[name.slice('v_node_'.length)] = values;
+        } else {
+            results.variables[name] = values;
+        }
+    });
+    return results;
+}
+
 // Update the plot based on current selection
 function updatePlot() {
     const plotType = document.querySelector('input[name="plot-type"]:checked').value;
@@ -341,6 +514,8 @@ function createTimeDomainPlots(container) {
         nodeVoltageDiv.className = 'plot-container';
         nodeVoltageDiv.innerHTML = '<h5>Node Voltages</h5><canvas id="node-voltage-plot"></canvas>';
         container.appendChild(nodeVoltageDiv);
+        // Double-click zooms back out to the whole run
+        nodeVoltageDiv.addEventListener('dblclick', () => loadResultWindow(null, null));
         
         const datasets = selectedNodes.map(node => {
             // Choose a random color
@@ -370,7 +545,8 @@ function createTimeDomainPlots(container) {
                     title: {
                         display: true,
                         text: 'Node Voltages vs Time'
-                    }
+                    },
+                    zoom: timeWindowZoomOptions()
                 },
                 scales: {
                     x: {
@@ -396,6 +572,7 @@ function createTimeDomainPlots(container) {
         variableDiv.className = 'plot-container';
         variableDiv.innerHTML = '<h5>Component Variables</h5><canvas id="component-var-plot"></canvas>';
         container.appendChild(variableDiv);
+        variableDiv.addEventListener('dblclick', () => loadResultWindow(null, null));
         
         const datasets = selectedVariables.map(variable => {
             // Choose a random color
@@ -425,7 +602,8 @@ function createTimeDomainPlots(container) {
                     title: {
                         display: true,
                         text: 'Component Variables vs Time'
-                    }
+                    },
+                    zoom: timeWindowZoomOptions()
                 },
                 scales: {
                     x: {
@@ -467,6 +645,37 @@ function createFrequencyDomainPlots(container) {
     fftDiv.innerHTML = '<h5>Frequency Spectrum</h5><canvas id="fft-plot"></canvas>';
     container.appendChild(fftDiv);
     
+    // Results kept on the server are analysed there with an FFT
+    if (simulationResults.result_id) {
+        const names = [...selectedNodes.map(node => `v_node_${node}`), ...selectedVariables];
+        const query = new URLSearchParams({variables: names.join(',')});
+        fetch(`/spectrum/${simulationResults.result_id}?${query}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                const datasets = names.map(name => {
+                    const color = getRandomColor();
+                    return {
+                        label: name.startsWith('v_node_') ? `Node ${name.slice('v_node_'.length)}` : formatVariableName(name),
+                        data: data.spectra[name].amplitudes,
+                        borderColor: color,
+                        backgroundColor: color + '33',
+                        borderWidth: 2,
+                        fill: false
+                    };
+                });
+                const frequencies = data.frequencies;
+                drawSpectrumChart(fftDiv, frequencies, datasets, frequencies[frequencies.length - 1]);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                fftDiv.innerHTML = '<div class="text-center p-3">Could not compute frequency spectrum</div>';
+            });
+        return;
+    }
+    
     // Compute sample frequency and prepare FFT data
     const Fs = 1 / (simulationResults.time[1] - simulationResults.time[0]); // Sample frequency
     const datasets = [];
@@ -515,44 +724,48 @@ function createFrequencyDomainPlots(container) {
     if (datasets.length > 0) {
         // Use the first dataset's frequency for X-axis
         const frequencies = datasets[0].data.map((_, i) => i * Fs / (datasets[0].data.length * 2));
-        
-        const ctx = document.getElementById('fft-plot').getContext('2d');
-        chartInstances['fft'] = new Chart(ctx, {
-            type: 'line',
-            data: {
-                labels: frequencies,
-                datasets: datasets
+        drawSpectrumChart(fftDiv, frequencies, datasets, Fs / 4); // Show only first quarter for better visibility
+    } else {
+        fftDiv.innerHTML = '<div class="text-center p-3">Could not compute frequency spectrum</div>';
+    }
+}
+
+// Draw amplitude spectra against a shared frequency axis
+function drawSpectrumChart(fftDiv, frequencies, datasets, maxFrequency) {
+    const ctx = fftDiv.querySelector('canvas').getContext('2d');
+    chartInstances['fft'] = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: frequencies,
+            datasets: datasets
+        },
+        options: {
+            responsive: true,
+            plugins: {
+                title: {
+                    display: true,
+                    text: 'Frequency Spectrum'
+                }
             },
-            options: {
-                responsive: true,
-                plugins: {
+            scales: {
+                x: {
                     title: {
                         display: true,
-                        text: 'Frequency Spectrum'
-                    }
+                        text: 'Frequency (Hz)'
+                    },
+                    min: 0,
+                    max: maxFrequency
                 },
-                scales: {
-                    x: {
-                        title: {
-                            display: true,
-                            text: 'Frequency (Hz)'
-                        },
-                        min: 0,
-                        max: Fs / 4 // Show only first quarter for better visibility
+                y: {
+                    title: {
+                        display: true,
+                        text: 'Magnitude'
                     },
-                    y: {
-                        title: {
-                            display: true,
-                            text: 'Magnitude'
-                        },
-                        type: 'logarithmic'
-                    }
+                    type: 'logarithmic'
                 }
             }
-        });
-    } else {
-        fftDiv.innerHTML = '<div class="text-center p-3">Could not compute frequency spectrum</div>';
-    }
+        }
+    });
 }
 
 // Create phase portrait plots
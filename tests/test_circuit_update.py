@@ -0,0 +1,70 @@
+# tests/test_circuit_update.py
+import copy
+import importlib
+import pytest
+
+CLIENT_ID = "test-client"
+
+def editor_circuit():
+    """A circuit as the editor posts it, with jsPlumb connection objects."""
+    return {
+        "id": "circuit-1",
+        "name": "Divider",
+        "components": {
+            "voltage_source_1": {"id": "voltage_source_1", "type": "voltage_source", "name": "Voltage Source 1",
+                                 "position": {"x": 40, "y": 80}, "parameters": {"voltage": 12.0}},
+            "resistor_1": {"id": "resistor_1", "type": "resistor", "name": "Resistor 1",
+                           "position": {"x": 200, "y": 80}, "parameters": {"resistance": 10.0}},
+        },
+        "connections": [
+            {"id": "c1", "sourceId": "voltage_source_1", "targetId": "resistor_1",
+             "sourceEndpoint": {"endpointType": "positive", "direction": "output"},
+             "targetEndpoint": {"endpointType": "t1", "direction": "input"}},
+            {"id": "c2", "sourceId": "resistor_1", "targetId": "voltage_source_1",
+             "sourceEndpoint": {"endpointType": "t2", "direction": "output"},
+             "targetEndpoint": {"endpointType": "negative", "direction": "input"}},
+        ],
+    }
+
+@pytest.fixture
+def editor(tmp_path, monkeypatch):
+    # The app creates its upload folder relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    app_module = importlib.import_module("app")
+    app_module.app.config["TESTING"] = True
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["client_id"] = CLIENT_ID
+    yield client, app_module.circuit_store
+    app_module.circuit_store.set(CLIENT_ID, None)
+
+def test_parameter_edit_replaces_circuit_with_edited_copy(editor):
+    client, store = editor
+    data = editor_circuit()
+    assert client.post("/editor", json=data).status_code == 200
+    circuit = store.get(CLIENT_ID)
+
+    data["components"]["resistor_1"]["parameters"]["resistance"] = 22.0
+    data["components"]["resistor_1"]["position"] = {"x": 220, "y": 90}
+    assert client.post("/editor", json=copy.deepcopy(data)).status_code == 200
+
+    edited = store.get(CLIENT_ID)
+    assert edited is not circuit
+    assert edited.components["resistor_1"].parameters["resistance"] == 22.0
+    assert edited.components["resistor_1"].position == {"x": 220, "y": 90}
+    # Unchanged components are shared and the original is left as it was
+    assert edited.components["voltage_source_1"] is circuit.components["voltage_source_1"]
+    assert circuit.components["resistor_1"].parameters["resistance"] == 10.0
+
+def test_rewiring_rebuilds_circuit(editor):
+    client, store = editor
+    data = editor_circuit()
+    client.post("/editor", json=data)
+    circuit = store.get(CLIENT_ID)
+
+    data["connections"].pop()
+    client.post("/editor", json=data)
+
+    rebuilt = store.get(CLIENT_ID)
+    assert rebuilt.components["voltage_source_1"] is not circuit.components["voltage_source_1"]
+    assert rebuilt.to_json()["connections"] == data["connections"]